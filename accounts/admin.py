@@ -10,6 +10,6 @@ class CustomUserAdmin(UserAdmin):
     
     fieldsets = UserAdmin.fieldsets + (
         ('追加情報', {
-            'fields': ('department', 'phone', 'is_manager'),
+            'fields': ('department', 'phone', 'is_manager', 'is_viewer', 'department_only'),
         }),
     )
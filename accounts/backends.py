@@ -0,0 +1,72 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+# プロセス内ユーザーキャッシュ {user_id(str): (有効期限, ユーザー)}
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def _cache_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 30)
+
+
+def invalidate_user(user_id):
+    """指定ユーザーのキャッシュを破棄"""
+    with _user_cache_lock:
+        _user_cache.pop(str(user_id), None)
+
+
+def clear_user_cache():
+    """ユーザーキャッシュを全て破棄"""
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+def _get_cached(user_id):
+    with _user_cache_lock:
+        entry = _user_cache.get(str(user_id))
+    if entry is None:
+        return None
+    expires, user = entry
+    if expires < time.monotonic():
+        invalidate_user(user_id)
+        return None
+    # リクエスト側での変更がキャッシュに波及しないようコピーを返す
+    return copy.copy(user)
+
+
+def _set_cached(user_id, user):
+    timeout = _cache_timeout()
+    if timeout <= 0 or user is None:
+        return
+    with _user_cache_lock:
+        _user_cache[str(user_id)] = (time.monotonic() + timeout, copy.copy(user))
+
+
+class CachedModelBackend(ModelBackend):
+    """認証済みユーザーの取得結果をプロセス内で短時間キャッシュする認証バックエンド
+
+    AuthenticationMiddleware はリクエスト毎に get_user() を呼ぶため、
+    CustomUser の SELECT をキャッシュ有効期間中は省略できる。
+    ユーザー更新・削除時は accounts.signals で破棄される。
+    """
+
+    def get_user(self, user_id):
+        user = _get_cached(user_id)
+        if user is not None:
+            return user
+        user = super().get_user(user_id)
+        _set_cached(user_id, user)
+        return user
+
+    async def aget_user(self, user_id):
+        user = _get_cached(user_id)
+        if user is not None:
+            return user
+        user = await super().aget_user(user_id)
+        _set_cached(user_id, user)
+        return user
@@ -49,7 +49,7 @@ class UserManagementForm(forms.ModelForm):
     
     class Meta:
         model = User
-        fields = ['username', 'email', 'first_name', 'last_name', 'department', 'phone', 'is_manager', 'is_viewer', 'is_active']
+        fields = ['username', 'email', 'first_name', 'last_name', 'department', 'phone', 'is_manager', 'is_viewer', 'department_only', 'is_active']
         widgets = {
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
@@ -59,6 +59,7 @@ class UserManagementForm(forms.ModelForm):
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
             'is_manager': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'is_viewer': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'department_only': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
@@ -71,6 +72,9 @@ class UserProfileForm(forms.ModelForm):
         self.fields['first_name'].required = True
         self.fields['last_name'].required = True
         self.fields['department'].required = True
+        # 自部署のみの権限のユーザーは部署を変更できない（マネージャーのユーザー管理から変更）
+        if self.instance.department_only:
+            self.fields['department'].disabled = True
         # 任意フィールドの設定
         self.fields['email'].required = False
         self.fields['phone'].required = False
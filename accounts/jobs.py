@@ -0,0 +1,12 @@
+"""アカウント関連のバックグラウンドタスク（worker アプリの run_worker で実行）"""
+from datetime import timedelta
+
+from worker.tasks import periodic
+
+from .sessions import purge_expired_sessions
+
+
+@periodic('accounts.purge_sessions', every=timedelta(hours=1))
+def purge_sessions():
+    """期限切れセッションを削除（purge_sessions コマンドの定期実行の代わり）"""
+    return purge_expired_sessions()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = '期限切れセッションを削除します（cron 等で定期実行してください）'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f'期限切れセッションを{deleted}件削除しました。'))
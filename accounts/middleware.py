@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.utils.cache import add_never_cache_headers
 from django.utils.deprecation import MiddlewareMixin
 
@@ -5,6 +6,10 @@ class NoCacheMiddleware(MiddlewareMixin):
     """認証が必要なページでキャッシュを無効にするミドルウェア"""
     
     def process_response(self, request, response):
+        # 静的ファイルは長期キャッシュさせるため対象外
+        if request.path.startswith(settings.STATIC_URL):
+            return response
+
         # ログインが必要なページの場合、キャッシュを無効にする
         if hasattr(request, 'user') and request.user.is_authenticated:
             # 認証済みユーザーのページはキャッシュしない
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_is_viewer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='department_only',
+            field=models.BooleanField(default=False, help_text='マネージャー・閲覧者の権限を自分の部署の案件に限定します', verbose_name='自部署のみ'),
+        ),
+    ]
@@ -8,6 +8,7 @@ class CustomUser(AbstractUser):
     phone = models.CharField('電話番号', max_length=20, blank=True)
     is_manager = models.BooleanField('マネージャー権限', default=False)
     is_viewer = models.BooleanField('閲覧者権限', default=False, help_text='全員の案件を閲覧できますが編集はできません')
+    department_only = models.BooleanField('自部署のみ', default=False, help_text='マネージャー・閲覧者の権限を自分の部署の案件に限定します')
     
     class Meta:
         verbose_name = 'ユーザー'
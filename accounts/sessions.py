@@ -0,0 +1,18 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def purge_expired_sessions():
+    """期限切れセッションを削除し、削除件数を返す（DB非保存のエンジンは0）"""
+    engine = import_module(settings.SESSION_ENGINE)
+    store_class = engine.SessionStore
+    if hasattr(store_class, 'get_model_class'):
+        # db / cached_db：件数を取得するため直接削除する
+        deleted, _ = store_class.get_model_class().objects.filter(
+            expire_date__lt=timezone.now()
+        ).delete()
+        return deleted
+    store_class.clear_expired()
+    return 0
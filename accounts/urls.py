@@ -12,4 +12,5 @@ urlpatterns = [
     path('users/<int:user_id>/delete/', views.user_delete, name='user_delete'),
     path('profile/', views.profile, name='profile'),
     path('password-change/', views.password_change_view, name='password_change'),
+    path('cache/', views.cache_stats, name='cache_stats'),
 ]
\ No newline at end of file
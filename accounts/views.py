@@ -1,3 +1,7 @@
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
@@ -10,6 +14,7 @@ from django.urls import reverse
 from .forms import CustomUserCreationForm, UserManagementForm, UserProfileForm, PasswordChangeForm
 from .decorators import manager_required
 from django.contrib.auth import update_session_auth_hash
+from schedule.caching import COUNTERS, collect_stats, namespaces, stats
 
 User = get_user_model()
 
@@ -166,3 +171,47 @@ def password_change_view(request):
         form = PasswordChangeForm(user=request.user)
     
     return render(request, 'accounts/password_change.html', {'form': form})
+
+@manager_required
+@never_cache
+def cache_stats(request):
+    """キャッシュの名前空間毎のヒット・ミス等の件数（マネージャー専用）"""
+    if request.method == 'POST':
+        if request.POST.get('action') == 'reset':
+            stats.reset()
+            messages.success(request, 'このプロセスの件数をリセットしました。')
+        else:
+            namespace = namespaces.get(request.POST.get('namespace'))
+            if namespace is None:
+                messages.error(request, '指定された名前空間はありません。')
+            else:
+                namespace.invalidate()
+                messages.success(request, f'「{namespace.name}」のキャッシュを無効化しました。')
+        return redirect('accounts:cache_stats')
+
+    processes = collect_stats()
+    totals = {name: Counter() for name in namespaces}
+    for entry in processes:
+        for name, counters in entry['namespaces'].items():
+            totals.setdefault(name, Counter()).update(counters)
+    rows = []
+    for name, counters in sorted(totals.items()):
+        lookups = counters['hits'] + counters['misses']
+        rows.append({
+            'name': name,
+            'counters': [counters[counter] for counter in COUNTERS],
+            'hit_ratio': counters['hits'] / lookups if lookups else None,
+            'compute_ms': counters['compute_seconds'] * 1000 / counters['computes'] if counters['computes'] else None,
+            'registered': name in namespaces,
+        })
+    return render(request, 'accounts/cache_stats.html', {
+        'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+        'counters': COUNTERS,
+        'rows': rows,
+        'processes': [
+            dict(entry, started_at=datetime.fromtimestamp(entry['started_at']),
+                 updated_at=datetime.fromtimestamp(entry['updated_at']),
+                 current=entry['process'] == stats.process)
+            for entry in processes
+        ],
+    })
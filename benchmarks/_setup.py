@@ -0,0 +1,99 @@
+"""ベンチマーク共通処理
+
+インメモリのテスト用DBを作成してから計測するため、db.sqlite3 には触れない。
+各ベンチマークはリポジトリ直下から ``python -m benchmarks.bench_xxx`` で実行する。
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(test_db_file=None, keepdb=False):
+    """Django を初期化し、テスト用DBを作成する
+
+    複数スレッドから同時に書き込む計測では、インメモリDB（共有キャッシュ）だと
+    ロック待ちをせずにエラーになるため、test_db_file にファイルのパスを指定する。
+    keepdb=True なら作成済みの test_db_file をそのまま使う（子プロセスで親のDBを共有する場合）。
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scheduleapp.settings')
+    # 計測は一時ファイルの DB で行うため、開発時（DEBUG）でも運用と同じく WAL にする
+    os.environ.setdefault('SQLITE_WAL', '1')
+    import django
+    django.setup()
+    if test_db_file:
+        from django.conf import settings
+        test_db_file = Path(test_db_file)
+        for alias, database in settings.DATABASES.items():
+            test = database.setdefault('TEST', {})
+            if test.get('MIRROR'):
+                continue
+            # 別ファイルの接続（セッション等）も同じディレクトリのファイルにする
+            name = test_db_file if alias == 'default' else test_db_file.with_name(f'{test_db_file.stem}_{alias}.sqlite3')
+            test['NAME'] = str(name)
+    from django.test.utils import setup_databases, setup_test_environment
+    setup_test_environment()
+    return setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+
+
+def seed(users=20, projects=200, schedules_per_project=5, start=None, seed_value=0):
+    """計測用のユーザー・分野・案件・スケジュールを作成する"""
+    from accounts.models import CustomUser
+    from schedule.models import Field, Project, Schedule
+    from schedule.occupancy import rebuild_schedule_days
+
+    rng = random.Random(seed_value)
+    start = start or date.today().replace(day=1)
+    manager = CustomUser.objects.create_user(
+        username='bench_manager', email='bench_manager@example.com', password='bench-pass', is_manager=True,
+        last_name='管理', first_name='太郎',
+    )
+    members = [manager] + [
+        CustomUser.objects.create_user(
+            username=f'bench_user{i}', email=f'bench_user{i}@example.com', password='bench-pass',
+            last_name=f'担当{i}', first_name='花子',
+        )
+        for i in range(users - 1)
+    ]
+    fields = [
+        Field.objects.create(name=name, created_by=manager)
+        for name in ['作図', 'ソフト作成', '配線', 'デバック', '現地工事', '制御盤']
+    ]
+    project_objs = Project.objects.bulk_create([
+        Project(
+            name=f'案件{i:04d}', manufacturing_number=f'MN-{i:05d}',
+            due_date=start + timedelta(days=rng.randint(30, 120)),
+            description='ベンチマーク用の案件です。' * 3,
+            created_by=manager, assigned_to=rng.choice(members),
+        )
+        for i in range(projects)
+    ])
+    schedules = []
+    for project in project_objs:
+        for _ in range(schedules_per_project):
+            begin = start + timedelta(days=rng.randint(-10, 40))
+            schedules.append(Schedule(
+                project=project, field=rng.choice(fields),
+                start_date=begin, end_date=begin + timedelta(days=rng.randint(0, 14)),
+                description='作業内容メモ',
+            ))
+    Schedule.objects.bulk_create(schedules)
+    # bulk_create ではシグナルが発火しないため、稼働日毎の行はまとめて作る
+    rebuild_schedule_days()
+    return manager, members
+
+
+def measure(func, repeat=200):
+    """func を repeat 回実行し、1回あたりの平均・中央値（ミリ秒）を返す"""
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.mean(samples), statistics.median(samples)
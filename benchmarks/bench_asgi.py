@@ -0,0 +1,199 @@
+"""カレンダー・スケジュールAPIの同期版（WSGI）と非同期版（ASGI、ASYNC_VIEWS=1）の負荷比較
+
+    python -m benchmarks.bench_asgi
+
+同じワーカー数（プロセス数）で、WSGI は1ワーカーが1件ずつ、ASGI は1ワーカーのイベントループで
+「同時」の件数ずつ処理させ、DURATION 秒の処理件数と応答時間（最初の1バイトまでと全体）を示す。
+参考に、ASGI で同期版のビューを使う場合（ASYNC_VIEWS=0）も示す。WSGI の応答時間にはワーカーの空き待ちを含まない。
+HTTP サーバーは介さず、ワーカーのプロセスから WSGI のテストクライアント・ASGI のアプリケーションを直接呼び出す。
+ASYNC_VIEWS は起動時に決まるため、ワーカー毎に子プロセスで計測し、DB は親プロセスで作ったファイルを共有する。
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+URLS = ['/schedule/calendar/?scope=week', '/schedule/api/schedules/']
+RUNS = [(1, 1), (1, 4), (2, 4)]  # (ワーカー数, ASGI の1ワーカーあたりの同時処理数)
+# (表示名, サーバー, ASYNC_VIEWS)。ASGI sync は同期版のビューを ASGI で動かす場合
+VARIANTS = [('WSGI', 'wsgi', '0'), ('ASGI sync', 'asgi', '0'), ('ASGI async', 'asgi', '1')]
+DURATION = 5.0
+PROJECTS = 300
+SCHEDULES_PER_PROJECT = 4
+
+
+def run_wsgi(url, session_key, deadline):
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    samples = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        response = client.get(url)
+        # WSGI の同期版は応答全体を組み立ててから返すため、最初の1バイトも全体の完了と同時になる
+        first = time.perf_counter()
+        if response.streaming:
+            b''.join(response.streaming_content)
+        finished = time.perf_counter()
+        if response.status_code != 200:
+            errors += 1
+        elif finished <= deadline:
+            samples.append(((finished - began) * 1000, (first - began) * 1000))
+    return samples, errors
+
+
+async def run_asgi(url, session_key, deadline, concurrency):
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session_key}'.encode()),
+        ],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    samples = []
+    errors = 0
+
+    async def request(began):
+        status = []
+        first = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # 切断はしない（応答を送り終えると Django が待ち受けをやめる）
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not first:
+                first.append(time.perf_counter())
+
+        await app(dict(scope), receive, send)
+        return status[0], first[0]
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            status, first = await request(began)
+            finished = time.perf_counter()
+            if status != 200:
+                errors += 1
+            elif finished <= deadline:
+                samples.append(((finished - began) * 1000, (first - began) * 1000))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, errors
+
+
+def run_worker():
+    """子プロセス側: 親の合図で計測を始め、応答時間の一覧を JSON で出力する"""
+    from benchmarks._setup import setup_django
+
+    setup_django(test_db_file=os.environ['BENCH_ASGI_DB'], keepdb=True)
+    url = os.environ['BENCH_ASGI_URL']
+    session_key = os.environ['BENCH_ASGI_SESSION']
+    concurrency = int(os.environ['BENCH_ASGI_CONCURRENCY'])
+    print('ready', flush=True)
+    sys.stdin.readline()
+    deadline = time.perf_counter() + DURATION
+    if os.environ['BENCH_ASGI_SERVER'] == 'asgi':
+        samples, errors = asyncio.run(run_asgi(url, session_key, deadline, concurrency))
+    else:
+        samples, errors = run_wsgi(url, session_key, deadline)
+    print(json.dumps({'samples': samples, 'errors': errors}), flush=True)
+
+
+def measure(db_file, url, session_key, server, async_views, workers, concurrency):
+    env = dict(
+        os.environ, BENCH_ASGI_SERVER=server, ASYNC_VIEWS=async_views, BENCH_ASGI_DB=str(db_file), BENCH_ASGI_URL=url,
+        BENCH_ASGI_SESSION=session_key, BENCH_ASGI_CONCURRENCY=str(concurrency),
+    )
+    processes = [
+        subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--worker'], env=env, text=True,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        for _ in range(workers)
+    ]
+    # 全ワーカーの準備（Django の初期化）が済んでから同時に始める
+    for process in processes:
+        assert process.stdout.readline().strip() == 'ready'
+    for process in processes:
+        process.stdin.write('go\n')
+        process.stdin.flush()
+    samples = []
+    errors = 0
+    for process in processes:
+        result = json.loads(process.stdout.read().strip().splitlines()[-1])
+        process.wait()
+        samples += result['samples']
+        errors += result['errors']
+    totals = [total for total, _ in samples]
+    return {
+        'throughput': len(samples) / DURATION,
+        'median': statistics.median(totals) if totals else 0,
+        'p95': statistics.quantiles(totals, n=20)[-1] if len(totals) >= 2 else 0,
+        'first': statistics.median(first for _, first in samples) if samples else 0,
+        'errors': errors,
+    }
+
+
+def main():
+    from benchmarks._setup import seed, setup_django
+
+    db_file = Path(tempfile.mkdtemp()) / 'bench_asgi.sqlite3'
+    setup_django(test_db_file=db_file)
+
+    from django.conf import settings
+    from django.test import Client
+
+    from schedule.jobs import roll_over_statuses
+
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    seed(users=30, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT)
+    # 表示時のステータス更新（書き込み）が起きないよう、日付によるステータスを先に反映しておく
+    roll_over_statuses()
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+    session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    print(f'案件 {PROJECTS:,}件 / スケジュール {PROJECTS * SCHEDULES_PER_PROJECT:,}件 / {DURATION:.0f}秒')
+    for url in URLS:
+        print(url)
+        print(f'  {"ワーカー":<6}{"同時":>2}  {"":<10}{"件/秒":>6}{"中央値 ms":>8}{"p95 ms":>9}'
+              f'{"最初の応答 ms":>9}{"エラー":>4}')
+        for workers, concurrency in RUNS:
+            for label, server, async_views in VARIANTS:
+                if server == 'wsgi':
+                    result = measure(db_file, url, session_key, server, async_views, workers, 1)
+                else:
+                    result = measure(db_file, url, session_key, server, async_views, workers, concurrency)
+                print(f'  {workers:<10}{concurrency if server == "asgi" else 1:>4}  {label:<10}'
+                      f'{result["throughput"]:>8.1f}{result["median"]:>11.1f}{result["p95"]:>9.1f}'
+                      f'{result["first"]:>14.1f}{result["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    if '--worker' in sys.argv:
+        run_worker()
+    else:
+        main()
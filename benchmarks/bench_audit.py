@@ -0,0 +1,77 @@
+"""監査ログの書き込み方式による schedule_edit の応答時間を比較する
+
+    python -m benchmarks.bench_audit
+
+AUDIT_ASYNC=False（コミット時にその場で INSERT）と True（キューに積んでバックグラウンドでまとめて INSERT）で
+スケジュール編集 POST の応答時間を計測し、非同期側はキューが空になるまでの時間と1件あたりの保存サイズも示す。
+"""
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from benchmarks._setup import measure, seed, setup_django
+
+# バックグラウンドのスレッドとリクエストが同時に書き込むため、ファイルのDBで計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_audit.sqlite3')
+
+from django.conf import settings  # noqa: E402
+from django.db.models import Avg  # noqa: E402
+from django.db.models.functions import Length  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from schedule.audit import writer  # noqa: E402
+from schedule.models import AuditEntry, Schedule  # noqa: E402
+
+REPEAT = 300
+
+
+def main():
+    seed(users=10, projects=100, schedules_per_project=5)
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+    schedules = list(Schedule.objects.all()[:REPEAT])
+
+    def edit(i):
+        s = schedules[i % len(schedules)]
+        shift = timedelta(days=1 if (i // len(schedules)) % 2 == 0 else -1)
+        s.start_date += shift
+        s.end_date += shift
+        response = client.post(f'/schedule/schedules/{s.pk}/edit/', {
+            'project': s.project_id, 'field': s.field_id, 'description': s.description,
+            'start_date': s.start_date.isoformat(), 'end_date': s.end_date.isoformat(),
+            'version': s.version,
+        })
+        # 保存できなければ（検証エラー・競合）リダイレクトしない。失敗を計測しないよう止める
+        if response.status_code != 302:
+            raise SystemExit(f'スケジュール {s.pk} の編集が保存されませんでした（{response.status_code}）')
+
+    # 時間経過による揺らぎを避けるため、2方式を1リクエスト毎に交互に計測する
+    modes = [('同期（コミット時に INSERT）', False), ('非同期（バッチ INSERT）', True)]
+    samples = {label: [] for label, _ in modes}
+    for i in range(REPEAT * 2):
+        label, async_mode = modes[i % 2]
+        settings.AUDIT_ASYNC = async_mode
+        samples[label].append(measure(lambda: edit(i), repeat=1)[0])
+        # 保存で進んだバージョンを読み直す（計測の外で行う）
+        schedules[i % len(schedules)].refresh_from_db(fields=['version'])
+    print(f'{"方式":<24}{"平均 ms":>10}{"中央値 ms":>10}')
+    for label, _ in modes:
+        print(f'{label:<24}{statistics.mean(samples[label]):>10.2f}{statistics.median(samples[label]):>10.2f}')
+
+    began = time.perf_counter()
+    while writer.pending():
+        time.sleep(0.01)
+    time.sleep(settings.AUDIT_FLUSH_INTERVAL)
+    print(f'\nキューが空になるまで {(time.perf_counter() - began) * 1000:.0f} ms, '
+          f'バックグラウンド書き込み {writer.written}件, 溢れ {writer.overflowed}件')
+    size = AuditEntry.objects.filter(action='update').aggregate(size=Avg(Length('changes')))['size']
+    if size is None:
+        print(f'監査ログ {AuditEntry.objects.count()}件, 更新の監査ログはありません')
+    else:
+        print(f'監査ログ {AuditEntry.objects.count()}件, 変更内容の平均 {size:.0f} 文字')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""リクエスト毎のセッション・認証オーバーヘッドを計測する
+
+    python -m benchmarks.bench_auth
+
+SessionMiddleware + AuthenticationMiddleware だけを通し、
+セッションエンジンとユーザーキャッシュの組み合わせ毎に所要時間とクエリ数を比較する。
+"""
+from contextlib import ExitStack
+
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.middleware import AuthenticationMiddleware  # noqa: E402
+from django.contrib.sessions.middleware import SessionMiddleware  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from accounts.backends import clear_user_cache  # noqa: E402
+
+CONFIGS = [
+    # (ラベル, セッションエンジン, ユーザーキャッシュ秒数)
+    ('before: db / キャッシュなし', 'db', 0),
+    ('db / ユーザーキャッシュ', 'db', 30),
+    ('cached_db / ユーザーキャッシュ', 'cached_db', 30),
+    ('signed_cookies / ユーザーキャッシュ', 'signed_cookies', 30),
+]
+
+
+def view(request):
+    return HttpResponse('ok' if request.user.is_authenticated else 'anon')
+
+
+def run(label, engine, timeout):
+    with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[engine],
+                           AUTH_USER_CACHE_TIMEOUT=timeout):
+        clear_user_cache()
+        client = Client()
+        client.login(username='bench_manager', password='bench-pass')
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        handler = SessionMiddleware(AuthenticationMiddleware(view))
+        factory = RequestFactory()
+
+        def one_request():
+            request = factory.get('/schedule/projects/')
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+            response = handler(request)
+            assert response.content == b'ok'
+
+        one_request()  # ウォームアップ
+        # セッションは別ファイルの接続（sessions）に置くため、全ての接続のクエリを数える
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(c)) for c in connections.all()]
+            one_request()
+        queries = sum(len(ctx.captured_queries) for ctx in contexts)
+        mean, median = measure(one_request, repeat=500)
+        print(f'{label:<40} {mean:8.3f} ms  {median:8.3f} ms  {queries:>3}')
+
+
+if __name__ == '__main__':
+    seed(users=5, projects=1, schedules_per_project=1)
+    print(f'{"構成":<40} {"平均":>8}     {"中央値":>8}     クエリ数')
+    for config in CONFIGS:
+        run(*config)
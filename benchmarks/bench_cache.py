@@ -0,0 +1,95 @@
+"""キャッシュ（schedule.caching）のバックエンド毎の取得時間と、再計算の一本化の効果を計測する
+
+    python -m benchmarks.bench_cache
+
+locmem・ファイル・DB の各バックエンドで、素の cache.get() と名前空間経由の取得（世代番号の参照を含む）を比べ、
+キャッシュが空の状態でヒートマップを16スレッドから同時に要求したときの計算回数と所要時間を示す。
+"""
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks._setup import measure, seed, setup_django
+
+# スレッドから同じDBを読むため、ファイルのDBで計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_cache.sqlite3')
+
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import close_old_connections  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from schedule.caching import stats  # noqa: E402
+from schedule.heatmap import build_heatmap, heatmap_cache  # noqa: E402
+from scheduleapp.db import route_for  # noqa: E402
+
+THREADS = 16
+BACKENDS = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()},
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'bench_cache'},
+}
+
+
+def concurrent(func):
+    """func を THREADS スレッドから同時に呼び、全て終わるまでの時間（ミリ秒）"""
+    barrier = threading.Barrier(THREADS)
+
+    def run():
+        barrier.wait()
+        try:
+            func()
+        finally:
+            close_old_connections()
+
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - began) * 1000
+
+
+def main():
+    start = date.today().replace(day=1)
+    end = start + timedelta(days=90)
+    seed(users=50, projects=2000, schedules_per_project=4, start=start)
+
+    print(f'{"バックエンド":<10}{"cache.get":>12}{"名前空間":>10}{"一本化なし":>20}{"一本化あり":>20}')
+    for name, conf in BACKENDS.items():
+        with override_settings(CACHES={'default': conf}):
+            if name == 'db':
+                # キャッシュのテーブルは DATABASE_ROUTES の接続（auxiliary）に作る
+                call_command('createcachetable', database=route_for('django_cache') or 'default', verbosity=0)
+            cache.set('bench', 'value')
+            heatmap_cache.set('bench', value='value')
+            raw = measure(lambda: cache.get('bench'), repeat=500)[1]
+            facade = measure(lambda: heatmap_cache.get('bench'), repeat=500)[1]
+
+            # 一本化なし：各スレッドがキャッシュを確認し、無ければそれぞれ計算して保存する
+            cache.clear()
+            computes = []
+
+            def naive():
+                key = f'naive:{start}:{end}'
+                if cache.get(key) is None:
+                    computes.append(1)
+                    cache.set(key, build_heatmap('assignee', start, end))
+
+            naive_ms = concurrent(naive)
+            naive_computes = len(computes)
+
+            cache.clear()
+            stats.reset()
+            flight_ms = concurrent(lambda: heatmap_cache.get_or_set(
+                'bench', start, end, compute=lambda: build_heatmap('assignee', start, end)))
+            flight_computes = stats.snapshot()['heatmap']['computes']
+            print(f'{name:<10}{raw * 1000:>10.1f}us{facade * 1000:>8.1f}us'
+                  f'{naive_ms:>10.0f} ms / {naive_computes:>2}回{flight_ms:>10.0f} ms / {flight_computes:>2}回')
+
+
+if __name__ == '__main__':
+    main()
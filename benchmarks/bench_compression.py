@@ -0,0 +1,62 @@
+"""カレンダーHTMLとスケジュールAPIの圧縮サイズ・CPUコストを計測する
+
+    python -m benchmarks.bench_compression
+
+データ量を変えて月表示カレンダーと schedule_api を取得し、
+非圧縮・gzip・brotli それぞれの転送サイズと圧縮時間を比較する。
+"""
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from scheduleapp.middleware import brotli, compress_bytes  # noqa: E402
+
+SIZES = [
+    # (案件数, 案件あたりのスケジュール数)
+    (50, 4),
+    (200, 5),
+    (800, 5),
+]
+TARGETS = [
+    ('calendar', '/schedule/calendar/'),
+    ('schedule_api', '/schedule/api/schedules/'),
+]
+
+
+def reset_data():
+    from accounts.models import CustomUser
+    from schedule.models import Field, Project, Schedule
+    Schedule.objects.all().delete()
+    Project.objects.all().delete()
+    Field.objects.all().delete()
+    CustomUser.objects.all().delete()
+
+
+def main():
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    header = f'{"対象":<14}{"件数":>7}{"非圧縮":>12}'
+    for encoding in encodings:
+        header += f'{encoding:>12}{"比率":>8}{"ms":>8}'
+    print(header)
+    for projects, per_project in SIZES:
+        reset_data()
+        seed(users=20, projects=projects, schedules_per_project=per_project)
+        connection.close()
+        client = Client()
+        client.login(username='bench_manager', password='bench-pass')
+        for label, url in TARGETS:
+            # ミドルウェアでの圧縮を避けるため Accept-Encoding を付けずに取得する
+            raw = client.get(url).content
+            row = f'{label:<14}{projects * per_project:>7}{len(raw):>12,}'
+            for encoding in encodings:
+                compressed = compress_bytes(raw, encoding)
+                mean, _ = measure(lambda: compress_bytes(raw, encoding), repeat=20)
+                row += f'{len(compressed):>12,}{len(compressed) / len(raw):>8.1%}{mean:>8.2f}'
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
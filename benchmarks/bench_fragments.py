@@ -0,0 +1,68 @@
+"""ページ全体の描画と部分描画（?fragment=）の応答時間・サイズ・クエリ数を比較する
+
+    python -m benchmarks.bench_fragments
+
+カレンダーのフィルタ適用・期間移動、案件詳細のスケジュール表の差し替え、完了切替後の1行の差し替えについて、
+ページ全体を返す場合と差し替える部分だけを返す場合を比べる。
+"""
+import tempfile
+from pathlib import Path
+
+from benchmarks._setup import measure, seed, setup_django
+
+# 完了切替で監査ログのバックグラウンド書き込みが動くため、ファイルのDBで計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_fragments.sqlite3')
+
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from schedule.models import Schedule  # noqa: E402
+
+PROJECTS = 500
+SCHEDULES_PER_PROJECT = 4
+
+
+def count_queries(request):
+    """request() の実行中に発行されたクエリ数と応答を返す（request_started で消える queries_log は使わない）"""
+    count = 0
+
+    def wrapper(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        response = request()
+    return count, response
+
+
+def main():
+    _, members = seed(users=30, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT)
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+    schedule = Schedule.objects.select_related('project').first()
+    project_url = f'/schedule/projects/{schedule.project_id}/'
+    complete_url = f'/schedule/schedules/{schedule.pk}/complete/'
+    week = f'/schedule/calendar/?scope=week&assigned_to={members[1].pk}'
+
+    rows = [
+        ('カレンダー（月）', lambda: client.get('/schedule/calendar/')),
+        ('  部分描画', lambda: client.get('/schedule/calendar/?fragment=calendar')),
+        ('カレンダー（週・担当者）', lambda: client.get(week)),
+        ('  部分描画', lambda: client.get(week + '&fragment=calendar')),
+        ('案件詳細', lambda: client.get(project_url)),
+        ('  スケジュール表のみ', lambda: client.get(project_url + '?fragment=schedules')),
+        ('完了切替（リダイレクト後に再描画）', lambda: client.get(complete_url, follow=True)),
+        ('  1行のみ', lambda: client.post(complete_url + '?fragment=row')),
+    ]
+    print(f'案件 {PROJECTS:,}件 / スケジュール {PROJECTS * SCHEDULES_PER_PROJECT:,}件')
+    print(f'{"処理":<28}{"中央値 ms":>10}{"bytes":>12}{"クエリ":>8}')
+    for label, request in rows:
+        request()  # 初回のみのステータス更新等を除くため、1回空打ちしてから数える
+        queries, response = count_queries(request)
+        median = measure(request, repeat=10)[1]
+        print(f'{label:<28}{median:>10.2f}{len(response.content):>12,}{queries:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""ガントチャートの描画時間とキャッシュの効果を計測する
+
+    python -m benchmarks.bench_gantt
+
+全件描画・キャッシュ済み・スケジュールを数件更新した後の差し替えを比較する。
+差し替えでは変更フィードから影響のある案件の行だけを取り直す。
+"""
+from datetime import date, timedelta
+
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.core.cache import cache  # noqa: E402
+
+from schedule.gantt import render_gantt  # noqa: E402
+from schedule.models import Schedule  # noqa: E402
+
+PROJECTS = 2000
+SCHEDULES_PER_PROJECT = 5
+DAYS = 90
+CHANGES = [1, 20, 200]
+
+
+def touch(schedules, count):
+    """count 件のスケジュールの終了日を1日延ばす（シグナル経由で変更フィードに記録）"""
+    for s in schedules[:count]:
+        s.end_date += timedelta(days=1)
+        s.save()
+
+
+def main():
+    start = date.today().replace(day=1)
+    end = start + timedelta(days=DAYS - 1)
+    manager, _ = seed(users=30, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT, start=start)
+    schedules = list(Schedule.objects.select_related('project')[:max(CHANGES)])
+
+    svg = render_gantt(manager, start, end)
+    print(f'案件 {PROJECTS:,}件 / スケジュール {PROJECTS * SCHEDULES_PER_PROJECT:,}件 / {DAYS}日, SVG {len(svg):,} bytes')
+    print(f'{"処理":<28}{"中央値 ms":>10}')
+    full = measure(lambda: (cache.clear(), render_gantt(manager, start, end)), repeat=5)[1]
+    print(f'{"全件描画（キャッシュなし）":<28}{full:>10.2f}')
+    cached = measure(lambda: render_gantt(manager, start, end), repeat=50)[1]
+    print(f'{"キャッシュ済み":<28}{cached:>10.2f}')
+    for count in CHANGES:
+        samples = []
+        for _ in range(3):
+            render_gantt(manager, start, end)
+            touch(schedules, count)
+            samples.append(measure(lambda: render_gantt(manager, start, end), repeat=1)[1])
+        label = f'{count}件更新後の差し替え'
+        print(f'{label:<28}{sorted(samples)[1]:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
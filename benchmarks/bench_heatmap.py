@@ -0,0 +1,84 @@
+"""負荷ヒートマップの計算時間を計測する
+
+    python -m benchmarks.bench_heatmap
+
+500人・365日分の担当者 × 日の行列を差分配列で求め、1日ずつ数えるループと結果を突き合わせた上で、
+行列の計算・グリッド作成・キャッシュ済みの取得・JSON レスポンスの時間を比較する。
+"""
+from datetime import date, timedelta
+
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from schedule.heatmap import build_heatmap, get_heatmap, load_matrix  # noqa: E402
+from schedule.models import Schedule  # noqa: E402
+from schedule.workdays import is_workday  # noqa: E402
+
+USERS = 500
+PROJECTS = 5000
+SCHEDULES_PER_PROJECT = 4
+DAYS = 365
+
+
+def loop_matrix(start, end):
+    """担当者毎に1日ずつ同時スケジュール数を数える（比較用）"""
+    schedules = list(Schedule.objects.filter(start_date__lte=end, end_date__gte=start)
+                     .values_list('project__assigned_to_id', 'start_date', 'end_date'))
+    result = {}
+    d = start
+    while d <= end:
+        workday = is_workday(d)
+        for user_id, begin, finish in schedules:
+            row = result.setdefault(user_id, [0] * DAYS)
+            if workday and begin <= d <= finish:
+                row[(d - start).days] += 1
+        d += timedelta(days=1)
+    return result
+
+
+def main():
+    # 500人分のユーザー作成を速くするため、計測対象外のパスワードハッシュは軽量なものにする
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    start = date.today().replace(month=1, day=1)
+    end = start + timedelta(days=DAYS - 1)
+    seed(users=USERS, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT, start=start)
+    # seed は月初付近に集中するため、1年に散らす
+    schedules = list(Schedule.objects.all())
+    for i, s in enumerate(schedules):
+        offset = timedelta(days=(i * 37) % 330)
+        s.start_date += offset
+        s.end_date += offset
+    Schedule.objects.bulk_update(schedules, ['start_date', 'end_date'], batch_size=2000)
+
+    row_ids, matrix = load_matrix('assignee', start, end)
+    expected = loop_matrix(start, end)
+    assert sorted(expected) == row_ids.tolist()
+    for row_id, counts in zip(row_ids.tolist(), matrix.tolist()):
+        assert expected[row_id] == counts, row_id
+    print(f'検証OK: {len(row_ids)}人 × {DAYS}日, スケジュール {len(schedules):,}件')
+
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+    url = f'/schedule/heatmap/?group=assignee&start={start.isoformat()}&days={DAYS}'
+    rows = [
+        ('loop（1日ずつ）', measure(lambda: loop_matrix(start, end), repeat=1)),
+        ('行列（差分配列）', measure(lambda: load_matrix('assignee', start, end), repeat=20)),
+        ('グリッド作成', measure(lambda: build_heatmap('assignee', start, end), repeat=20)),
+        ('キャッシュ済み', measure(lambda: get_heatmap('assignee', start, end), repeat=20)),
+        ('JSON レスポンス', measure(lambda: client.get(url + '&format=json'), repeat=10)),
+        ('HTML レスポンス', measure(lambda: client.get(url), repeat=5)),
+    ]
+    cache.clear()
+    rows.append(('JSON（キャッシュなし）', measure(lambda: (cache.clear(), client.get(url + '&format=json')), repeat=10)))
+    print(f'{"処理":<22}{"平均 ms":>10}{"中央値 ms":>10}')
+    for label, (mean, median) in rows:
+        print(f'{label:<22}{mean:>10.2f}{median:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""過去の時点の計画の復元時間を計測する
+
+    python -m benchmarks.bench_history
+
+チェックポイント作成後の変更件数を変えて schedules_as_of の時間を計測し、
+チェックポイントの作成時間と圧縮後のサイズも示す。
+"""
+from datetime import timedelta
+
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from schedule.history import create_checkpoint, schedules_as_of  # noqa: E402
+from schedule.models import Schedule, ScheduleCheckpoint  # noqa: E402
+
+PROJECTS = 2000
+SCHEDULES_PER_PROJECT = 5
+CHANGES = [0, 100, 1000, 5000]
+
+
+def main():
+    settings.AUDIT_ASYNC = False
+    seed(users=30, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT)
+    schedules = list(Schedule.objects.all())
+    create_time = measure(create_checkpoint, repeat=5)[1]
+    checkpoint = ScheduleCheckpoint.objects.order_by('-taken_at').first()
+    print(f'スケジュール {len(schedules):,}件: チェックポイント作成 {create_time:.2f} ms, '
+          f'{len(checkpoint.data) / 1024:.0f} KB（{len(checkpoint.data) / len(schedules):.1f} bytes/件）')
+    print(f'{"チェックポイント後の変更":<16}{"復元 中央値 ms":>16}')
+    done = 0
+    for count in CHANGES:
+        for s in schedules[done:count]:
+            s.end_date += timedelta(days=1)
+            s.save()
+        done = max(done, count)
+        as_of = timezone.now()
+        state, applied = schedules_as_of(as_of)
+        assert applied == count and len(state) == len(schedules)
+        print(f'{count:<16,}{measure(lambda: schedules_as_of(as_of), repeat=10)[1]:>16.2f}')
+
+
+if __name__ == '__main__':
+    main()
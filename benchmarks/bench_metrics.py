@@ -0,0 +1,59 @@
+"""メトリクス（scheduleapp.metrics）の計測の負荷と /metrics の取得時間を計測する
+
+    python -m benchmarks.bench_metrics
+
+MetricsMiddleware の有無でのページの応答時間と、状態毎の件数を StatusCount から読む場合と
+取得毎に COUNT で数え直す場合の /metrics の取得時間を比べる。
+"""
+import tempfile
+from pathlib import Path
+
+from benchmarks._setup import measure, seed, setup_django
+
+# 完了切替等で監査ログのバックグラウンド書き込みが動くため、ファイルのDBで計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_metrics.sqlite3')
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from schedule.models import Project  # noqa: E402
+from schedule.status_counts import actual_counts, recount, status_counts  # noqa: E402
+
+PROJECTS = 1000
+SCHEDULES_PER_PROJECT = 4
+
+
+def main():
+    seed(users=50, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT)
+    # seed は bulk_create で作るため件数を数え直しておく
+    recount()
+    assert status_counts() == actual_counts()
+
+    without = [name for name in settings.MIDDLEWARE if name != 'scheduleapp.metrics.MetricsMiddleware']
+    # 計測自体の負荷を見るため、応答の速いページで比べる
+    pages = ['/accounts/login/', '/accounts/profile/', f'/schedule/projects/{Project.objects.first().pk}/']
+    print(f'案件 {PROJECTS:,}件 / スケジュール {PROJECTS * SCHEDULES_PER_PROJECT:,}件')
+    print(f'{"ページ":<24}{"計測なし ms":>12}{"計測あり ms":>12}')
+    for url in pages:
+        medians = []
+        for middleware in (without, settings.MIDDLEWARE):
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                client.login(username='bench_manager', password='bench-pass')
+                client.get(url)
+                medians.append(measure(lambda: client.get(url), repeat=20)[1])
+        print(f'{url:<24}{medians[0]:>12.2f}{medians[1]:>12.2f}')
+
+    client = Client()
+    rows = [
+        ('/metrics', measure(lambda: client.get('/metrics'), repeat=20)),
+        ('  件数: StatusCount', measure(status_counts, repeat=50)),
+        ('  参考: COUNT で数え直し', measure(actual_counts, repeat=50)),
+    ]
+    print(f'{"処理":<24}{"平均 ms":>12}{"中央値 ms":>12}')
+    for label, (mean, median) in rows:
+        print(f'{label:<24}{mean:>12.2f}{median:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
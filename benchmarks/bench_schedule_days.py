@@ -0,0 +1,125 @@
+"""ScheduleDay（稼働日毎の展開）の容量と検索速度を計測する
+
+    python -m benchmarks.bench_schedule_days
+
+データ量を変えて、Schedule の期間による範囲検索と ScheduleDay のインデックス検索で
+「ある日の担当状況」「担当者の1か月分」「日毎の稼働人数」を比較し、
+両テーブル（インデックス込み）の容量を SQLite の dbstat で集計する。
+"""
+from datetime import date, timedelta
+
+from benchmarks._setup import measure, seed, setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+
+from schedule.models import Schedule, ScheduleDay  # noqa: E402
+from schedule.occupancy import daily_headcounts, rebuild_schedule_days  # noqa: E402
+
+SIZES = [
+    # (案件数, 案件あたりのスケジュール数)
+    (200, 5),
+    (1000, 5),
+    (4000, 5),
+]
+
+
+def reset_data():
+    from accounts.models import CustomUser
+    from schedule.models import Field, Project
+    Schedule.objects.all().delete()
+    Project.objects.all().delete()
+    Field.objects.all().delete()
+    CustomUser.objects.all().delete()
+
+
+def table_bytes(table):
+    """テーブルとそのインデックスの使用バイト数"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT SUM(pgsize) FROM dbstat WHERE name = %s '
+            'OR name IN (SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+            [table, 'index', table],
+        )
+        return cursor.fetchone()[0] or 0
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return ' / '.join(row[-1] for row in cursor.fetchall())
+
+
+def range_day(d):
+    return list(
+        Schedule.objects.filter(start_date__lte=d, end_date__gte=d)
+        .values_list('id', 'project__assigned_to_id')
+    )
+
+
+def indexed_day(d):
+    return list(ScheduleDay.objects.filter(date=d).values_list('schedule_id', 'assignee_id'))
+
+
+def range_assignee(user_id, start, end):
+    return list(
+        Schedule.objects.filter(Q(start_date__lte=end) & Q(end_date__gte=start), project__assigned_to_id=user_id)
+        .values_list('id', 'start_date', 'end_date')
+    )
+
+
+def indexed_assignee(user_id, start, end):
+    return list(
+        ScheduleDay.objects.filter(date__range=(start, end), assignee_id=user_id)
+        .values_list('schedule_id', 'date')
+    )
+
+
+def range_headcounts(start, end):
+    """期間の重なるスケジュールを取得し、日毎の担当者数を Python で数える"""
+    rows = Schedule.objects.filter(start_date__lte=end, end_date__gte=start)\
+        .values_list('start_date', 'end_date', 'project__assigned_to_id')
+    days = {}
+    for begin, finish, user_id in rows:
+        d = max(begin, start)
+        while d <= min(finish, end):
+            days.setdefault(d, set()).add(user_id)
+            d += timedelta(days=1)
+    return {d: len(users) for d, users in days.items()}
+
+
+def main():
+    start = date.today().replace(day=1)
+    month_end = start + timedelta(days=30)
+    probe = start + timedelta(days=10)
+    print(f'{"件数":>7}{"展開行":>9}{"Schedule KB":>13}{"ScheduleDay KB":>16}'
+          f'{"1日 範囲":>10}{"索引":>8}{"担当者 範囲":>12}{"索引":>8}{"人数 範囲":>11}{"索引":>8}  (ms)')
+    for projects, per_project in SIZES:
+        reset_data()
+        _, members = seed(users=40, projects=projects, schedules_per_project=per_project, start=start)
+        rows = rebuild_schedule_days()
+        user_id = members[1].pk
+        timings = [
+            measure(lambda: range_day(probe), repeat=50)[1],
+            measure(lambda: indexed_day(probe), repeat=50)[1],
+            measure(lambda: range_assignee(user_id, start, month_end), repeat=50)[1],
+            measure(lambda: indexed_assignee(user_id, start, month_end), repeat=50)[1],
+            measure(lambda: range_headcounts(start, month_end), repeat=10)[1],
+            measure(lambda: daily_headcounts(start, month_end), repeat=10)[1],
+        ]
+        print(f'{projects * per_project:>7}{rows:>9}'
+              f'{table_bytes("schedule_schedule") / 1024:>13.0f}{table_bytes("schedule_scheduleday") / 1024:>16.0f}'
+              f'{timings[0]:>10.2f}{timings[1]:>8.2f}{timings[2]:>12.2f}{timings[3]:>8.2f}'
+              f'{timings[4]:>11.2f}{timings[5]:>8.2f}')
+    print()
+    print('1日の検索:', query_plan(ScheduleDay.objects.filter(date=probe).values_list('schedule_id', 'assignee_id')))
+    print('担当者の検索:', query_plan(
+        ScheduleDay.objects.filter(date__range=(start, month_end), assignee_id=1).values_list('schedule_id', 'date')
+    ))
+
+
+if __name__ == '__main__':
+    main()
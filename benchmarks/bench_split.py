@@ -0,0 +1,148 @@
+"""補助テーブルの別ファイル化（SQLITE_SPLIT）による業務テーブルの書き込み待ちの違いを比較する
+
+    python -m benchmarks.bench_split
+
+ログインの集中（セッションの作成・削除）と監査ログの書き込みを続けるスレッドと、スケジュールを保存する
+スレッドを同時に DURATION 秒動かし、全て db.sqlite3 に置く場合（SQLITE_SPLIT=0）と
+セッション・監査ログ等を別ファイルに置く場合（SQLITE_SPLIT=1）で、ログイン・スケジュールの保存の件数・応答時間と、
+db.sqlite3 の書き込みロックを待った時間（合計と1件あたり）を示す。ログイン時の last_login の更新は
+別ファイル化しても db.sqlite3 に書く。設定は起動時に決まるため、子プロセスで計測する。
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SPLITS = ('0', '1')
+LOGINS = 8
+WRITERS = 2
+DURATION = 5.0
+
+
+def run_split():
+    """子プロセス側: 現在の SQLITE_SPLIT で計測し、結果を JSON で出力する"""
+    from benchmarks._setup import seed, setup_django
+
+    setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_split.sqlite3')
+
+    from django.conf import settings
+    from django.db import close_old_connections, connections, transaction
+    from django.test import Client
+
+    from schedule.jobs import roll_over_statuses
+    from schedule.models import Schedule
+
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    _, members = seed(users=20, projects=300, schedules_per_project=4)
+    roll_over_statuses()
+    schedule_ids = list(Schedule.objects.values_list('pk', flat=True)[:200])
+
+    results = {'logins': 0, 'writes': [], 'errors': 0, 'lock_wait': 0.0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(LOGINS + WRITERS + 1)
+    deadline = []
+
+    def measure_begin(execute, sql, params, many, context):
+        # db.sqlite3 の書き込みロックの取得（BEGIN IMMEDIATE）に掛かった時間を積算する
+        if not sql.startswith('BEGIN'):
+            return execute(sql, params, many, context)
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with lock:
+                results['lock_wait'] += time.perf_counter() - began
+
+    def login(index):
+        barrier.wait()
+        i = index
+        with connections['default'].execute_wrapper(measure_begin):
+            while time.perf_counter() < deadline[0]:
+                client = Client()
+                try:
+                    ok = client.login(username=members[i % len(members)].username, password='bench-pass')
+                    client.logout()
+                except Exception:
+                    ok = False
+                with lock:
+                    if ok:
+                        results['logins'] += 1
+                    else:
+                        results['errors'] += 1
+                i += 1
+        close_old_connections()
+
+    def writer(index):
+        barrier.wait()
+        i = index
+        with connections['default'].execute_wrapper(measure_begin):
+            while time.perf_counter() < deadline[0]:
+                began = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        schedule = Schedule.objects.select_related('project').get(
+                            pk=schedule_ids[i % len(schedule_ids)]
+                        )
+                        schedule.description = f'更新 {i}'
+                        schedule.save()
+                    ok = True
+                except Exception:
+                    ok = False
+                elapsed = (time.perf_counter() - began) * 1000
+                with lock:
+                    if ok:
+                        results['writes'].append(elapsed)
+                    else:
+                        results['errors'] += 1
+                i += 1
+        close_old_connections()
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(LOGINS)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    deadline.append(time.perf_counter() + DURATION)
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    writes = results['writes']
+    print(json.dumps({
+        'databases': sorted(alias for alias in settings.DATABASES if alias != 'replica'),
+        'logins': results['logins'],
+        'writes': len(writes),
+        'errors': results['errors'],
+        'write_median': statistics.median(writes) if writes else 0,
+        'write_p95': statistics.quantiles(writes, n=20)[-1] if len(writes) >= 2 else 0,
+        'lock_wait': results['lock_wait'],
+    }))
+
+
+def main():
+    print(f'ログイン {LOGINS}スレッド / スケジュールの保存 {WRITERS}スレッド / {DURATION:.0f}秒')
+    print(f'{"別ファイル化":<12}{"ログイン/秒":>12}{"保存/秒":>10}{"保存 中央値 ms":>16}{"保存 p95 ms":>14}'
+          f'{"ロック待ち 秒":>14}{"1件あたり ms":>14}{"エラー":>8}  接続')
+    for split in SPLITS:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_split', '--child'],
+            env=dict(os.environ, SQLITE_SPLIT=split), capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        # ログイン・保存の1件あたりの db.sqlite3 のロック待ち
+        per_operation = result['lock_wait'] * 1000 / max(result['logins'] + result['writes'], 1)
+        print(f'{"あり" if split == "1" else "なし":<12}{result["logins"] / DURATION:>12.1f}'
+              f'{result["writes"] / DURATION:>10.1f}{result["write_median"]:>16.1f}{result["write_p95"]:>14.1f}'
+              f'{result["lock_wait"]:>14.2f}{per_operation:>14.2f}{result["errors"]:>8}'
+              f'  {", ".join(result["databases"])}')
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        run_split()
+    else:
+        main()
@@ -0,0 +1,144 @@
+"""SQLite の接続設定（SQLITE_PROFILE）による読み書き混在時のスループットを比較する
+
+    python -m benchmarks.bench_sqlite
+
+Django の既定のまま（SQLITE_PROFILE=default）と運用設定（production: WAL・PRAGMA・読み取り専用接続への
+振り分け・ロック時の再試行）で、読み取りのスレッド（案件詳細・カレンダーの GET）と
+書き込みのスレッド（スケジュールの保存）を同時に DURATION 秒動かし、処理件数・エラー数・応答時間を示す。
+設定は起動時に決まるため、プロファイル毎に子プロセスで計測する。
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROFILES = ('default', 'production')
+READERS = 8
+WRITERS = 4
+DURATION = 5.0
+
+
+def run_profile():
+    """子プロセス側: 現在の SQLITE_PROFILE で計測し、結果を JSON で出力する"""
+    from benchmarks._setup import seed, setup_django
+
+    setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_sqlite.sqlite3')
+
+    from django.conf import settings
+    from django.db import close_old_connections, connection, transaction
+    from django.test import Client
+
+    from schedule.jobs import roll_over_statuses
+    from schedule.models import Schedule
+
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    seed(users=20, projects=300, schedules_per_project=4)
+    # 表示時のステータス更新（書き込み）が起きないよう、日付によるステータスを先に反映しておく
+    roll_over_statuses()
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    project_ids = list(Schedule.objects.values_list('project_id', flat=True).distinct()[:50])
+    schedule_ids = list(Schedule.objects.values_list('pk', flat=True)[:200])
+
+    results = {'reads': [], 'writes': [], 'errors': 0}
+    lock = threading.Lock()
+    # ログインが済んでから全スレッド同時に始める（メインスレッドも待ち合わせて終了時刻を決める）
+    barrier = threading.Barrier(READERS + WRITERS + 1)
+    deadline = []
+
+    def reader(index):
+        client = Client()
+        client.login(username='bench_manager', password='bench-pass')
+        urls = [f'/schedule/projects/{pk}/' for pk in project_ids] + ['/schedule/calendar/?scope=week']
+        barrier.wait()
+        i = index
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            try:
+                status = client.get(urls[i % len(urls)]).status_code
+            except Exception as e:
+                print('R', repr(e)[:200], file=sys.stderr)
+                status = None
+            elapsed = (time.perf_counter() - began) * 1000
+            with lock:
+                if status != 200 and status: print('S', status, file=sys.stderr)
+                if status == 200:
+                    results['reads'].append(elapsed)
+                else:
+                    results['errors'] += 1
+            i += 1
+        close_old_connections()
+
+    def writer(index):
+        barrier.wait()
+        i = index
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    schedule = Schedule.objects.select_related('project').get(pk=schedule_ids[i % len(schedule_ids)])
+                    schedule.description = f'更新 {i}'
+                    schedule.save()
+                ok = True
+            except Exception as e:
+                import traceback; print('W', repr(e)[:200], file=sys.stderr)
+                ok = False
+            elapsed = (time.perf_counter() - began) * 1000
+            with lock:
+                if ok:
+                    results['writes'].append(elapsed)
+                else:
+                    results['errors'] += 1
+            i += 1
+        close_old_connections()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    while barrier.n_waiting < READERS + WRITERS:
+        time.sleep(0.01)
+    deadline.append(time.perf_counter() + DURATION)
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    def p95(samples):
+        return statistics.quantiles(samples, n=20)[-1] if len(samples) >= 2 else 0
+
+    print(json.dumps({
+        'journal_mode': journal_mode,
+        'reads': len(results['reads']),
+        'writes': len(results['writes']),
+        'errors': results['errors'],
+        'read_p95': p95(results['reads']),
+        'write_p95': p95(results['writes']),
+    }))
+
+
+def main():
+    print(f'読み取り {READERS}スレッド / 書き込み {WRITERS}スレッド / {DURATION:.0f}秒')
+    print(f'{"プロファイル":<14}{"journal":>8}{"読み取り/秒":>12}{"書き込み/秒":>12}{"エラー":>8}'
+          f'{"読み p95 ms":>12}{"書き p95 ms":>12}')
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_sqlite', '--child'],
+            env=dict(os.environ, SQLITE_PROFILE=profile), capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{profile:<14}{result["journal_mode"]:>8}{result["reads"] / DURATION:>12.1f}'
+              f'{result["writes"] / DURATION:>12.1f}{result["errors"]:>8}'
+              f'{result["read_p95"]:>12.1f}{result["write_p95"]:>12.1f}')
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        run_profile()
+    else:
+        main()
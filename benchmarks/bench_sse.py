@@ -0,0 +1,110 @@
+"""SSE（変更通知）の同時接続ストレステスト
+
+    python -m benchmarks.bench_sse [接続数]
+
+ASGI アプリケーションを直接呼び出し、1プロセス・1イベントループ上で
+アイドル接続を多数張ったまま、通知1件の全接続への配信時間とメモリ使用量を計測する。
+"""
+import asyncio
+import resource
+import sys
+import threading
+import time
+
+from benchmarks._setup import seed, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from schedule.events import hub  # noqa: E402
+
+
+class Connection:
+    """ASGI の receive / send を模した疑似クライアント"""
+
+    def __init__(self, app, cookie):
+        self.app = app
+        self.cookie = cookie
+        self.status = None
+        self.chunks = []
+        self.opened = asyncio.Event()
+        self.received = asyncio.Event()
+        self.closed = asyncio.Event()
+        self._body_sent = False
+
+    def scope(self):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/schedule/api/events/',
+            'raw_path': b'/schedule/api/events/', 'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={self.cookie}'.encode()),
+            ],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+
+    async def receive(self):
+        if not self._body_sent:
+            self._body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if body.startswith(b'retry'):
+                self.opened.set()
+            elif body.startswith(b'event: change'):
+                self.received.set()
+            self.chunks.append(body)
+
+    async def run(self):
+        await self.app(self.scope(), self.receive, self.send)
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def login_cookie():
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+async def main(count, cookie):
+    app = get_asgi_application()
+
+    base_rss = rss_mb()
+    connections = [Connection(app, cookie) for _ in range(count)]
+    began = time.perf_counter()
+    tasks = [asyncio.create_task(conn.run()) for conn in connections]
+    await asyncio.gather(*(conn.opened.wait() for conn in connections))
+    connect_time = time.perf_counter() - began
+    print(f'接続数: {hub.subscriber_count()}  接続確立: {connect_time:.2f} s'
+          f'  最大RSS増分: {rss_mb() - base_rss:.1f} MB')
+
+    # 同期ビューのシグナルハンドラと同じく、別スレッドから配信する
+    event = {'type': 'change', 'kind': 'schedule', 'op': 'upsert', 'id': 1,
+             'project_id': 1, 'user_ids': []}
+    began = time.perf_counter()
+    threading.Thread(target=hub.publish, args=(event,)).start()
+    await asyncio.gather(*(conn.received.wait() for conn in connections))
+    print(f'全接続への配信: {(time.perf_counter() - began) * 1000:.1f} ms')
+
+    for conn in connections:
+        conn.closed.set()
+    await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=30)
+    print(f'切断後の購読数: {hub.subscriber_count()}')
+
+
+if __name__ == '__main__':
+    seed(users=3, projects=1, schedules_per_project=1)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000, login_cookie()))
@@ -0,0 +1,82 @@
+"""稼働日計算エンジンの検証と速度比較
+
+    python -m benchmarks.bench_workdays
+
+20年分の範囲で、序数配列による計算結果が1日ずつ判定するループ（is_workday）と
+一致することを確認した上で、数千件のスケジュールに対する一括計算と
+1件ずつのループの所要時間を比較する。
+"""
+import random
+from datetime import date, timedelta
+
+from benchmarks._setup import measure
+from schedule.workdays import (
+    add_workdays, add_workdays_batch, count_workdays, count_workdays_batch, is_workday,
+)
+
+FIRST = date(2015, 1, 1)
+LAST = date(2034, 12, 31)
+SHIFTS = [1, 5, 20, -1, -5, -20]
+SIZES = [1000, 5000, 20000]
+
+
+def loop_count(start, end):
+    """start〜end の稼働日数（1日ずつ判定）"""
+    count = 0
+    d = start
+    while d <= end:
+        count += is_workday(d)
+        d += timedelta(days=1)
+    return count
+
+
+def loop_add(d, n):
+    """d から n 稼働日後（1日ずつ判定）"""
+    step = timedelta(days=1 if n > 0 else -1)
+    remaining = abs(n)
+    while remaining:
+        d += step
+        remaining -= is_workday(d)
+    return d
+
+
+def verify():
+    """20年分の全日付について、エンジンとループの結果を突き合わせる"""
+    days = (LAST - FIRST).days + 1
+    flags = [is_workday(FIRST + timedelta(days=i)) for i in range(days)]
+    dates = [FIRST + timedelta(days=i) for i in range(days)]
+
+    # 先頭日からの稼働日数（ループ側は累積で求める）
+    expected, total = [], 0
+    for flag in flags:
+        total += flag
+        expected.append(total)
+    assert count_workdays_batch([FIRST] * days, dates) == expected
+    assert count_workdays(FIRST, LAST) == total
+
+    # 範囲の両端から外れない日付について n 稼働日後を比較
+    targets = dates[40:-40]
+    for n in SHIFTS:
+        expected = [loop_add(d, n) for d in targets]
+        assert add_workdays_batch(targets, n) == expected, n
+        assert add_workdays(targets[0], n) == expected[0]
+    print(f'検証OK: {FIRST}〜{LAST}（{days:,}日, 稼働日 {total:,}日）')
+
+
+def main():
+    verify()
+    rng = random.Random(0)
+    span = (LAST - FIRST).days - 400
+    print(f'{"件数":>7}{"稼働日数 loop":>16}{"batch":>10}{"n稼働日後 loop":>18}{"batch":>10}  (ms)')
+    for size in SIZES:
+        starts = [FIRST + timedelta(days=rng.randrange(span)) for _ in range(size)]
+        ends = [d + timedelta(days=rng.randrange(1, 60)) for d in starts]
+        count_loop, _ = measure(lambda: [loop_count(s, e) for s, e in zip(starts, ends)], repeat=1)
+        count_batch, _ = measure(lambda: count_workdays_batch(starts, ends), repeat=20)
+        add_loop, _ = measure(lambda: [loop_add(d, 10) for d in starts], repeat=1)
+        add_batch, _ = measure(lambda: add_workdays_batch(starts, 10), repeat=20)
+        print(f'{size:>7}{count_loop:>16.1f}{count_batch:>10.2f}{add_loop:>18.1f}{add_batch:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
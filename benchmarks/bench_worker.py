@@ -0,0 +1,50 @@
+"""バックグラウンドタスクのキューの処理性能を計測する
+
+    python -m benchmarks.bench_worker
+
+enqueue 1件あたりの時間と、並行数を変えたワーカーのスループット
+（I/O 待ちを模した 20ms のタスク）を比較する。
+"""
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks._setup import measure, setup_django
+
+# ワーカーのスレッドが同時に書き込むため、ファイルの DB で計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_worker.sqlite3')
+
+from worker.models import Task  # noqa: E402
+from worker.runner import Worker  # noqa: E402
+from worker.tasks import enqueue, task  # noqa: E402
+
+TASKS = 200
+CONCURRENCY = [1, 4, 8]
+
+
+@task('bench.sleep')
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def main():
+    mean, median = measure(lambda: enqueue('bench.sleep', 0), repeat=200)
+    print(f'enqueue: 平均 {mean:.2f} ms, 中央値 {median:.2f} ms')
+    print(f'{"並行数":<8}{"処理時間 s":>12}{"件/秒":>10}')
+    for concurrency in CONCURRENCY:
+        Task.objects.all().delete()
+        for _ in range(TASKS):
+            enqueue('bench.sleep', 0.02)
+        worker = Worker(concurrency=concurrency)
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while worker.run_once(executor):
+                pass
+        elapsed = time.perf_counter() - began
+        assert Task.objects.filter(name='bench.sleep', status='done').count() == TASKS
+        print(f'{concurrency:<8}{elapsed:>12.2f}{TASKS / elapsed:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
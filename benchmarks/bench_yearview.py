@@ -0,0 +1,75 @@
+"""年間表示（日付ビット列）の計算時間を計測する
+
+    python -m benchmarks.bench_yearview
+
+ビット列から求めた予定日・重複日を負荷ヒートマップの行列（同時スケジュール数が 1 以上・2 以上の日）と
+突き合わせた上で、ビット列の作成・キャッシュ済みの取得・年間表示の応答と、
+月表示カレンダーを12か月分描画する場合の時間を比較する。
+"""
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks._setup import measure, seed, setup_django
+
+# カレンダーの描画でステータス更新と監査ログのバックグラウンド書き込みが動くため、ファイルのDBで計測する
+setup_django(test_db_file=Path(tempfile.mkdtemp()) / 'bench_yearview.sqlite3')
+
+from django.conf import settings  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from schedule.heatmap import load_matrix  # noqa: E402
+from schedule.models import Schedule  # noqa: E402
+from schedule.yearview import build_year, get_year, load_bitsets, mask_bits  # noqa: E402
+
+USERS = 100
+PROJECTS = 2000
+SCHEDULES_PER_PROJECT = 4
+
+
+def main():
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    year = date.today().year
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    seed(users=USERS, projects=PROJECTS, schedules_per_project=SCHEDULES_PER_PROJECT, start=start)
+    # seed は月初付近に集中するため、1年に散らす
+    schedules = list(Schedule.objects.all())
+    for i, s in enumerate(schedules):
+        offset = timedelta(days=(i * 37) % 330)
+        s.start_date += offset
+        s.end_date += offset
+    Schedule.objects.bulk_update(schedules, ['start_date', 'end_date'], batch_size=2000)
+
+    _, bitsets = load_bitsets(year)
+    for group_by, rows in bitsets.items():
+        row_ids, matrix = load_matrix(group_by, start, end)
+        assert sorted(rows) == row_ids.tolist()
+        for row_id, counts in zip(row_ids.tolist(), matrix):
+            busy, overlap = rows[row_id]
+            assert busy == mask_bits(counts > 0) and overlap == mask_bits(counts > 1), (group_by, row_id)
+    print(f'検証OK: 担当者 {len(bitsets["assignee"])}人 / 分野 {len(bitsets["field"])}件, '
+          f'スケジュール {len(schedules):,}件')
+
+    client = Client()
+    client.login(username='bench_manager', password='bench-pass')
+
+    def twelve_months():
+        for month in range(1, 13):
+            client.get(f'/schedule/calendar/?year={year}&month={month}')
+
+    rows = [
+        ('ビット列の作成', measure(lambda: load_bitsets(year), repeat=10)),
+        ('集計込み（キャッシュなし）', measure(lambda: build_year(year), repeat=10)),
+        ('キャッシュ済み', measure(lambda: get_year(year), repeat=50)),
+        ('年間表示 HTML', measure(lambda: client.get(f'/schedule/year/?year={year}'), repeat=10)),
+        ('参考: ヒートマップ行列×2', measure(
+            lambda: (load_matrix('assignee', start, end), load_matrix('field', start, end)), repeat=10)),
+        ('参考: 月表示カレンダー×12', measure(twelve_months, repeat=1)),
+    ]
+    print(f'{"処理":<24}{"平均 ms":>10}{"中央値 ms":>10}')
+    for label, (mean, median) in rows:
+        print(f'{label:<24}{mean:>10.2f}{median:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Schedule
+from .models import AuditEntry, NotificationLog, Project, Schedule, ScheduleCheckpoint
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
@@ -9,6 +9,40 @@ class ProjectAdmin(admin.ModelAdmin):
 
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
-    list_display = ['project', 'field', 'start_date', 'end_date', 'duration_days']
+    list_display = ['project', 'field', 'start_date', 'end_date', 'duration_days', 'workdays']
     list_filter = ['field', 'start_date', 'end_date']
     search_fields = ['project__name', 'project__manufacturing_number']
+
+    @admin.display(description='稼働日数')
+    def workdays(self, obj):
+        return obj.workdays
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ['changed_at', 'kind', 'object_id', 'project_id', 'action', 'user_id', 'changes']
+    list_filter = ['kind', 'action', 'changed_at']
+    search_fields = ['object_id', 'project_id']
+
+    # 追記のみのため管理画面からは変更させない
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ScheduleCheckpoint)
+class ScheduleCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['taken_at', 'last_audit_id', 'schedule_count']
+    exclude = ['data']
+
+
+@admin.register(NotificationLog)
+class NotificationLogAdmin(admin.ModelAdmin):
+    list_display = ['sent_at', 'recipient_id', 'kind', 'object_id', 'target_date']
+    list_filter = ['kind', 'sent_at']
+    search_fields = ['recipient_id', 'object_id']
@@ -0,0 +1,280 @@
+"""案件・スケジュールの変更監査ログ
+
+保存時の差分（項目毎の [変更前, 変更後]）をコンパクトな JSON にしてプロセス内のキューへ積み、
+バックグラウンドのスレッドがまとめて bulk_create する。リクエスト側は DB 書き込みを待たない。
+- 変更前の値は DB から読み込んだ時点の値（Model.from_db で保持）を使い、追加のクエリは発行しない
+- キューは上限付き。溢れた場合は取りこぼさないよう呼び出し元でその場で書き込む
+- トランザクションが確定した変更のみ積み、プロセス終了時（atexit）に残りを書き出す
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import threading
+import time
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+# 監査対象の項目（attname）
+TRACKED_FIELDS = {
+    'project': (
+        'name', 'manufacturing_number', 'due_date', 'description', 'is_completed', 'completed_at',
+        'created_by_id', 'assigned_to_id', 'department',
+    ),
+    'schedule': (
+        'project_id', 'field_id', 'start_date', 'end_date', 'status', 'completed_at', 'description',
+    ),
+}
+
+# 変更を行ったユーザー（AuditUserMiddleware がリクエスト毎に設定）
+_current_user = contextvars.ContextVar('audit_user', default=None)
+
+
+def current_user_id():
+    user = _current_user.get()
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class AuditUserMiddleware:
+    """リクエストのユーザーを監査ログの変更者として記録するミドルウェア"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            from asgiref.sync import markcoroutinefunction
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current_user.set(getattr(request, 'user', None))
+        try:
+            return self.get_response(request)
+        finally:
+            _current_user.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_user.set(getattr(request, 'user', None))
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_user.reset(token)
+
+
+def _values(kind, instance):
+    return {name: getattr(instance, name) for name in TRACKED_FIELDS[kind]}
+
+
+def compute_diff(kind, instance):
+    """読み込み時の値からの差分 {項目: [変更前, 変更後]}（読み込み前の項目は対象外）"""
+    loaded = getattr(instance, '_loaded_values', {})
+    diff = {}
+    for name, value in _values(kind, instance).items():
+        if name in loaded and loaded[name] != value:
+            diff[name] = [loaded[name], value]
+    return diff
+
+
+def mark_saved(kind, instance):
+    """保存後の値を次回の差分の基準にする"""
+    instance._loaded_values = _values(kind, instance)
+
+
+def build_entry(kind, instance, action, changes):
+    project_id = instance.pk if kind == 'project' else instance.project_id
+    return AuditEntry(
+        kind=kind, object_id=instance.pk, project_id=project_id, action=action,
+        user_id=current_user_id(), changed_at=timezone.now(),
+        changes=json.dumps(changes, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')),
+    )
+
+
+def audit_saved(kind, instance, created):
+    """保存された案件・スケジュールの監査ログを積む（変更が無ければ何もしない）"""
+    if created:
+        entry = build_entry(kind, instance, 'create', _values(kind, instance))
+    else:
+        diff = compute_diff(kind, instance)
+        if not diff:
+            return
+        entry = build_entry(kind, instance, 'update', diff)
+    mark_saved(kind, instance)
+    enqueue([entry])
+
+
+def audit_deleted(kind, instance):
+    enqueue([build_entry(kind, instance, 'delete', _values(kind, instance))])
+
+
+def audit_bulk_update(kind, instances):
+    """bulk_update（シグナルが発火しない）で更新したオブジェクトの監査ログを積む"""
+    entries = []
+    for instance in instances:
+        diff = compute_diff(kind, instance)
+        if diff:
+            entries.append(build_entry(kind, instance, 'update', diff))
+            mark_saved(kind, instance)
+    enqueue(entries)
+
+
+class AuditWriter:
+    """監査ログのバックグラウンド書き込み"""
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.written = 0
+        self.overflowed = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._queue = queue.Queue(maxsize=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000))
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def put(self, entries):
+        if self._thread is None:
+            self._start()
+        for i, entry in enumerate(entries):
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                # 書き込みが追いつかない場合は捨てずに呼び出し元で書く
+                self.overflowed += len(entries) - i
+                self._write(entries[i:])
+                return
+
+    def _drain(self, limit):
+        entries = []
+        while len(entries) < limit:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _run(self):
+        batch_size = getattr(settings, 'AUDIT_BATCH_SIZE', 500)
+        interval = getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0)
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=interval)
+            except queue.Empty:
+                continue
+            # 最初の1件から interval 秒（またはバッチが埋まるまで）溜めてから1回で書く
+            entries = [first]
+            deadline = time.monotonic() + interval
+            while len(entries) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping.is_set():
+                    break
+                try:
+                    entries.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(entries)
+            except Exception:
+                logger.exception('監査ログ%d件の書き込みに失敗しました', len(entries))
+            finally:
+                close_old_connections()
+
+    def _write(self, entries):
+        AuditEntry.objects.bulk_create(entries)
+        self.written += len(entries)
+
+    def flush(self):
+        """キューに残っている監査ログを呼び出し元のスレッドで書き出す"""
+        if self._queue is None:
+            return
+        while True:
+            entries = self._drain(getattr(settings, 'AUDIT_BATCH_SIZE', 500))
+            if not entries:
+                return
+            self._write(entries)
+
+    def shutdown(self, timeout=5):
+        """書き込み中のバッチを待ってから残りを書き出す（プロセス終了時）"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+writer = AuditWriter()
+
+
+def enqueue(entries):
+    """トランザクション確定後に監査ログを書き込みキューへ積む（AUDIT_ASYNC=False なら同期で書く）"""
+    if not entries:
+        return
+    if getattr(settings, 'AUDIT_ASYNC', True):
+        transaction.on_commit(lambda: writer.put(entries))
+    else:
+        transaction.on_commit(lambda: AuditEntry.objects.bulk_create(entries))
+
+
+def _field_labels(kind):
+    from .models import Project, Schedule
+    model = Project if kind == 'project' else Schedule
+    return {field.attname: str(field.verbose_name) for field in model._meta.concrete_fields}
+
+
+def _history(entries):
+    from accounts.models import CustomUser
+    users = {
+        u.pk: (f'{u.last_name} {u.first_name}' if (u.last_name or u.first_name) else u.username)
+        for u in CustomUser.objects.filter(pk__in={e.user_id for e in entries if e.user_id})
+    }
+    labels = {kind: _field_labels(kind) for kind in TRACKED_FIELDS}
+    history = []
+    for entry in entries:
+        changes = json.loads(entry.changes)
+        if entry.action == 'update':
+            items = [(labels[entry.kind].get(name, name), old, new) for name, (old, new) in changes.items()]
+        else:
+            items = []
+        history.append({
+            'entry': entry,
+            'user': users.get(entry.user_id, '-'),
+            'items': items,
+        })
+    return history
+
+
+def project_history(project_id, limit=20):
+    """案件とそのスケジュールの最近の変更履歴（表示用）"""
+    return _history(list(AuditEntry.objects.filter(project_id=project_id).order_by('-changed_at', '-id')[:limit]))
+
+
+def object_history(kind, object_id, limit=20):
+    """案件またはスケジュール1件の最近の変更履歴（表示用）"""
+    # キューに残っている分も含めるため先に書き出す
+    writer.flush()
+    return _history(list(
+        AuditEntry.objects.filter(kind=kind, object_id=object_id).order_by('-changed_at', '-id')[:limit]
+    ))
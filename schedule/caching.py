@@ -0,0 +1,246 @@
+"""スケジュールアプリのキャッシュ
+
+django.core.cache の既定のバックエンド（locmem・ファイル・DB のいずれでも可）の上に、次を載せる。
+- 名前空間付きのキー（"<名前空間>:<世代>:<部品>:..."）
+- 世代による無効化（名前空間の世代番号を上げると以前のキーは参照されなくなり、期限切れで消える）
+- 計算の一本化（同じキーの再計算はプロセス内ではロック、プロセス間では cache.add() の印で1回に絞り、
+  他は結果を待つ）
+- 名前空間毎のヒット・ミス・追い出し等の件数
+
+件数はプロセス毎に数え、STATS_PUBLISH_INTERVAL 秒毎にキャッシュへ書き出す。
+共有できるバックエンド（ファイル・DB）なら統計ページで全プロセス分を合算して表示できる。
+"""
+import os
+import secrets
+import socket
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+
+MISSING = object()
+# 再計算中の印の有効期限（秒）。計算がこれより長引くと待っている側も計算する
+LOCK_TIMEOUT = 30
+# 待っている側が結果を確認する間隔（秒）
+WAIT_INTERVAL = 0.05
+# 追い出しの判定のために覚えておく、このプロセスで書き込んだキーの数
+TRACKED_KEYS = 10000
+STATS_PUBLISH_INTERVAL = 10
+STATS_TIMEOUT = 60 * 60
+STATS_INDEX_KEY = 'caching:stats:processes'
+# 件数の種類と表示名
+COUNTERS = {
+    'hits': 'ヒット',
+    'misses': 'ミス',
+    'sets': '書き込み',
+    'evictions': '追い出し',
+    'invalidations': '無効化',
+    'waits': '計算待ち',
+    'computes': '再計算',
+}
+
+# 名前空間名 → Namespace（統計ページからの無効化用）
+namespaces = {}
+
+# 同じキーの再計算を直列化するロック（キーのハッシュで振り分ける）
+_locks = [threading.Lock() for _ in range(64)]
+
+
+class Stats:
+    """名前空間毎の件数（プロセス内）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.process = f'{socket.gethostname()}:{os.getpid()}'
+        self.started_at = time.time()
+        self.counters = {}
+        self.compute_seconds = Counter()
+        self._published_at = 0.0
+
+    def add(self, namespace, counter, value=1):
+        with self._lock:
+            self.counters.setdefault(namespace, Counter())[counter] += value
+            due = time.monotonic() - self._published_at >= STATS_PUBLISH_INTERVAL
+            if due:
+                self._published_at = time.monotonic()
+        if due:
+            self.publish()
+
+    def add_compute_time(self, namespace, seconds):
+        with self._lock:
+            self.compute_seconds[namespace] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                namespace: dict(counters, compute_seconds=self.compute_seconds[namespace])
+                for namespace, counters in self.counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.compute_seconds.clear()
+        self.publish()
+
+    def publish(self):
+        """このプロセスの件数をキャッシュに書き出す"""
+        try:
+            cache.set(f'caching:stats:{self.process}', {
+                'process': self.process,
+                'started_at': self.started_at,
+                'updated_at': time.time(),
+                'namespaces': self.snapshot(),
+            }, STATS_TIMEOUT)
+            processes = cache.get(STATS_INDEX_KEY) or []
+            if self.process not in processes:
+                cache.set(STATS_INDEX_KEY, processes + [self.process], None)
+        except Exception:
+            # 統計の書き出しに失敗しても本来の処理は止めない
+            pass
+
+
+stats = Stats()
+
+
+def collect_stats():
+    """書き出し済みの全プロセス分の件数（このプロセスは最新の値）"""
+    stats.publish()
+    processes = cache.get(STATS_INDEX_KEY) or []
+    entries = cache.get_many([f'caching:stats:{process}' for process in processes])
+    alive = [entry for entry in entries.values() if entry]
+    if len(alive) != len(processes):
+        # 期限切れのプロセスを一覧から外す
+        cache.set(STATS_INDEX_KEY, [entry['process'] for entry in alive], None)
+    return sorted(alive, key=lambda entry: entry['process'])
+
+
+def invalidate_all():
+    """登録済みの全ての名前空間を無効化する（DB の復元等でデータのバージョンが巻き戻った場合）
+
+    名前空間はそれを使うモジュールの読み込み時に登録されるため、呼び出し側で先に読み込んでおく。
+    """
+    for namespace in list(namespaces.values()):
+        namespace.invalidate()
+    return sorted(namespaces)
+
+
+class Namespace:
+    """名前空間付きのキャッシュ"""
+
+    def __init__(self, name, timeout=60 * 10):
+        self.name = name
+        self.timeout = timeout
+        self._expiry = OrderedDict()
+        self._expiry_lock = threading.Lock()
+        namespaces[name] = self
+
+    @property
+    def generation_key(self):
+        return f'{self.name}:generation'
+
+    def generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            # 初回、または世代番号自体が追い出された場合。add なら他プロセスの値を上書きしない
+            cache.add(self.generation_key, 1, None)
+            generation = cache.get(self.generation_key, 1)
+        return generation
+
+    def key(self, *parts):
+        return ':'.join([self.name, str(self.generation()), *map(str, parts)])
+
+    def _remember(self, key, timeout):
+        with self._expiry_lock:
+            self._expiry[key] = time.monotonic() + timeout
+            self._expiry.move_to_end(key)
+            while len(self._expiry) > TRACKED_KEYS:
+                self._expiry.popitem(last=False)
+
+    def _lookup(self, key):
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            stats.add(self.name, 'hits')
+            return value
+        stats.add(self.name, 'misses')
+        with self._expiry_lock:
+            expires = self._expiry.pop(key, None)
+        if expires is not None and expires > time.monotonic():
+            # 自分で書き込み、期限内なのに無い＝バックエンドの容量超過等で追い出された
+            stats.add(self.name, 'evictions')
+        return MISSING
+
+    def get(self, *parts, default=None):
+        value = self._lookup(self.key(*parts))
+        return default if value is MISSING else value
+
+    def set(self, *parts, value, timeout=None):
+        self._set(self.key(*parts), value, timeout)
+
+    def _set(self, key, value, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        cache.set(key, value, timeout)
+        self._remember(key, timeout)
+        stats.add(self.name, 'sets')
+
+    def delete(self, *parts):
+        key = self.key(*parts)
+        cache.delete(key)
+        with self._expiry_lock:
+            self._expiry.pop(key, None)
+
+    def invalidate(self):
+        """世代番号を上げて名前空間全体を無効化"""
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, 2, None)
+        with self._expiry_lock:
+            self._expiry.clear()
+        stats.add(self.name, 'invalidations')
+
+    def get_or_set(self, *parts, compute, timeout=None):
+        """キャッシュに無ければ compute() の結果を保存して返す（同じキーの計算は1回に絞る）"""
+        key = self.key(*parts)
+        value = self._lookup(key)
+        if value is not MISSING:
+            return value
+        with _locks[hash(key) % len(_locks)]:
+            # ロック待ちの間に同じプロセスの他スレッドが計算していれば、その結果を使う
+            value = cache.get(key, MISSING)
+            if value is not MISSING:
+                stats.add(self.name, 'waits')
+                return value
+            lock_key = f'{key}:lock'
+            # 印には自分だけの値を入れ、自分が付けた印だけを消す（待ちきれずに計算する側が、
+            # まだ計算中の他プロセスの印を消して3つ目の計算を招かないように）
+            token = secrets.token_hex(8)
+            if not cache.add(lock_key, token, LOCK_TIMEOUT):
+                value = self._wait(key, lock_key)
+                if value is not MISSING:
+                    stats.add(self.name, 'waits')
+                    return value
+                # 印が消えた（計算に失敗した）なら改めて付ける。まだ残っている（長引いている）なら印を付けずに計算する
+                if not cache.add(lock_key, token, LOCK_TIMEOUT):
+                    token = None
+            try:
+                began = time.perf_counter()
+                value = compute()
+                stats.add_compute_time(self.name, time.perf_counter() - began)
+                stats.add(self.name, 'computes')
+                self._set(key, value, timeout)
+            finally:
+                if token is not None and cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+            return value
+
+    def _wait(self, key, lock_key):
+        """他プロセスの計算結果を待つ。印が消えても結果が無ければ MISSING"""
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            value = cache.get(key, MISSING)
+            if value is not MISSING or cache.get(lock_key) is None:
+                return value
+        return MISSING
@@ -0,0 +1,173 @@
+"""変更フィード（差分同期）
+
+Project / Schedule の作成・更新・削除を ChangeEntry に記録し、
+クライアントが保持しているシーケンス番号以降の差分だけを返す。
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .audit import audit_bulk_update
+from .events import publish_change
+from .models import ChangeEntry, Project, Schedule
+from .status_counts import count_bulk_update
+
+
+def record_changes(kind, object_ids, op):
+    """変更を記録（同じオブジェクトの古い行は削除し、新しいシーケンス番号で追加）"""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        ChangeEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        ChangeEntry.objects.bulk_create([
+            ChangeEntry(kind=kind, object_id=object_id, op=op) for object_id in object_ids
+        ])
+
+
+def record_change(kind, object_id, op):
+    record_changes(kind, [object_id], op)
+
+
+def record_schedule_bulk_update(schedules):
+    """bulk_update（シグナルが発火しない）で更新したスケジュールの変更を記録・通知"""
+    count_bulk_update('schedule', schedules)
+    audit_bulk_update('schedule', schedules)
+    record_changes('schedule', [s.pk for s in schedules], 'upsert')
+    for s in schedules:
+        publish_change('schedule', 'upsert', s.pk, s.project_id,
+                       [s.project.created_by_id, s.project.assigned_to_id], s.department)
+
+
+# 日付によるステータス更新（Schedule.update_status_by_date）の更新後のステータス → 更新前のステータス
+STATUS_BEFORE_DATE_UPDATE = {'in_progress': 'pending', 'pending': 'in_progress'}
+
+
+def save_statuses_by_date(schedules):
+    """日付によるステータス更新で変わったスケジュールを保存・記録し、保存したものを返す
+
+    表示のついでの更新のため楽観的ロックの version は確認せず（古い読み込みでも ConcurrentUpdateError にしない）、
+    queryset の update() で更新前のステータスのままの行だけを書き換える。version は進めるため、
+    編集画面を開いている他のユーザーの保存は競合として検出される。
+    """
+    if not schedules:
+        return []
+    saved = []
+    now = timezone.now()
+    with transaction.atomic():
+        for status, before in STATUS_BEFORE_DATE_UPDATE.items():
+            group = {s.pk: s for s in schedules if s.status == status}
+            if not group:
+                continue
+            ids = list(Schedule.objects.filter(pk__in=group, status=before).values_list('pk', flat=True))
+            Schedule.objects.filter(pk__in=ids).update(status=status, updated_at=now, version=F('version') + 1)
+            for pk in ids:
+                group[pk].updated_at = now
+                group[pk].version += 1
+                saved.append(group[pk])
+    record_schedule_bulk_update(saved)
+    return saved
+
+
+def update_statuses_by_date(schedules):
+    """スケジュールのクエリセットのうち、日付によるステータスが変わるものだけを読み込んで更新し、更新したものを返す"""
+    today = timezone.localdate()
+    due = list(
+        schedules.filter(Q(status='pending', start_date__lte=today) | Q(status='in_progress', start_date__gt=today))
+        .select_related('project')
+    )
+    for schedule in due:
+        schedule.update_status_by_date()
+    return save_statuses_by_date(due)
+
+
+def current_version():
+    """現在の変更シーケンス番号（データのバージョン）"""
+    return ChangeEntry.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def can_view_all(user):
+    """全案件を閲覧できるユーザーかどうか"""
+    return user.is_manager or user.is_superuser or user.is_viewer
+
+
+def _user_department(user):
+    """閲覧範囲を絞り込む部署（自部署のみのユーザーは自分の部署、それ以外は ''）"""
+    return user.department if user.department_only else ''
+
+
+def visible_projects(user):
+    if can_view_all(user):
+        from .departments import in_department
+        return in_department(Project.objects.all(), _user_department(user))
+    return Project.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+
+
+def visible_schedules(user):
+    if can_view_all(user):
+        from .departments import in_department
+        return in_department(Schedule.objects.all(), _user_department(user))
+    return Schedule.objects.filter(Q(project__created_by=user) | Q(project__assigned_to=user))
+
+
+def serialize_project(project):
+    return {
+        'id': project.id,
+        'name': project.name,
+        'manufacturing_number': project.manufacturing_number,
+        'due_date': project.due_date.isoformat() if project.due_date else None,
+        'is_completed': project.is_completed,
+        'assigned_to_id': project.assigned_to_id,
+    }
+
+
+def serialize_schedule(schedule):
+    return {
+        'id': schedule.id,
+        'project_id': schedule.project_id,
+        'field_id': schedule.field_id,
+        'title': f'{schedule.project.name} - {schedule.field.name}',
+        'start': schedule.start_date.isoformat(),
+        'end': (schedule.end_date + timedelta(days=1)).isoformat(),  # 終了日の翌日
+        'status': schedule.status,
+        'assigned_to_id': schedule.project.assigned_to_id,
+    }
+
+
+def changes_since(user, since):
+    """since より後の変更を、ユーザーの閲覧範囲で絞り込んで返す
+
+    閲覧範囲外になったオブジェクト（担当替えなど）は削除として返すため、
+    クライアントは deletes に含まれる ID を手元から取り除けばよい。
+    案件が deletes に含まれる場合は、その案件のスケジュールも合わせて取り除く。
+    """
+    entries = ChangeEntry.objects.filter(id__gt=since).values_list('id', 'kind', 'object_id', 'op')
+    # 読み取った行から算出し、取得後に追加された変更を取りこぼさないようにする
+    version = since
+    changed = {'project': set(), 'schedule': set()}
+    deleted = {'project': set(), 'schedule': set()}
+    for entry_id, kind, object_id, op in entries:
+        version = max(version, entry_id)
+        (deleted if op == 'delete' else changed)[kind].add(object_id)
+
+    projects = list(visible_projects(user).filter(id__in=changed['project']))
+    schedules = list(
+        visible_schedules(user).filter(id__in=changed['schedule'])
+        .select_related('project', 'field')
+    )
+    deleted['project'] |= changed['project'] - {p.id for p in projects}
+    deleted['schedule'] |= changed['schedule'] - {s.id for s in schedules}
+
+    return {
+        'version': version,
+        'projects': {
+            'upserts': [serialize_project(p) for p in projects],
+            'deletes': sorted(deleted['project']),
+        },
+        'schedules': {
+            'upserts': [serialize_schedule(s) for s in schedules],
+            'deletes': sorted(deleted['schedule']),
+        },
+    }
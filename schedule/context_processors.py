@@ -0,0 +1,13 @@
+from .changes import can_view_all
+from .departments import current_department, department_choices
+
+
+def department(request):
+    """ナビゲーションバーの部署切替用"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or not can_view_all(user):
+        return {}
+    return {
+        'department_choices': [] if user.department_only else department_choices(),
+        'current_department': current_department(request),
+    }
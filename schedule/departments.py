@@ -0,0 +1,75 @@
+"""部署単位の表示範囲
+
+案件は所属部署（Project.department）を持ち、スケジュールにも複製して保持する。
+全案件を閲覧できるユーザー（マネージャー・閲覧者）は、セッションに保存した部署に
+表示を絞り込める。自部署のみ（CustomUser.department_only）のユーザーは常に自分の部署に限定する。
+一般ユーザーは従来どおり自分が作成・担当する案件のみで、部署では絞り込まない。
+"""
+from django.contrib.auth import get_user_model
+
+from .caching import Namespace
+from .changes import can_view_all
+from .models import Schedule
+
+SESSION_KEY = 'department'
+CHOICES_CACHE_TIMEOUT = 60 * 5
+department_cache = Namespace('departments', timeout=CHOICES_CACHE_TIMEOUT)
+
+
+def department_choices():
+    """ユーザーに登録されている部署の一覧"""
+    return department_cache.get_or_set('choices', compute=lambda: list(
+        get_user_model().objects.exclude(department='')
+        .order_by('department').values_list('department', flat=True).distinct()
+    ))
+
+
+def invalidate_department_choices():
+    department_cache.delete('choices')
+
+
+def current_department(request):
+    """表示中の部署（'' は全部署）"""
+    user = request.user
+    if not can_view_all(user):
+        return ''
+    if user.department_only:
+        return user.department
+    return request.session.get(SESSION_KEY, '')
+
+
+async def acurrent_department(request):
+    """current_department の非同期版（非同期のビューでは request.user・セッションを同期で読めないため）"""
+    user = await request.auser()
+    if not can_view_all(user):
+        return ''
+    if user.department_only:
+        return user.department
+    return await request.session.aget(SESSION_KEY, '')
+
+
+def in_department(queryset, department):
+    """案件・スケジュールを部署で絞り込む（'' なら絞り込まない）"""
+    return queryset.filter(department=department) if department else queryset
+
+
+def scope_projects(request, projects):
+    return in_department(projects, current_department(request))
+
+
+def scope_schedules(request, schedules):
+    """スケジュールの複製した部署で絞り込む（案件と結合しない）"""
+    return in_department(schedules, current_department(request))
+
+
+def in_scope(user, project):
+    """自部署のみのユーザーが、部署外の案件を権限で扱えないようにする判定"""
+    if not user.department_only or user.pk in (project.created_by_id, project.assigned_to_id):
+        return True
+    return project.department == user.department
+
+
+def sync_project_department(project):
+    """案件の部署変更をスケジュールに反映"""
+    Schedule.objects.filter(project=project).exclude(department=project.department)\
+        .update(department=project.department)
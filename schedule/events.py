@@ -0,0 +1,128 @@
+"""スケジュール・案件の変更通知（Server-Sent Events）
+
+プロセス内のブロードキャストハブで、変更をこのワーカーに接続中のクライアントへ配信する。
+通知には変更内容そのものは含めず、受け取ったクライアントが差分API
+（schedule_changes_api）で必要な分だけ取得する。
+複数ワーカー構成では同じワーカーに接続したクライアントにしか届かないため、
+クライアント側は定期的な差分確認も併用する。
+"""
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+
+# クライアント毎のキュー上限。溢れた場合は溜まった通知を捨てて resync を送る
+SUBSCRIBER_QUEUE_SIZE = 64
+
+RESYNC = {'type': 'resync'}
+
+
+class Subscriber:
+    """接続中のクライアント1件分の購読情報"""
+
+    def __init__(self, loop, user, project_id=None, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.loop = loop
+        self.user_id = user.pk
+        self.can_view_all = user.is_manager or user.is_superuser or user.is_viewer
+        # 自部署のみのユーザーは自分の部署の案件の通知だけを受け取る（departments.current_department と同じ）
+        self.department = user.department if self.can_view_all and user.department_only else ''
+        self.project_id = project_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def wants(self, event):
+        """閲覧範囲内かつ購読対象の案件に関する通知かどうか"""
+        if self.project_id is not None and event.get('project_id') != self.project_id:
+            return False
+        if self.department and event.get('department') != self.department:
+            return False
+        return self.can_view_all or self.user_id in event.get('user_ids', ())
+
+    def offer(self, event):
+        """イベントループ上で通知をキューに積む（溢れたら resync に置き換える）"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 読み出しが追いつかないクライアントには個別の通知を諦め、全体の再取得を促す
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class BroadcastHub:
+    """プロセス内ブロードキャストハブ
+
+    publish() はどのスレッドからでも呼べる（同期ビューのシグナルハンドラ等）。
+    各購読者のイベントループへ call_soon_threadsafe で受け渡す。
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user, project_id=None):
+        subscriber = Subscriber(asyncio.get_running_loop(), user, project_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if not subscriber.wants(event):
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # イベントループが既に閉じている
+                self.unsubscribe(subscriber)
+
+
+hub = BroadcastHub()
+
+
+def publish_change(kind, op, object_id, project_id, user_ids, department=''):
+    """変更通知をトランザクション確定後に配信（department は案件の部署）"""
+    event = {
+        'type': 'change',
+        'kind': kind,
+        'op': op,
+        'id': object_id,
+        'project_id': project_id,
+        'user_ids': [user_id for user_id in user_ids if user_id is not None],
+        'department': department,
+    }
+    transaction.on_commit(lambda: hub.publish(event))
+
+
+def format_event(event):
+    """SSE 形式に整形（閲覧範囲判定用の user_ids・department はクライアントへ送らない）"""
+    payload = {key: value for key, value in event.items() if key not in ('type', 'user_ids', 'department')}
+    return f'event: {event["type"]}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+
+
+async def event_stream(user, project_id=None, heartbeat=25):
+    """変更通知の SSE を生成（一定間隔でコメント行を送って接続を維持）"""
+    subscriber = hub.subscribe(user, project_id)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscriber)
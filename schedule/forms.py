@@ -34,10 +34,29 @@ class UserProfileForm(forms.ModelForm):
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
         }
 
-class ProjectForm(forms.ModelForm):
+class VersionedModelForm(forms.ModelForm):
+    """編集を始めた時点のバージョンを hidden で持ち回るフォーム（保存時の競合検出用）"""
+    version = forms.IntegerField(
+        widget=forms.HiddenInput, required=False,
+        error_messages={'required': '編集を始めた時点のバージョンがありません。画面を開き直してから保存してください。'},
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            # 編集時は必須（無いと読み込み直した最新のバージョンで保存され、競合を検出できない）
+            self.fields['version'].required = True
+            self.fields['version'].initial = self.instance.version
+
+    def _post_clean(self):
+        super()._post_clean()
+        if self.instance.pk and self.cleaned_data.get('version') is not None:
+            self.instance.version = self.cleaned_data['version']
+
+class ProjectForm(VersionedModelForm):
     class Meta:
         model = Project
-        fields = ['name', 'manufacturing_number', 'due_date', 'assigned_to', 'description']
+        fields = ['name', 'manufacturing_number', 'due_date', 'assigned_to', 'department', 'description']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'manufacturing_number': forms.TextInput(attrs={'class': 'form-control'}),
@@ -64,7 +83,22 @@ class ProjectForm(forms.ModelForm):
             if not self.instance.pk:  # 新規作成時のみ
                 self.fields['assigned_to'].initial = user
 
-class ScheduleForm(forms.ModelForm):
+            # 所属部署は部署を限定されていないマネージャーのみ選択可能（それ以外は作成者の部署）
+            if (user.is_manager or user.is_superuser) and not user.department_only:
+                from .departments import department_choices
+                departments = department_choices()
+                if self.instance.department and self.instance.department not in departments:
+                    departments = [self.instance.department, *departments]
+                self.fields['department'].widget = forms.Select(
+                    choices=[('', '（部署なし）')] + [(d, d) for d in departments],
+                    attrs={'class': 'form-control'},
+                )
+                if not self.instance.pk:
+                    self.fields['department'].initial = user.department
+            else:
+                del self.fields['department']
+
+class ScheduleForm(VersionedModelForm):
     class Meta:
         model = Schedule
         fields = ['project', 'field', 'start_date', 'end_date', 'description']
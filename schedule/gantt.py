@@ -0,0 +1,276 @@
+"""案件横断のガントチャート（SVG）
+
+担当者毎に案件を行として並べ、スケジュールを分野別の色の帯で描く。
+行（案件）毎の SVG 断片を期間・絞り込み条件毎にキャッシュし、
+データのバージョンが進んだ場合は変更フィードから影響のある案件だけを取り直して差し替える。
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils.html import escape
+
+from .caching import Namespace
+from .changes import can_view_all, current_version
+from .departments import in_department
+from .models import ChangeEntry, Schedule
+from .workdays import workday_mask
+
+FIELD_COLORS = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1', '#fd7e14', '#20c997', '#e83e8c', '#6c757d', '#17a2b8']
+LABEL_WIDTH = 240
+# 行ラベルが帯の領域にはみ出さない文字数
+LABEL_CHARS = 20
+CHART_WIDTH = 1100
+HEADER_HEIGHT = 36
+GROUP_HEIGHT = 24
+LANE_HEIGHT = 18
+ROW_PADDING = 4
+CACHE_TIMEOUT = 60 * 30
+rows_cache = Namespace('gantt.rows', timeout=CACHE_TIMEOUT)
+svg_cache = Namespace('gantt.svg', timeout=CACHE_TIMEOUT)
+# 変更がこれより多い場合は差し替えより全件作り直しの方が速い
+MAX_INCREMENTAL_CHANGES = 500
+
+# SVG 単体でも表示できるよう、スタイルは SVG 内に埋め込む
+SVG_STYLE = (
+    '<style>'
+    'text{font-family:sans-serif}'
+    '.gantt-label{font-size:11px;fill:#212529}'
+    '.gantt-group{fill:#e9ecef}'
+    '.gantt-group-label{font-size:12px;font-weight:bold;fill:#212529}'
+    '.gantt-month{font-size:11px;font-weight:bold;fill:#495057}'
+    '.gantt-day{font-size:9px;fill:#6c757d;text-anchor:middle}'
+    '.gantt-off{fill:#f1f3f5}'
+    '.gantt-rule{stroke:#dee2e6}'
+    '.gantt-completed{opacity:.4}'
+    '.gantt-due{fill:#dc3545}'
+    '</style>'
+)
+
+COLUMNS = (
+    'id', 'project_id', 'project__name', 'project__manufacturing_number', 'project__due_date',
+    'project__assigned_to_id', 'project__assigned_to__username',
+    'project__assigned_to__last_name', 'project__assigned_to__first_name',
+    'field_id', 'field__name', 'start_date', 'end_date', 'status',
+)
+
+
+def field_color(field_id):
+    return FIELD_COLORS[field_id % len(FIELD_COLORS)]
+
+
+def day_width(start, end):
+    return max(2.0, min(24.0, CHART_WIDTH / ((end - start).days + 1)))
+
+
+def _user_label(username, last_name, first_name):
+    return f'{last_name} {first_name}' if (last_name or first_name) else username
+
+
+def fetch_rows(user, start, end, assigned_to=None, field=None, project_ids=None, department=''):
+    """期間に重なるスケジュールを1クエリで取得（必要な列のみ）"""
+    schedules = in_department(Schedule.objects.filter(start_date__lte=end, end_date__gte=start), department)
+    if not can_view_all(user):
+        schedules = schedules.filter(Q(project__created_by=user) | Q(project__assigned_to=user))
+    if assigned_to:
+        schedules = schedules.filter(project__assigned_to_id=assigned_to)
+    if field:
+        schedules = schedules.filter(field_id=field)
+    if project_ids is not None:
+        schedules = schedules.filter(project_id__in=project_ids)
+    return [dict(zip(COLUMNS, row)) for row in schedules.values_list(*COLUMNS)]
+
+
+def _assign_lanes(bars):
+    """重なる帯が別の段に来るよう段番号を振り、段数を返す"""
+    lane_ends = []
+    for bar in sorted(bars, key=lambda b: (b['start_date'], b['end_date'])):
+        for lane, lane_end in enumerate(lane_ends):
+            if lane_end < bar['start_date']:
+                break
+        else:
+            lane = len(lane_ends)
+            lane_ends.append(None)
+        lane_ends[lane] = bar['end_date']
+        bar['lane'] = lane
+    return max(len(lane_ends), 1)
+
+
+def render_row(bars, start, end):
+    """案件1行分の SVG 断片（y=0 基準）と行の高さ"""
+    first = bars[0]
+    width = day_width(start, end)
+    lanes = _assign_lanes(bars)
+    height = lanes * LANE_HEIGHT + ROW_PADDING * 2
+    label = f'{first["project__name"]} ({first["project__manufacturing_number"]})'
+    if len(label) > LABEL_CHARS:
+        label = label[:LABEL_CHARS - 1] + '…'
+    parts = [
+        f'<line x1="0" y1="{height}" x2="{LABEL_WIDTH + width * ((end - start).days + 1):.1f}" '
+        f'y2="{height}" class="gantt-rule"/>',
+        f'<text x="8" y="{ROW_PADDING + 13}" class="gantt-label">{escape(label)}</text>',
+    ]
+    for bar in bars:
+        begin = max(bar['start_date'], start)
+        finish = min(bar['end_date'], end)
+        x = LABEL_WIDTH + (begin - start).days * width
+        w = ((finish - begin).days + 1) * width
+        y = ROW_PADDING + bar['lane'] * LANE_HEIGHT + 2
+        completed = ' gantt-completed' if bar['status'] == 'completed' else ''
+        tooltip = f'{first["project__name"]} - {bar["field__name"]} ' \
+                  f'{bar["start_date"]:%m/%d}～{bar["end_date"]:%m/%d}'
+        parts.append(
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{LANE_HEIGHT - 4}" rx="3" '
+            f'fill="{field_color(bar["field_id"])}" class="gantt-bar{completed}">'
+            f'<title>{escape(tooltip)}</title></rect>'
+        )
+    due_date = first['project__due_date']
+    if due_date and start <= due_date <= end:
+        x = LABEL_WIDTH + ((due_date - start).days + 0.5) * width
+        parts.append(
+            f'<path d="M{x:.1f} {ROW_PADDING} l5 6 l-5 6 l-5 -6 z" class="gantt-due">'
+            f'<title>納期 {due_date:%Y/%m/%d}</title></path>'
+        )
+    return ''.join(parts), height
+
+
+def build_rows(rows, start, end):
+    """取得したスケジュールを案件毎の行にまとめて描画"""
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row['project_id'], []).append(row)
+    result = {}
+    for project_id, bars in grouped.items():
+        first = bars[0]
+        svg, height = render_row(bars, start, end)
+        result[project_id] = {
+            'assignee_id': first['project__assigned_to_id'],
+            'assignee_label': _user_label(
+                first['project__assigned_to__username'],
+                first['project__assigned_to__last_name'],
+                first['project__assigned_to__first_name'],
+            ),
+            'sort_key': (min(b['start_date'] for b in bars), first['project__name']),
+            'schedule_ids': [b['id'] for b in bars],
+            'svg': svg,
+            'height': height,
+        }
+    return result
+
+
+def _changed_project_ids(entry, since):
+    """since 以降に変更された案件・スケジュールが属する案件のID"""
+    changes = list(ChangeEntry.objects.filter(id__gt=since).values_list('kind', 'object_id'))
+    if len(changes) > MAX_INCREMENTAL_CHANGES:
+        return None
+    project_ids = {object_id for kind, object_id in changes if kind == 'project'}
+    schedule_ids = {object_id for kind, object_id in changes if kind == 'schedule'}
+    # 削除済みのスケジュールはキャッシュ側の対応表から、それ以外は DB から案件を引く
+    owners = {
+        schedule_id: project_id
+        for project_id, row in entry['rows'].items() for schedule_id in row['schedule_ids']
+    }
+    project_ids |= {owners[i] for i in schedule_ids if i in owners}
+    project_ids |= set(Schedule.objects.filter(id__in=schedule_ids).values_list('project_id', flat=True))
+    return project_ids
+
+
+def _scope(user, department):
+    """キャッシュを共有できる閲覧範囲（全案件を閲覧できるユーザーは部署毎、それ以外はユーザー毎）"""
+    return f'all{department}' if can_view_all(user) else f'user{user.pk}'
+
+
+def get_rows(user, start, end, assigned_to=None, field=None, department=''):
+    """行毎の描画結果（案件ID → 行）。前回のキャッシュから変更分だけ差し替える"""
+    key = (_scope(user, department), start.isoformat(), end.isoformat(), assigned_to or '', field or '')
+    version = current_version()
+    entry = rows_cache.get(*key)
+    if entry is not None and entry['version'] == version:
+        return entry['rows'], version
+
+    project_ids = _changed_project_ids(entry, entry['version']) if entry is not None else None
+    if project_ids is None:
+        rows = build_rows(fetch_rows(user, start, end, assigned_to, field, department=department), start, end)
+    else:
+        rows = {pid: row for pid, row in entry['rows'].items() if pid not in project_ids}
+        if project_ids:
+            rows.update(build_rows(
+                fetch_rows(user, start, end, assigned_to, field, project_ids, department), start, end
+            ))
+    rows_cache.set(*key, value={'version': version, 'rows': rows})
+    return rows, version
+
+
+def render_header(start, end):
+    """日付の目盛りと非稼働日の網掛け"""
+    width = day_width(start, end)
+    days = (end - start).days + 1
+    parts = []
+    for i, workday in enumerate(workday_mask(start, end).tolist()):
+        d = start + timedelta(days=i)
+        x = LABEL_WIDTH + i * width
+        if not workday:
+            parts.append(f'<rect x="{x:.1f}" y="{HEADER_HEIGHT}" width="{width:.1f}" height="100%" class="gantt-off"/>')
+        if d.day == 1 or i == 0:
+            parts.append(f'<text x="{x + 2:.1f}" y="14" class="gantt-month">{d:%Y/%m}</text>')
+        if width >= 14 or d.weekday() == 0:
+            parts.append(f'<text x="{x + width / 2:.1f}" y="30" class="gantt-day">{d.day}</text>')
+    parts.append(
+        f'<line x1="{LABEL_WIDTH}" y1="{HEADER_HEIGHT}" x2="{LABEL_WIDTH + width * days:.1f}" '
+        f'y2="{HEADER_HEIGHT}" class="gantt-rule"/>'
+    )
+    return ''.join(parts)
+
+
+def assemble_svg(rows, start, end):
+    """行を担当者毎にまとめて SVG 全体を組み立てる"""
+    groups = {}
+    for project_id, row in rows.items():
+        groups.setdefault((row['assignee_label'], row['assignee_id']), []).append(row)
+    width = LABEL_WIDTH + day_width(start, end) * ((end - start).days + 1)
+    y = HEADER_HEIGHT
+    body = []
+    for (label, _), group_rows in sorted(groups.items()):
+        body.append(
+            f'<g transform="translate(0,{y})"><rect width="{width:.1f}" height="{GROUP_HEIGHT}" class="gantt-group"/>'
+            f'<text x="4" y="16" class="gantt-group-label">{escape(label)}</text></g>'
+        )
+        y += GROUP_HEIGHT
+        for row in sorted(group_rows, key=lambda r: r['sort_key']):
+            body.append(f'<g transform="translate(0,{y})">{row["svg"]}</g>')
+            y += row['height']
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" class="gantt" width="{width:.0f}" height="{y}" '
+        f'viewBox="0 0 {width:.0f} {y}">{SVG_STYLE}{render_header(start, end)}{"".join(body)}</svg>'
+    )
+
+
+def rows_from_schedules(schedules):
+    """Schedule（project・field 読み込み済み）を fetch_rows と同じ形の dict に"""
+    return [
+        {
+            'id': s.id, 'project_id': s.project_id, 'project__name': s.project.name,
+            'project__manufacturing_number': s.project.manufacturing_number,
+            'project__due_date': s.project.due_date,
+            'project__assigned_to_id': s.project.assigned_to_id,
+            'project__assigned_to__username': s.project.assigned_to.username,
+            'project__assigned_to__last_name': s.project.assigned_to.last_name,
+            'project__assigned_to__first_name': s.project.assigned_to.first_name,
+            'field_id': s.field_id, 'field__name': s.field.name,
+            'start_date': s.start_date, 'end_date': s.end_date, 'status': s.status,
+        }
+        for s in schedules
+    ]
+
+
+def render_gantt(user, start, end, assigned_to=None, field=None, department=''):
+    """ガントチャート全体の SVG（期間・絞り込み条件・部署・バージョン毎にキャッシュ）"""
+    rows, version = get_rows(user, start, end, assigned_to, field, department)
+    return svg_cache.get_or_set(
+        _scope(user, department), start.isoformat(), end.isoformat(), assigned_to or '', field or '', version,
+        compute=lambda: assemble_svg(rows, start, end),
+    )
+
+
+def render_gantt_as_of(schedules, start, end):
+    """過去の時点のスケジュール（history.historical_schedules の結果）から SVG を組み立てる"""
+    return assemble_svg(build_rows(rows_from_schedules(schedules), start, end), start, end)
@@ -0,0 +1,93 @@
+"""担当者・分野毎の負荷ヒートマップ
+
+期間に重なるスケジュールを (行, 開始列, 終了列) の NumPy 配列として一度だけ読み込み、
+差分配列に +1 / -1 を積んで日方向に累積和を取ることで、行 × 日の同時スケジュール数を求める。
+日曜・祝日の列は 0 にする。結果はデータのバージョン毎にキャッシュする。
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from accounts.models import CustomUser
+
+from .caching import Namespace
+from .changes import current_version
+from .departments import in_department
+from .models import Field, Schedule
+from .workdays import workday_mask
+
+GROUP_CHOICES = {
+    'assignee': 'project__assigned_to_id',
+    'field': 'field_id',
+}
+CACHE_TIMEOUT = 60 * 10
+heatmap_cache = Namespace('heatmap', timeout=CACHE_TIMEOUT)
+
+
+def row_labels(group_by, ids):
+    """行ID（担当者・分野）毎の表示名"""
+    if group_by == 'field':
+        return dict(Field.objects.filter(id__in=ids).values_list('id', 'name'))
+    labels = {}
+    for user_id, username, last_name, first_name in CustomUser.objects.filter(id__in=ids)\
+            .values_list('id', 'username', 'last_name', 'first_name'):
+        labels[user_id] = f'{last_name} {first_name}' if (last_name or first_name) else username
+    return labels
+
+
+def load_matrix(group_by, start, end, department=''):
+    """行ID配列と、行 × 日の同時スケジュール数の行列を返す（非稼働日は 0、department で部署を絞り込む）"""
+    days = (end - start).days + 1
+    # 日付は文字列のまま受け取り、date への変換を NumPy でまとめて行う
+    rows = in_department(Schedule.objects.filter(start_date__lte=end, end_date__gte=start), department)\
+        .values_list(GROUP_CHOICES[group_by], Cast('start_date', CharField()), Cast('end_date', CharField()))
+    rows = list(rows)
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, days), dtype=np.int32)
+
+    keys, starts, ends = zip(*rows)
+    origin = np.datetime64(start, 'D')
+    starts = (np.array(starts, dtype='datetime64[D]') - origin).astype(np.int64)
+    ends = (np.array(ends, dtype='datetime64[D]') - origin).astype(np.int64)
+    row_ids, row_index = np.unique(np.array(keys, dtype=np.int64), return_inverse=True)
+    starts = np.clip(starts, 0, days - 1)
+    ends = np.clip(ends, 0, days - 1)
+    # 差分配列：開始列に +1、終了列の翌列に -1 を積んでから日方向に累積
+    width = days + 1
+    size = len(row_ids) * width
+    diff = np.bincount(row_index * width + starts, minlength=size) \
+        - np.bincount(row_index * width + ends + 1, minlength=size)
+    matrix = np.cumsum(diff.reshape(len(row_ids), width)[:, :days], axis=1, dtype=np.int32)
+    matrix[:, ~workday_mask(start, end)] = 0
+    return row_ids, matrix
+
+
+def build_heatmap(group_by, start, end, department=''):
+    """ヒートマップのグリッド（JSON 化できる dict）"""
+    row_ids, matrix = load_matrix(group_by, start, end, department)
+    labels = row_labels(group_by, row_ids.tolist())
+    mask = workday_mask(start, end)
+    rows = [
+        {'id': row_id, 'label': labels.get(row_id, str(row_id)), 'counts': counts, 'peak': max(counts, default=0)}
+        for row_id, counts in zip(row_ids.tolist(), matrix.tolist())
+    ]
+    rows.sort(key=lambda row: row['label'])
+    return {
+        'group': group_by,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'department': department,
+        'dates': [(start + timedelta(days=i)).isoformat() for i in range(len(mask))],
+        'workdays': mask.tolist(),
+        'rows': rows,
+    }
+
+
+def get_heatmap(group_by, start, end, department=''):
+    """部署・データのバージョン毎にキャッシュしたヒートマップ"""
+    return heatmap_cache.get_or_set(
+        group_by, start.isoformat(), end.isoformat(), department, current_version(),
+        compute=lambda: build_heatmap(group_by, start, end, department),
+    )
@@ -0,0 +1,147 @@
+"""過去の時点のスケジュールの復元（チェックポイント + 監査ログ）
+
+定期的に全スケジュールの期間をチェックポイントとして保存し、過去の時点 as_of の計画は
+as_of 以前で最新のチェックポイントに、それ以降 as_of までの監査ログを順に適用して求める。
+適用する変更はチェックポイントの間隔分だけなので、履歴全体の長さには依存しない。
+
+復元するのはスケジュール（案件・分野・期間・ステータス）のみで、
+案件名や担当者などは現在の値を使う。
+"""
+import json
+import zlib
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .audit import writer
+from .models import AuditEntry, Schedule, ScheduleCheckpoint
+
+STATE_FIELDS = ('project_id', 'field_id', 'start_date', 'end_date', 'status')
+
+
+def encode_state(state):
+    """{スケジュールID: (案件ID, 分野ID, 開始日, 終了日, ステータス)} を圧縮したバイト列に"""
+    rows = [
+        [schedule_id, project_id, field_id, start.toordinal(), end.toordinal(), status]
+        for schedule_id, (project_id, field_id, start, end, status) in sorted(state.items())
+    ]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 9)
+
+
+def decode_state(data):
+    return {
+        schedule_id: (project_id, field_id, date.fromordinal(start), date.fromordinal(end), status)
+        for schedule_id, project_id, field_id, start, end, status in json.loads(zlib.decompress(bytes(data)))
+    }
+
+
+def create_checkpoint():
+    """現在の全スケジュールのチェックポイントを作成"""
+    # このプロセスで未書き込みの監査ログを先に書き出す
+    writer.flush()
+    # 監査ログは別ファイルの接続（auxiliary）にあり、状態と同じトランザクションでは読めないため、
+    # 状態を読む前に位置と時刻を控える。監査ログは変更のコミット後に書くので、控えた位置までの変更は必ず状態に含まれる
+    # （復元時は位置・時刻の両方より後の監査ログを再適用する。schedules_as_of）
+    taken_at = timezone.now()
+    last_audit_id = AuditEntry.objects.aggregate(last=Max('id'))['last'] or 0
+    with transaction.atomic():
+        state = {
+            row[0]: row[1:]
+            for row in Schedule.objects.values_list('id', *STATE_FIELDS).iterator(chunk_size=2000)
+        }
+        return ScheduleCheckpoint.objects.create(
+            taken_at=taken_at, last_audit_id=last_audit_id,
+            schedule_count=len(state), data=encode_state(state),
+        )
+
+
+def _apply(state, object_id, action, changes):
+    """監査ログ1件をスケジュールの状態に適用"""
+    if action == 'delete':
+        state.pop(object_id, None)
+        return
+    if action == 'create':
+        values = changes
+    else:
+        if object_id not in state:
+            return
+        values = dict(zip(STATE_FIELDS, state[object_id]))
+        values.update({name: new for name, (_old, new) in changes.items() if name in STATE_FIELDS})
+    start, end = values['start_date'], values['end_date']
+    state[object_id] = (
+        values['project_id'], values['field_id'],
+        date.fromisoformat(start) if isinstance(start, str) else start,
+        date.fromisoformat(end) if isinstance(end, str) else end,
+        values['status'],
+    )
+
+
+def schedules_as_of(as_of):
+    """as_of 時点のスケジュールの状態と、適用した監査ログの件数（チェックポイントが無ければ None）"""
+    checkpoint = ScheduleCheckpoint.objects.filter(taken_at__lte=as_of).order_by('-taken_at').first()
+    if checkpoint is None:
+        return None, 0
+    state = decode_state(checkpoint.data)
+    # 他のプロセスが後から書き出した監査ログは、チェックポイントより前の変更でも位置（id）が後ろになる。
+    # その変更は状態に含まれており、再適用すると後の変更を古い値で上書きするため、時刻でも区切る
+    deltas = AuditEntry.objects.filter(
+        kind='schedule', id__gt=checkpoint.last_audit_id,
+        changed_at__gt=checkpoint.taken_at, changed_at__lte=as_of,
+    ).order_by('changed_at', 'id').values_list('object_id', 'action', 'changes')
+    applied = 0
+    for object_id, action, changes in deltas:
+        _apply(state, object_id, action, json.loads(changes))
+        applied += 1
+    return state, applied
+
+
+def diff_states(before, after):
+    """2時点の状態の差分（追加・削除・変更されたスケジュールID）"""
+    added = sorted(after.keys() - before.keys())
+    removed = sorted(before.keys() - after.keys())
+    changed = sorted(i for i in before.keys() & after.keys() if before[i] != after[i])
+    return added, removed, changed
+
+
+def historical_schedules(user, as_of, start, end, assigned_to=None, project=None, field=None, department=''):
+    """as_of 時点で start〜end に重なるスケジュール（保存しない Schedule のリスト）
+
+    閲覧範囲・絞り込みは現在の案件の登録者・担当者・部署で判定し、並び順はカレンダーと同じにする。
+    チェックポイントが無い時点なら None を返す。
+    """
+    from .changes import can_view_all
+    from .models import Field, Project
+
+    state, _ = schedules_as_of(as_of)
+    if state is None:
+        return None
+    items = [(i, values) for i, values in state.items() if values[2] <= end and values[3] >= start]
+    projects = Project.objects.select_related('created_by', 'assigned_to')\
+        .in_bulk({values[0] for _, values in items})
+    fields = Field.objects.in_bulk()
+    schedules = []
+    for schedule_id, (project_id, field_id, start_date, end_date, status) in items:
+        p = projects.get(project_id)
+        if p is None or field_id not in fields:
+            continue
+        if not can_view_all(user) and user.pk not in (p.created_by_id, p.assigned_to_id):
+            continue
+        if department and p.department != department:
+            continue
+        if assigned_to and str(p.assigned_to_id) != str(assigned_to):
+            continue
+        if project and str(project_id) != str(project):
+            continue
+        if field and str(field_id) != str(field):
+            continue
+        schedules.append(Schedule(
+            id=schedule_id, project=p, field=fields[field_id],
+            start_date=start_date, end_date=end_date, status=status,
+        ))
+    schedules.sort(key=lambda s: (
+        s.project.assigned_to.last_name, s.project.assigned_to.first_name,
+        s.project.assigned_to.username, s.project.name, s.start_date,
+    ))
+    return schedules
@@ -0,0 +1,90 @@
+"""スケジュール関連のバックグラウンドタスク（worker アプリの run_worker で実行）"""
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from scheduleapp.backup import take_reporting_snapshot
+from scheduleapp.maintenance import maintain, maintained_aliases
+from worker.tasks import periodic
+
+from .changes import update_statuses_by_date
+from .gantt import render_gantt
+from .heatmap import GROUP_CHOICES, get_heatmap
+from .history import create_checkpoint
+from .models import Schedule
+from .notifications import send_digests
+from .status_counts import recount
+
+
+@periodic('schedule.roll_over_statuses', at=time(0, 5))
+def roll_over_statuses():
+    """日付の変わり目で開始日を迎えた（または開始日が先に移った）スケジュールのステータスを更新
+
+    画面表示時の update_status_by_date と同じ規則をまとめて適用し、表示時の保存を不要にする。
+    """
+    return len(update_statuses_by_date(Schedule.objects.all()))
+
+
+@periodic('schedule.warm_caches', every=timedelta(minutes=10))
+def warm_caches():
+    """既定の表示範囲のヒートマップ・ガントチャートを作成してキャッシュしておく
+
+    キャッシュはデータのバージョン毎なので、変更が無ければ何もしない。
+    Web のプロセスと共有できるキャッシュ（ファイル・DB・memcached 等）の場合に効果がある。
+    """
+    from accounts.models import CustomUser
+
+    today = timezone.localdate()
+    quarter_start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+    for group_by in GROUP_CHOICES:
+        get_heatmap(group_by, quarter_start, quarter_start + timedelta(days=90))
+    manager = CustomUser.objects.filter(Q(is_manager=True) | Q(is_superuser=True), is_active=True).first()
+    if manager is not None:
+        week_start = today - timedelta(days=today.weekday())
+        render_gantt(manager, week_start, week_start + timedelta(days=59))
+
+
+@periodic('schedule.create_checkpoint', at=time(1, 0))
+def create_daily_checkpoint():
+    """過去の時点の表示用のチェックポイントを毎日作成"""
+    return create_checkpoint().schedule_count
+
+
+@periodic('schedule.send_digests', at=time(settings.DIGEST_SEND_HOUR, 0))
+def send_daily_digests():
+    """納期・開始日の通知メールを送信（送信済みの通知は送らないため再実行してもよい）"""
+    sent, notified, failed = send_digests()
+    if failed:
+        # 失敗した宛先だけ再送されるよう、タスクとして失敗させて再試行させる
+        raise RuntimeError(f'{failed}件のメールを送信できませんでした（送信 {sent}件）')
+    return sent, notified
+
+
+@periodic('schedule.recount_statuses', every=timedelta(hours=1))
+def recount_statuses():
+    """状態毎の件数（/metrics 用）を実際の件数に合わせ直す
+
+    シグナルを通らない更新があった場合のずれを直す。ずれていた状態の数を返す。
+    """
+    return len(recount())
+
+
+@periodic('schedule.refresh_reporting_snapshot', every=timedelta(minutes=settings.REPORTING_REFRESH_MINUTES))
+def refresh_reporting_snapshot():
+    """CSV 出力等で読むレポート用のスナップショットを作り直す"""
+    return take_reporting_snapshot()['bytes']
+
+
+@periodic('schedule.db_maintain', at=time(4, 0))
+def maintain_databases():
+    """SQLite の統計の更新・空きページの解放・整合性の検査（manage.py db_maintain と同じ、サイズの集計は省く）
+
+    古いタスクの削除（worker.purge_finished_tasks）の後に動かし、削除で空いたページも解放する。
+    """
+    results = [maintain(alias, sizes=False) for alias in maintained_aliases()]
+    failed = [result['alias'] for result in results if result['problems']]
+    if failed:
+        raise RuntimeError(f'整合性の検査で問題が見つかりました: {", ".join(failed)}')
+    return sum(result['released'] for result in results)
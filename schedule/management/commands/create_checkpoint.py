@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from schedule.history import create_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'スケジュールのチェックポイントを作成します（過去の時点の表示を速くするため定期実行してください）'
+
+    def handle(self, *args, **options):
+        checkpoint = create_checkpoint()
+        self.stdout.write(self.style.SUCCESS(
+            f'チェックポイントを作成しました（スケジュール{checkpoint.schedule_count}件, {len(checkpoint.data)} bytes）。'
+        ))
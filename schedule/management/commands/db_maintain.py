@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduleapp.maintenance import enable_incremental_vacuum, maintain, maintained_aliases
+
+
+def _size(value):
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f'{value:.0f}{unit}' if unit == 'B' else f'{value:.1f}{unit}'
+        value /= 1024
+    return f'{value:.1f}GB'
+
+
+class Command(BaseCommand):
+    help = ('SQLite のファイルの統計の更新・空きページの解放・整合性の検査を行い、'
+            'テーブル・索引毎のサイズと断片化の割合を表示します（稼働中に実行できます）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='対象の接続（複数指定可、既定は読み取り専用以外の全て）')
+        parser.add_argument('--full', action='store_true',
+                            help='統計を全行の走査で作り、整合性を integrity_check で検査する（時間が掛かる）')
+        parser.add_argument('--max-pages', type=int, help='解放する空きページ数の上限')
+        parser.add_argument('--no-vacuum', action='store_false', dest='vacuum', help='空きページを解放しない')
+        parser.add_argument('--top', type=int, default=10, help='サイズを表示するテーブル・索引の数（0 で省略）')
+        parser.add_argument('--enable-incremental', action='store_true',
+                            help='auto_vacuum を INCREMENTAL に切り替えて VACUUM する（全体をロックするため停止中に実行）')
+
+    def handle(self, *args, **options):
+        aliases = options['databases'] or maintained_aliases()
+        unknown = set(aliases) - set(maintained_aliases())
+        if unknown:
+            raise CommandError(f'保守の対象にできない接続です: {", ".join(sorted(unknown))}')
+
+        failed = []
+        for alias in aliases:
+            if options['enable_incremental']:
+                enable_incremental_vacuum(alias)
+                self.stdout.write(f'[{alias}] auto_vacuum を INCREMENTAL に切り替えました。')
+            result = maintain(alias, full=options['full'], vacuum=options['vacuum'],
+                              max_pages=options['max_pages'], sizes=options['top'] > 0)
+            before, after = result['before'], result['after']
+            self.stdout.write(
+                f'[{alias}] {_size(after["bytes"])}（{after["page_count"]}ページ）'
+                f' 空き {after["freelist_count"]}ページ・断片化 {after["fragmentation"]:.1%}'
+                f' / auto_vacuum={after["auto_vacuum"]} journal_mode={after["journal_mode"]}'
+                f' / {result["seconds"]:.2f}秒'
+            )
+            if result['released']:
+                self.stdout.write(f'  空きページを{result["released"]}ページ解放しました'
+                                  f'（{_size(before["bytes"])} → {_size(after["bytes"])}）。')
+            elif after['freelist_count'] and after['auto_vacuum'] != 'INCREMENTAL':
+                self.stdout.write(f'  空きページを解放するには停止中に --enable-incremental を付けて実行してください'
+                                  f'（{_size(after["free_bytes"])}）。')
+            if result['sizes']:
+                self.stdout.write(f'  {"サイズ":>7}{"使用率":>5}  {"種類":<4}名前')
+                for row in result['sizes'][:options['top']]:
+                    # 使用率はページ内で使われている割合（削除の多いテーブル・索引ほど低い）
+                    self.stdout.write(f'  {_size(row["bytes"]):>10}{row["fill"]:>8.0%}  {row["type"]:<6}{row["name"]}')
+            elif result['sizes'] is None and options['top'] > 0:
+                self.stdout.write('  この SQLite は dbstat に対応していないため、テーブル・索引毎のサイズは表示できません。')
+            if result['problems']:
+                failed.append(alias)
+                for problem in result['problems']:
+                    self.stderr.write(f'  {problem}')
+
+        if failed:
+            raise CommandError(f'整合性の検査で問題が見つかりました: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('保守が完了しました。'))
@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = ('DATABASE_ROUTES で別ファイルに置くテーブルの既存のデータを db.sqlite3 から移します'
+            '（先に migrate --database <接続名> を実行してください。移した後の元のテーブルは --drop で削除）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true', help='移した後に db.sqlite3 側のテーブルを削除する')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        tables = set(source.introspection.table_names())
+        for model in apps.get_models():
+            alias = router.db_for_write(model)
+            table = model._meta.db_table
+            if alias == DEFAULT_DB_ALIAS or table not in tables:
+                continue
+            if model.objects.using(alias).exists():
+                self.stdout.write(self.style.WARNING(f'{table}: {alias} に既にデータがあるためスキップしました。'))
+                continue
+            moved = 0
+            rows = model.objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+            last_pk = None
+            while True:
+                batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:BATCH_SIZE])
+                if not batch:
+                    break
+                model.objects.using(alias).bulk_create(batch)
+                moved += len(batch)
+                last_pk = batch[-1].pk
+            message = f'{table}: {moved}件を {alias} に移しました。'
+            if options['drop']:
+                with source.schema_editor() as editor:
+                    editor.delete_model(model)
+                message += '（元のテーブルは削除）'
+            self.stdout.write(self.style.SUCCESS(message))
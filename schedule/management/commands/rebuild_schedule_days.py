@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from schedule.occupancy import BATCH_SIZE, rebuild_schedule_days
+
+
+class Command(BaseCommand):
+    help = 'スケジュールの稼働日毎の行（ScheduleDay）を全件作り直します（祝日の追加時などに実行してください）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='一度に書き込む件数')
+
+    def handle(self, *args, **options):
+        total = rebuild_schedule_days(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'ScheduleDay を{total}件作成しました。'))
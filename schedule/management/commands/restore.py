@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from scheduleapp.backup import (
+    BackupError, companion_aliases, companion_path, database_path, restore_database, verify_backup,
+)
+
+
+class Command(BaseCommand):
+    help = ('manage.py snapshot で作成したバックアップから DB を復元します'
+            '（Web・ワーカーのプロセスを止めてから実行してください）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='復元するバックアップのファイル')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='復元先の接続')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='確認せずに復元する')
+        parser.add_argument('--without-companions', action='store_true',
+                            help='補助テーブルの接続のバックアップが無くても、既定の接続だけを復元する'
+                                 '（監査ログ等がチェックポイントより進んだままになる）')
+
+    def handle(self, *args, **options):
+        # キャッシュの名前空間はそれを使うモジュールの読み込み時に登録されるため、復元後の無効化の前に読み込む
+        import schedule.views  # noqa: F401
+
+        alias = options['database']
+        # 既定の接続は、補助テーブルの接続（DATABASE_ROUTES）のバックアップと組で復元する
+        plan = [(alias, options['path'])]
+        missing = []
+        for companion in companion_aliases(alias):
+            path = companion_path(options['path'], companion)
+            if path.exists():
+                plan.append((companion, path))
+            else:
+                missing.append(f'{companion}（{path}）')
+        if missing and not options['without_companions']:
+            raise CommandError(
+                f'補助テーブルの接続のバックアップがありません: {", ".join(missing)}。'
+                '既定の接続だけを復元すると監査ログ等がチェックポイントと食い違うため、'
+                'manage.py snapshot --output で組のバックアップを作るか、--without-companions を付けて実行してください。'
+            )
+
+        if options['interactive']:
+            targets = '、'.join(f'{database_path(a)} を {path}' for a, path in plan)
+            answer = input(f'{targets} の内容で置き換えます。よろしいですか？ [y/N] ')
+            if answer.strip().lower() not in ('y', 'yes'):
+                self.stdout.write('中止しました。')
+                return
+        try:
+            # 途中で失敗して一部だけ復元されないよう、先に全てのバックアップを検査する
+            for _, path in plan:
+                verify_backup(path)
+            results = [restore_database(path, alias=a) for a, path in plan]
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        for result in results:
+            self.stdout.write(self.style.SUCCESS(
+                f'{result["path"]} を復元しました（{result["pages"]}ページ、{result["seconds"]:.2f}秒）。'
+            ))
+        if missing:
+            self.stderr.write(f'補助テーブルの接続は復元していません: {", ".join(missing)}')
+        self.stdout.write('キャッシュを無効化しました。')
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schedule.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = '納期・開始日の通知メールを送信します（送信済みの通知は再送しません）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='基準日（YYYY-MM-DD。既定は今日）')
+        parser.add_argument('--dry-run', action='store_true', help='送信せずに件数だけ表示する')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('日付は YYYY-MM-DD 形式で指定してください。')
+        sent, notified, failed = send_digests(today, dry_run=options['dry_run'])
+        action = '送信対象' if options['dry_run'] else '送信'
+        self.stdout.write(self.style.SUCCESS(f'{action}: メール{sent}通（通知{notified}件）, 失敗{failed}通。'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from scheduleapp.backup import (
+    BackupError, backup_database, companion_aliases, companion_path, take_reporting_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = ('稼働中の DB をバックアップ API で少しずつ複写し、一貫したコピーを作ります'
+            '（既定はレポート用のスナップショット REPORTING_SNAPSHOT を作り直す）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='レポート用ではなく、このパスにバックアップを書き出す'
+                                             '（既定の接続なら補助テーブルの接続も同じ場所に書き出す）')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='複写する接続（--output 指定時）')
+        parser.add_argument('--pages', type=int, help='一度に複写するページ数（既定は SNAPSHOT_PAGES）')
+
+    def handle(self, *args, **options):
+        try:
+            if options['output']:
+                results = [backup_database(options['output'], alias=options['database'], pages=options['pages'])]
+                for alias in companion_aliases(options['database']):
+                    results.append(backup_database(
+                        companion_path(options['output'], alias), alias=alias, pages=options['pages'],
+                    ))
+            else:
+                results = [take_reporting_snapshot()]
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        for result in results:
+            self.stdout.write(self.style.SUCCESS(
+                f'{result["path"]} を作成しました（{result["pages"]}ページ・{result["bytes"]:,}バイト、'
+                f'{result["steps"]}回に分けて {result["seconds"]:.2f}秒）。'
+            ))
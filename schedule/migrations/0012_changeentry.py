@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0011_project_completed_at_project_is_completed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', '案件'), ('schedule', 'スケジュール')], max_length=10, verbose_name='種別')),
+                ('object_id', models.BigIntegerField(verbose_name='対象ID')),
+                ('op', models.CharField(choices=[('upsert', '作成・更新'), ('delete', '削除')], max_length=10, verbose_name='操作')),
+                ('changed_at', models.DateTimeField(auto_now=True, verbose_name='変更日時')),
+            ],
+            options={
+                'verbose_name': '変更履歴',
+                'verbose_name_plural': '変更履歴',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_change_per_object')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from schedule.workdays import workdays_in_range
+
+
+def populate_schedule_days(apps, schema_editor):
+    """既存スケジュールを稼働日毎の行に展開"""
+    Schedule = apps.get_model('schedule', 'Schedule')
+    ScheduleDay = apps.get_model('schedule', 'ScheduleDay')
+    rows = []
+    for s in Schedule.objects.select_related('project').iterator():
+        for d in workdays_in_range(s.start_date, s.end_date):
+            rows.append(ScheduleDay(
+                schedule_id=s.pk, date=d, assignee_id=s.project.assigned_to_id,
+                project_id=s.project_id, field_id=s.field_id,
+            ))
+    ScheduleDay.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0012_changeentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('assignee', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='担当者')),
+                ('field', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schedule.field', verbose_name='分野')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schedule.project', verbose_name='案件')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='schedule.schedule', verbose_name='スケジュール')),
+            ],
+            options={
+                'verbose_name': 'スケジュール稼働日',
+                'verbose_name_plural': 'スケジュール稼働日',
+                'indexes': [models.Index(fields=['date', 'assignee', 'schedule'], name='scheduleday_date_assignee_idx'), models.Index(fields=['assignee', 'date', 'schedule'], name='scheduleday_assignee_date_idx')],
+            },
+        ),
+        migrations.RunPython(populate_schedule_days, migrations.RunPython.noop),
+    ]
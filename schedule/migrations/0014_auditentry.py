@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0013_scheduleday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', '案件'), ('schedule', 'スケジュール')], max_length=10, verbose_name='種別')),
+                ('object_id', models.BigIntegerField(verbose_name='対象ID')),
+                ('project_id', models.BigIntegerField(verbose_name='案件ID')),
+                ('action', models.CharField(choices=[('create', '作成'), ('update', '更新'), ('delete', '削除')], max_length=10, verbose_name='操作')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='変更者ID')),
+                ('changed_at', models.DateTimeField(verbose_name='変更日時')),
+                ('changes', models.TextField(verbose_name='変更内容')),
+            ],
+            options={
+                'verbose_name': '監査ログ',
+                'verbose_name_plural': '監査ログ',
+                'indexes': [models.Index(fields=['project_id', 'changed_at'], name='auditentry_project_idx'), models.Index(fields=['changed_at'], name='auditentry_changed_at_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:08
+
+import json
+import zlib
+
+from django.db import connections, migrations, models, router
+from django.db.models import Max
+from django.utils import timezone
+
+
+def create_initial_checkpoint(apps, schema_editor):
+    """監査ログの起点として現在のスケジュールのチェックポイントを作成"""
+    Schedule = apps.get_model('schedule', 'Schedule')
+    AuditEntry = apps.get_model('schedule', 'AuditEntry')
+    ScheduleCheckpoint = apps.get_model('schedule', 'ScheduleCheckpoint')
+    rows = [
+        [i, project_id, field_id, start.toordinal(), end.toordinal(), status]
+        for i, project_id, field_id, start, end, status in Schedule.objects.order_by('id')
+        .values_list('id', 'project_id', 'field_id', 'start_date', 'end_date', 'status')
+    ]
+    # 監査ログを別ファイルに置く場合（DATABASE_ROUTES）、そちらがまだ作成されていなければ起点は 0
+    audit_db = router.db_for_read(AuditEntry)
+    last_audit_id = 0
+    if AuditEntry._meta.db_table in connections[audit_db].introspection.table_names():
+        last_audit_id = AuditEntry.objects.using(audit_db).aggregate(last=Max('id'))['last'] or 0
+    ScheduleCheckpoint.objects.create(
+        taken_at=timezone.now(),
+        last_audit_id=last_audit_id,
+        schedule_count=len(rows),
+        data=zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 9),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0014_auditentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True, verbose_name='作成日時')),
+                ('last_audit_id', models.BigIntegerField(verbose_name='反映済みの監査ログID')),
+                ('schedule_count', models.IntegerField(verbose_name='スケジュール数')),
+                ('data', models.BinaryField(verbose_name='データ')),
+            ],
+            options={
+                'verbose_name': 'スケジュールのチェックポイント',
+                'verbose_name_plural': 'スケジュールのチェックポイント',
+            },
+        ),
+        migrations.RunPython(create_initial_checkpoint, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0015_schedulecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_id', models.BigIntegerField(verbose_name='宛先ユーザーID')),
+                ('kind', models.CharField(choices=[('project_due', '納期が近い案件'), ('project_overdue', '納期を過ぎた案件'), ('schedule_start', '開始日が近いスケジュール'), ('schedule_overdue', '終了日を過ぎたスケジュール')], max_length=20, verbose_name='種別')),
+                ('object_id', models.BigIntegerField(verbose_name='対象ID')),
+                ('target_date', models.DateField(verbose_name='基準日')),
+                ('sent_at', models.DateTimeField(verbose_name='送信日時')),
+            ],
+            options={
+                'verbose_name': '通知の送信記録',
+                'verbose_name_plural': '通知の送信記録',
+                'constraints': [models.UniqueConstraint(fields=('recipient_id', 'kind', 'object_id', 'target_date'), name='notificationlog_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0016_notificationlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='バージョン'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='バージョン'),
+        ),
+    ]
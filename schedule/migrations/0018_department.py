@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_departments(apps, schema_editor):
+    """既存の案件は登録者の部署を所属部署とし、スケジュールに複製"""
+    Project = apps.get_model('schedule', 'Project')
+    Schedule = apps.get_model('schedule', 'Schedule')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Project.objects.update(department=Subquery(
+        User.objects.filter(pk=OuterRef('created_by_id')).values('department')[:1]
+    ))
+    Schedule.objects.update(department=Subquery(
+        Project.objects.filter(pk=OuterRef('project_id')).values('department')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0017_project_schedule_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='department',
+            field=models.CharField(blank=True, max_length=100, verbose_name='部署'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='department',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='部署'),
+        ),
+        migrations.RunPython(populate_departments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['department', 'name'], name='project_department_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['department', 'start_date', 'end_date'], name='schedule_department_idx'),
+        ),
+    ]
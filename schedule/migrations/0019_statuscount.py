@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_status_counts(apps, schema_editor):
+    """既存の案件・スケジュールの状態毎の件数を数える"""
+    Project = apps.get_model('schedule', 'Project')
+    Schedule = apps.get_model('schedule', 'Schedule')
+    StatusCount = apps.get_model('schedule', 'StatusCount')
+    counts = {
+        ('project', 'active'): 0, ('project', 'completed'): 0,
+        ('schedule', 'pending'): 0, ('schedule', 'in_progress'): 0, ('schedule', 'completed'): 0,
+    }
+    for row in Project.objects.values('is_completed').annotate(n=Count('id')).order_by():
+        counts['project', 'completed' if row['is_completed'] else 'active'] += row['n']
+    for row in Schedule.objects.values('status').annotate(n=Count('id')).order_by():
+        counts['schedule', row['status']] = row['n']
+    StatusCount.objects.bulk_create([
+        StatusCount(kind=kind, status=status, count=count) for (kind, status), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0018_department'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', '案件'), ('schedule', 'スケジュール')], max_length=10, verbose_name='種別')),
+                ('status', models.CharField(max_length=20, verbose_name='状態')),
+                ('count', models.IntegerField(default=0, verbose_name='件数')),
+            ],
+            options={
+                'verbose_name': '状態毎の件数',
+                'verbose_name_plural': '状態毎の件数',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'status'), name='statuscount_unique')],
+            },
+        ),
+        migrations.RunPython(populate_status_counts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+
+from .workdays import count_workdays
 
 User = get_user_model()
 
@@ -17,7 +20,38 @@ class Field(models.Model):
     def __str__(self):
         return self.name
 
-class Project(models.Model):
+class ConcurrentUpdateError(Exception):
+    """編集中に他のユーザーが同じデータを更新していた（楽観的ロックの競合）"""
+
+    def __init__(self, instance):
+        super().__init__(f'{instance._meta.verbose_name} {instance.pk} は他のユーザーによって更新されています')
+        self.instance = instance
+
+
+class OptimisticLockMixin:
+    """version 列による楽観的ロック
+
+    保存は UPDATE ... WHERE id = ? AND version = ? で行い、同時に version を1つ進める。
+    一致する行が無ければ（読み込み後に他で更新されていれば）ConcurrentUpdateError を送出する。
+    競合しない通常の保存ではクエリは増えない。
+    """
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if not values:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        version_field = self._meta.get_field('version')
+        values = [(f, model, v) for f, model, v in values if f is not version_field]
+        values.append((version_field, None, self.version + 1))
+        if base_qs.filter(pk=pk_val, version=self.version)._update(values) > 0:
+            self.version += 1
+            return True
+        if not base_qs.filter(pk=pk_val).exists():
+            # 行が無ければ通常どおり INSERT させる
+            return False
+        raise ConcurrentUpdateError(self)
+
+
+class Project(OptimisticLockMixin, models.Model):
     """案件モデル"""
     name = models.CharField('案件名', max_length=200)
     manufacturing_number = models.CharField('製造番号', max_length=100)
@@ -27,15 +61,28 @@ class Project(models.Model):
     completed_at = models.DateTimeField('完了日時', null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='登録者', related_name='created_projects')
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='担当者', related_name='assigned_projects')
+    department = models.CharField('部署', max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField('バージョン', default=1, editable=False)
 
     class Meta:
         verbose_name = '案件'
         verbose_name_plural = '案件'
+        indexes = [
+            # 部署単位の案件一覧（既定の案件名順）
+            models.Index(fields=['department', 'name'], name='project_department_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.manufacturing_number})'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 監査ログの差分用に読み込み時の値を保持
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     def toggle_completion(self):
         """完了状態を切り替える"""
@@ -57,7 +104,7 @@ class Project(models.Model):
         return not self.has_schedules()
 
 
-class Schedule(models.Model):
+class Schedule(OptimisticLockMixin, models.Model):
     """スケジュールモデル"""
     STATUS_CHOICES = [
         ('pending', '予定'),
@@ -72,21 +119,45 @@ class Schedule(models.Model):
     status = models.CharField('ステータス', max_length=20, choices=STATUS_CHOICES, default='pending')
     description = models.TextField('詳細', blank=True)
     completed_at = models.DateTimeField('完了日時', null=True, blank=True)
+    # 案件の部署の複製（部署単位のカレンダー等を案件と結合せずにインデックスで引くため）
+    department = models.CharField('部署', max_length=100, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField('バージョン', default=1, editable=False)
 
     class Meta:
         verbose_name = 'スケジュール'
         verbose_name_plural = 'スケジュール'
+        indexes = [
+            models.Index(fields=['department', 'start_date', 'end_date'], name='schedule_department_idx'),
+        ]
 
     def __str__(self):
         return f'{self.project.name} - {self.field.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 監査ログの差分用に読み込み時の値を保持
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # 作成時・案件の変更時に案件の部署を複製する（案件側の変更はシグナルで反映）
+        if self._state.adding or getattr(self, '_loaded_values', {}).get('project_id') != self.project_id:
+            self.department = self.project.department
+        super().save(*args, **kwargs)
+
     @property
     def duration_days(self):
         """期間（日数）を計算"""
         return (self.end_date - self.start_date).days + 1
 
+    @cached_property
+    def workdays(self):
+        """期間（稼働日数）を計算（日曜・祝日を除く）"""
+        return count_workdays(self.start_date, self.end_date)
+
     def update_status_by_date(self):
         """現在の日付に基づいてステータスを自動更新（完了以外）"""
         from django.utils import timezone
@@ -119,3 +190,166 @@ class Schedule(models.Model):
             # 完了にする
             self.status = 'completed'
             self.completed_at = timezone.now()
+
+
+class ChangeEntry(models.Model):
+    """変更履歴（差分同期用）
+
+    id が単調増加する変更シーケンスを兼ねる。1オブジェクトにつき最新の1行だけを保持し、
+    削除されたオブジェクトは op='delete' の行（トゥームストーン）として残す。
+    """
+    KIND_CHOICES = [
+        ('project', '案件'),
+        ('schedule', 'スケジュール'),
+    ]
+    OP_CHOICES = [
+        ('upsert', '作成・更新'),
+        ('delete', '削除'),
+    ]
+
+    kind = models.CharField('種別', max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('対象ID')
+    op = models.CharField('操作', max_length=10, choices=OP_CHOICES)
+    changed_at = models.DateTimeField('変更日時', auto_now=True)
+
+    class Meta:
+        verbose_name = '変更履歴'
+        verbose_name_plural = '変更履歴'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_change_per_object'),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.kind}:{self.object_id} {self.op}'
+
+
+class ScheduleDay(models.Model):
+    """スケジュールを稼働日毎に展開した行（日付・担当者からの逆引き用）
+
+    Schedule の保存時にシグナルで作り直す。担当者・分野・案件は
+    インデックスだけで絞り込めるよう非正規化して持つ。
+    """
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='days', verbose_name='スケジュール')
+    date = models.DateField('日付')
+    assignee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False, verbose_name='担当者')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+', verbose_name='案件')
+    field = models.ForeignKey(Field, on_delete=models.CASCADE, related_name='+', db_index=False, verbose_name='分野')
+
+    class Meta:
+        verbose_name = 'スケジュール稼働日'
+        verbose_name_plural = 'スケジュール稼働日'
+        indexes = [
+            # 末尾に schedule を含め、日付・担当者での検索をインデックスのみで完結させる
+            models.Index(fields=['date', 'assignee', 'schedule'], name='scheduleday_date_assignee_idx'),
+            models.Index(fields=['assignee', 'date', 'schedule'], name='scheduleday_assignee_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.schedule_id}'
+
+
+class AuditEntry(models.Model):
+    """案件・スケジュールの変更監査ログ（追記のみ）
+
+    別DBへ移せるよう外部キーは持たず、ID のみ保持する。
+    changes は項目毎の差分 {項目: [変更前, 変更後]}（作成・削除時は全項目の値）の JSON。
+    """
+    KIND_CHOICES = ChangeEntry.KIND_CHOICES
+    ACTION_CHOICES = [
+        ('create', '作成'),
+        ('update', '更新'),
+        ('delete', '削除'),
+    ]
+
+    kind = models.CharField('種別', max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('対象ID')
+    project_id = models.BigIntegerField('案件ID')
+    action = models.CharField('操作', max_length=10, choices=ACTION_CHOICES)
+    user_id = models.BigIntegerField('変更者ID', null=True, blank=True)
+    changed_at = models.DateTimeField('変更日時')
+    changes = models.TextField('変更内容')
+
+    class Meta:
+        verbose_name = '監査ログ'
+        verbose_name_plural = '監査ログ'
+        indexes = [
+            models.Index(fields=['project_id', 'changed_at'], name='auditentry_project_idx'),
+            models.Index(fields=['changed_at'], name='auditentry_changed_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.changed_at:%Y-%m-%d %H:%M} {self.kind}:{self.object_id} {self.action}'
+
+
+class ScheduleCheckpoint(models.Model):
+    """ある時点の全スケジュールの期間のスナップショット
+
+    過去の時点の計画は、その時点以前で最新のチェックポイントに
+    監査ログ（last_audit_id より後の変更）を順に適用して復元する。
+    data は [スケジュールID, 案件ID, 分野ID, 開始日(序数), 終了日(序数), ステータス] の配列を
+    JSON にして zlib で圧縮したもの。
+    """
+    taken_at = models.DateTimeField('作成日時', db_index=True)
+    last_audit_id = models.BigIntegerField('反映済みの監査ログID')
+    schedule_count = models.IntegerField('スケジュール数')
+    data = models.BinaryField('データ')
+
+    class Meta:
+        verbose_name = 'スケジュールのチェックポイント'
+        verbose_name_plural = 'スケジュールのチェックポイント'
+
+    def __str__(self):
+        return f'{self.taken_at:%Y-%m-%d %H:%M} ({self.schedule_count}件)'
+
+
+class NotificationLog(models.Model):
+    """通知メールの送信記録（同じ通知を二重に送らないため）
+
+    通知は (宛先, 種別, 対象, 基準日) で一意とし、納期・開始日が変われば改めて通知する。
+    監査ログと同様に外部キーは持たず、ID のみ保持する。
+    """
+    KIND_CHOICES = [
+        ('project_due', '納期が近い案件'),
+        ('project_overdue', '納期を過ぎた案件'),
+        ('schedule_start', '開始日が近いスケジュール'),
+        ('schedule_overdue', '終了日を過ぎたスケジュール'),
+    ]
+
+    recipient_id = models.BigIntegerField('宛先ユーザーID')
+    kind = models.CharField('種別', max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('対象ID')
+    target_date = models.DateField('基準日')
+    sent_at = models.DateTimeField('送信日時')
+
+    class Meta:
+        verbose_name = '通知の送信記録'
+        verbose_name_plural = '通知の送信記録'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient_id', 'kind', 'object_id', 'target_date'], name='notificationlog_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.sent_at:%Y-%m-%d %H:%M} {self.kind}:{self.object_id} → {self.recipient_id}'
+
+
+class StatusCount(models.Model):
+    """案件・スケジュールの状態毎の件数（/metrics の取得毎に数え直さないための集計）
+
+    保存・削除のシグナルで増減し、定期ジョブで実際の件数に合わせ直す。
+    案件の状態は完了フラグから 'active' / 'completed' とする。
+    """
+    kind = models.CharField('種別', max_length=10, choices=ChangeEntry.KIND_CHOICES)
+    status = models.CharField('状態', max_length=20)
+    count = models.IntegerField('件数', default=0)
+
+    class Meta:
+        verbose_name = '状態毎の件数'
+        verbose_name_plural = '状態毎の件数'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'status'], name='statuscount_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.status} {self.count}'
@@ -0,0 +1,147 @@
+"""納期・開始日の通知メール（ダイジェスト）
+
+未完了の案件で納期が近い・過ぎたもの、スケジュールで開始日が近い・終了日を過ぎたものを集め、
+宛先（担当者・登録者・マネージャー）毎に1通のメールにまとめて送る。自部署のみのマネージャーには自分の部署の案件だけを送る。
+- 対象の取得は件数に関係なく一定回数のクエリ（案件・スケジュール・マネージャー・送信記録）
+- 送信は1回の実行につき1つの SMTP 接続で行う
+- 送信済みの通知は宛先毎に送信直後に NotificationLog に記録し、再実行しても同じ通知は送らない
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import NotificationLog, Project, Schedule
+
+logger = logging.getLogger(__name__)
+
+KIND_LABELS = dict(NotificationLog.KIND_CHOICES)
+
+
+def collect_items(today):
+    """通知対象の一覧 [(種別, 対象, 基準日, 宛先ユーザーの集合)]"""
+    User = get_user_model()
+    due_limit = today + timedelta(days=settings.DIGEST_DUE_DAYS)
+    start_limit = today + timedelta(days=settings.DIGEST_START_DAYS)
+    projects = Project.objects.filter(is_completed=False, due_date__lte=due_limit)
+    schedules = Schedule.objects.exclude(status='completed').filter(project__is_completed=False).filter(
+        Q(start_date__range=(today, start_limit)) | Q(end_date__lt=today)
+    )
+    # 自部署のみのマネージャーは部署毎に分け、案件の部署が一致する場合だけ宛先に加える
+    managers = []
+    department_managers = defaultdict(list)
+    for manager in User.objects.filter(is_manager=True, is_active=True):
+        if manager.department_only and manager.department:
+            department_managers[manager.department].append(manager)
+        else:
+            managers.append(manager)
+
+    items = []
+    for p in projects.select_related('created_by', 'assigned_to').order_by('due_date', 'name'):
+        kind = 'project_overdue' if p.due_date < today else 'project_due'
+        items.append((kind, p, p.due_date, {
+            p.assigned_to, p.created_by, *managers, *department_managers[p.department],
+        }))
+    for s in schedules.select_related('project__created_by', 'project__assigned_to', 'field')\
+            .order_by('start_date', 'project__name'):
+        if s.end_date < today:
+            kind, target = 'schedule_overdue', s.end_date
+        else:
+            kind, target = 'schedule_start', s.start_date
+        items.append((kind, s, target, {
+            s.project.assigned_to, s.project.created_by, *managers, *department_managers[s.project.department],
+        }))
+    return items
+
+
+def sent_keys(items):
+    """送信済みの (宛先ID, 種別, 対象ID, 基準日)
+
+    NotificationLog は別ファイルの接続（DATABASE_ROUTES）に置くため、案件・スケジュールの
+    テーブルを副問い合わせにせず、取得済みの対象のIDで絞り込む。
+    """
+    project_ids = [obj.pk for kind, obj, _, _ in items if kind.startswith('project')]
+    schedule_ids = [obj.pk for kind, obj, _, _ in items if kind.startswith('schedule')]
+    logs = NotificationLog.objects.filter(
+        Q(kind__in=['project_due', 'project_overdue'], object_id__in=project_ids)
+        | Q(kind__in=['schedule_start', 'schedule_overdue'], object_id__in=schedule_ids)
+    ).values_list('recipient_id', 'kind', 'object_id', 'target_date')
+    return set(logs)
+
+
+def build_digests(today=None):
+    """宛先毎の未送信の通知 {ユーザー: [(種別, 対象, 基準日)]}"""
+    today = today or timezone.localdate()
+    items = collect_items(today)
+    sent = sent_keys(items)
+    digests = defaultdict(list)
+    for kind, obj, target, recipients in items:
+        for user in recipients:
+            if not user.is_active or not user.email:
+                continue
+            if (user.pk, kind, obj.pk, target) in sent:
+                continue
+            digests[user].append((kind, obj, target))
+    return digests
+
+
+def render_digest(user, entries, today):
+    sections = [
+        {
+            'label': label,
+            'is_project': kind.startswith('project'),
+            'entries': [(obj, target) for k, obj, target in entries if k == kind],
+        }
+        for kind, label in NotificationLog.KIND_CHOICES
+    ]
+    context = {
+        'user': user,
+        'today': today,
+        'sections': [section for section in sections if section['entries']],
+        'count': len(entries),
+    }
+    subject = f'【スケジュール管理】{today:%m/%d} の通知（{len(entries)}件）'
+    return subject, render_to_string('schedule/email/digest.txt', context)
+
+
+def send_digests(today=None, dry_run=False):
+    """ダイジェストを送信し、(送信したメール数, 通知件数, 失敗したメール数) を返す"""
+    today = today or timezone.localdate()
+    digests = build_digests(today)
+    if dry_run:
+        return len(digests), sum(len(entries) for entries in digests.values()), 0
+
+    now = timezone.now()
+    sent = failed = logged = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for user, entries in digests.items():
+            try:
+                subject, body = render_digest(user, entries, today)
+                message = EmailMessage(
+                    subject, body, settings.DEFAULT_FROM_EMAIL, [user.email], connection=connection,
+                )
+                message.send()
+            except Exception:
+                # 送れなかった宛先は記録せず、次回の実行で再送する
+                logger.exception('%s への通知メールの送信に失敗しました', user.email)
+                failed += 1
+                continue
+            sent += 1
+            # 途中で止まっても送った分を再送しないよう、宛先毎に送信直後に記録する
+            logs = [
+                NotificationLog(recipient_id=user.pk, kind=kind, object_id=obj.pk, target_date=target, sent_at=now)
+                for kind, obj, target in entries
+            ]
+            NotificationLog.objects.bulk_create(logs, batch_size=500, ignore_conflicts=True)
+            logged += len(logs)
+    finally:
+        connection.close()
+    return sent, logged, failed
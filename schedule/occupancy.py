@@ -0,0 +1,77 @@
+"""日付毎の稼働状況（ScheduleDay）
+
+スケジュールを稼働日毎の行に展開しておき、「D日に誰が何をしているか」を
+Schedule の期間による範囲検索ではなく (date, assignee) インデックスで引く。
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Schedule, ScheduleDay
+from .workdays import workdays_in_range
+
+BATCH_SIZE = 2000
+
+
+def schedule_day_rows(schedules):
+    """スケジュール（project 読み込み済み）を稼働日毎の ScheduleDay に展開"""
+    rows = []
+    for s in schedules:
+        for d in workdays_in_range(s.start_date, s.end_date):
+            rows.append(ScheduleDay(
+                schedule_id=s.pk, date=d, assignee_id=s.project.assigned_to_id,
+                project_id=s.project_id, field_id=s.field_id,
+            ))
+    return rows
+
+
+def sync_schedule_days(schedules):
+    """指定したスケジュールの ScheduleDay を作り直す"""
+    schedules = list(schedules)
+    if not schedules:
+        return
+    with transaction.atomic():
+        ScheduleDay.objects.filter(schedule_id__in=[s.pk for s in schedules]).delete()
+        ScheduleDay.objects.bulk_create(schedule_day_rows(schedules), batch_size=BATCH_SIZE)
+
+
+def update_project_assignee(project):
+    """案件の担当者変更を ScheduleDay に反映"""
+    ScheduleDay.objects.filter(project=project).exclude(assignee_id=project.assigned_to_id)\
+        .update(assignee_id=project.assigned_to_id)
+
+
+def rebuild_schedule_days(batch_size=BATCH_SIZE):
+    """全スケジュールから ScheduleDay を作り直し、作成した行数を返す"""
+    total = 0
+    schedules = Schedule.objects.select_related('project')\
+        .only('id', 'start_date', 'end_date', 'field_id', 'project__assigned_to_id')
+    with transaction.atomic():
+        ScheduleDay.objects.all().delete()
+        chunk = []
+        for s in schedules.iterator(chunk_size=batch_size):
+            chunk.append(s)
+            if len(chunk) >= batch_size:
+                total += len(ScheduleDay.objects.bulk_create(schedule_day_rows(chunk), batch_size=batch_size))
+                chunk = []
+        total += len(ScheduleDay.objects.bulk_create(schedule_day_rows(chunk), batch_size=batch_size))
+    return total
+
+
+def schedule_ids_by_date(start, end, assignee_id=None):
+    """start〜end の日付毎のスケジュールID"""
+    days = ScheduleDay.objects.filter(date__range=(start, end))
+    if assignee_id:
+        days = days.filter(assignee_id=assignee_id)
+    result = defaultdict(list)
+    for d, schedule_id in days.values_list('date', 'schedule_id'):
+        result[d].append(schedule_id)
+    return result
+
+
+def daily_headcounts(start, end):
+    """start〜end の日付毎の稼働人数（担当者数）"""
+    rows = ScheduleDay.objects.filter(date__range=(start, end)).values('date')\
+        .annotate(headcount=Count('assignee', distinct=True)).values_list('date', 'headcount')
+    return dict(rows)
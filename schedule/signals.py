@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .audit import audit_deleted, audit_saved
+from .changes import record_change
+from .departments import invalidate_department_choices, sync_project_department
+from .events import publish_change
+from .models import Project, Schedule
+from .occupancy import sync_schedule_days, update_project_assignee
+from .status_counts import count_deleted, count_saved
+
+
+def _schedule_owner_ids(schedule):
+    """スケジュールの案件の登録者・担当者ID（案件が読み込み済みの場合のみ）"""
+    if Schedule.project.is_cached(schedule):
+        return [schedule.project.created_by_id, schedule.project.assigned_to_id]
+    return list(
+        Project.objects.filter(pk=schedule.project_id)
+        .values_list('created_by_id', 'assigned_to_id').first() or []
+    )
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    count_saved('project', instance, created)
+    audit_saved('project', instance, created)
+    if not created:
+        update_project_assignee(instance)
+        sync_project_department(instance)
+    record_change('project', instance.pk, 'upsert')
+    publish_change('project', 'upsert', instance.pk, instance.pk,
+                   [instance.created_by_id, instance.assigned_to_id], instance.department)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    count_deleted('project', instance)
+    audit_deleted('project', instance)
+    record_change('project', instance.pk, 'delete')
+    publish_change('project', 'delete', instance.pk, instance.pk,
+                   [instance.created_by_id, instance.assigned_to_id], instance.department)
+
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, created, **kwargs):
+    count_saved('schedule', instance, created)
+    audit_saved('schedule', instance, created)
+    sync_schedule_days([instance])
+    record_change('schedule', instance.pk, 'upsert')
+    publish_change('schedule', 'upsert', instance.pk, instance.project_id,
+                   _schedule_owner_ids(instance), instance.department)
+
+
+@receiver(post_delete, sender=Schedule)
+def schedule_deleted(sender, instance, **kwargs):
+    count_deleted('schedule', instance)
+    audit_deleted('schedule', instance)
+    record_change('schedule', instance.pk, 'delete')
+    publish_change('schedule', 'delete', instance.pk, instance.project_id,
+                   _schedule_owner_ids(instance), instance.department)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # 部署の一覧（切替の選択肢）を作り直させる
+    invalidate_department_choices()
@@ -0,0 +1,103 @@
+"""案件・スケジュールの状態毎の件数
+
+/metrics の取得毎に COUNT(*) を数え直さないよう StatusCount に件数を持ち、
+保存・削除のシグナルと bulk_update の記録（changes.record_schedule_bulk_update）で増減する。
+増減はシグナルの受信側で保存とは別の文として行う。呼び出し側が transaction.atomic() の中で保存していれば
+ロールバックで件数も戻るが、自動コミットの保存（多くのビュー）では行の書き込みと件数の増減が別々にコミットされ、
+その間で失敗すると件数がずれる。このずれと、シグナルを通らない更新（QuerySet.update 等）によるずれは、
+定期ジョブ（schedule.recount_statuses、1時間毎）で数え直して直す。
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Project, Schedule, StatusCount
+
+PROJECT_STATUSES = ('active', 'completed')
+STATUSES = {
+    'project': PROJECT_STATUSES,
+    'schedule': tuple(value for value, _label in Schedule.STATUS_CHOICES),
+}
+# 状態を表す項目（attname）
+STATUS_FIELDS = {
+    'project': 'is_completed',
+    'schedule': 'status',
+}
+
+
+def _status(kind, value):
+    if kind == 'project':
+        return 'completed' if value else 'active'
+    return value
+
+
+def _adjust(kind, deltas):
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        if not StatusCount.objects.filter(kind=kind, status=status).update(count=F('count') + delta):
+            # 未知の状態（選択肢の追加後、数え直し前）の初回
+            StatusCount.objects.get_or_create(kind=kind, status=status)
+            StatusCount.objects.filter(kind=kind, status=status).update(count=F('count') + delta)
+
+
+def _changes(kind, instances):
+    """読み込み時からの状態の変化による増減（読み込んでいない場合は分からないので数えない）"""
+    field = STATUS_FIELDS[kind]
+    deltas = Counter()
+    for instance in instances:
+        loaded = getattr(instance, '_loaded_values', {})
+        if field not in loaded:
+            continue
+        old, new = _status(kind, loaded[field]), _status(kind, getattr(instance, field))
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    return deltas
+
+
+def count_saved(kind, instance, created):
+    """保存された案件・スケジュールの件数を反映（audit_saved が読み込み時の値を更新する前に呼ぶ）"""
+    if created:
+        _adjust(kind, {_status(kind, getattr(instance, STATUS_FIELDS[kind])): 1})
+    else:
+        _adjust(kind, _changes(kind, [instance]))
+
+
+def count_deleted(kind, instance):
+    _adjust(kind, {_status(kind, getattr(instance, STATUS_FIELDS[kind])): -1})
+
+
+def count_bulk_update(kind, instances):
+    """bulk_update で更新したオブジェクトの件数を反映（audit_bulk_update より前に呼ぶ）"""
+    _adjust(kind, _changes(kind, instances))
+
+
+def actual_counts():
+    """実際の状態毎の件数 {(種別, 状態): 件数}（無い状態は 0）"""
+    counts = {(kind, status): 0 for kind, statuses in STATUSES.items() for status in statuses}
+    for row in Project.objects.values('is_completed').annotate(n=Count('id')).order_by():
+        counts['project', _status('project', row['is_completed'])] += row['n']
+    for row in Schedule.objects.values('status').annotate(n=Count('id')).order_by():
+        counts['schedule', row['status']] = row['n']
+    return counts
+
+
+def status_counts():
+    """保持している状態毎の件数 {(種別, 状態): 件数}"""
+    return {(row.kind, row.status): row.count for row in StatusCount.objects.all()}
+
+
+def recount():
+    """実際の件数に合わせ直し、ずれていた (種別, 状態) の一覧を返す"""
+    with transaction.atomic():
+        counts = actual_counts()
+        stored = status_counts()
+        drifted = [key for key, count in counts.items() if stored.get(key) != count]
+        drifted += [key for key in stored if key not in counts and stored[key]]
+        for kind, status in drifted:
+            StatusCount.objects.update_or_create(
+                kind=kind, status=status, defaults={'count': counts.get((kind, status), 0)},
+            )
+    return drifted
@@ -1,3 +1,278 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .models import Field, NotificationLog, Project, Schedule, ScheduleDay
+from .notifications import send_digests
+from .workdays import (
+    add_workdays, add_workdays_batch, count_workdays, count_workdays_batch, is_workday,
+    workday_mask, workdays_in_range,
+)
+
+
+def loop_count_workdays(start, end):
+    """1日ずつ数える参照実装（start〜end 両端を含む）"""
+    days = (end - start).days + 1
+    return sum(1 for i in range(days) if is_workday(start + timedelta(days=i)))
+
+
+def loop_add_workdays(d, n):
+    """1日ずつ進める参照実装（d が非稼働日なら移動方向の最初の稼働日を1日目とする）"""
+    step = 1 if n >= 0 else -1
+    remaining = abs(n)
+    while remaining:
+        d += timedelta(days=step)
+        if is_workday(d):
+            remaining -= 1
+    return d
+
+
+class WorkdayEngineTests(SimpleTestCase):
+    """稼働日計算エンジンを1日ずつ判定する参照実装と比較する"""
+
+    # 年末年始・GW（祝日と日曜が続く）と、前計算の範囲外（拡張が必要な年）を含める
+    STARTS = [
+        date(2025, 12, 26), date(2025, 12, 31), date(2026, 1, 1), date(2026, 1, 4),
+        date(2026, 4, 28), date(2026, 5, 3), date(2026, 5, 6),
+        date(2019, 12, 30), date(2031, 12, 29),
+    ]
+    OFFSETS = [-30, -7, -3, -1, 0, 1, 2, 5, 20, 260]
+
+    def test_holidays_are_not_workdays(self):
+        self.assertFalse(is_workday(date(2026, 1, 1)))  # 元日
+        self.assertFalse(is_workday(date(2026, 5, 5)))  # こどもの日
+        self.assertFalse(is_workday(date(2026, 1, 4)))  # 日曜日
+        self.assertTrue(is_workday(date(2026, 1, 3)))  # 土曜日は稼働日
+
+    def test_add_workdays_matches_loop(self):
+        for start in self.STARTS:
+            for n in self.OFFSETS:
+                with self.subTest(start=start, n=n):
+                    self.assertEqual(add_workdays(start, n), loop_add_workdays(start, n))
+
+    def test_add_workdays_across_year_boundary(self):
+        self.assertEqual(add_workdays(date(2025, 12, 31), 1), date(2026, 1, 2))
+        self.assertEqual(add_workdays(date(2026, 1, 2), -1), date(2025, 12, 31))
+
+    def test_count_workdays_matches_loop(self):
+        for start in self.STARTS:
+            for length in [0, 1, 6, 13, 40, 400]:
+                end = start + timedelta(days=length)
+                with self.subTest(start=start, end=end):
+                    self.assertEqual(count_workdays(start, end), loop_count_workdays(start, end))
+
+    def test_batch_matches_single(self):
+        ends = [start + timedelta(days=45) for start in self.STARTS]
+        self.assertEqual(
+            count_workdays_batch(self.STARTS, ends),
+            [count_workdays(s, e) for s, e in zip(self.STARTS, ends)],
+        )
+        self.assertEqual(add_workdays_batch(self.STARTS, -4), [add_workdays(s, -4) for s in self.STARTS])
+        offsets = list(range(-4, len(self.STARTS) - 4))
+        self.assertEqual(
+            add_workdays_batch(self.STARTS, offsets),
+            [add_workdays(s, n) for s, n in zip(self.STARTS, offsets)],
+        )
+
+    def test_range_and_mask_match_loop(self):
+        start, end = date(2025, 12, 20), date(2026, 1, 15)
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        self.assertEqual(workdays_in_range(start, end), [d for d in days if is_workday(d)])
+        self.assertEqual(workday_mask(start, end).tolist(), [is_workday(d) for d in days])
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # collectstatic 前でもテンプレートを描画できるよう、マニフェストを使わない
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ScheduleTestCase(TestCase):
+    """マネージャー・分野・案件・スケジュールを1件ずつ作成してログインする"""
+
+    # 監査ログ・通知ログ・セッションは別DBに保存される（replica・reporting は default のミラー）
+    databases = {'default', 'auxiliary', 'sessions'}
+
+    def setUp(self):
+        User = get_user_model()
+        self.manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='pass', is_manager=True,
+        )
+        self.field = Field.objects.create(name='作図', created_by=self.manager)
+        self.project = Project.objects.create(
+            name='案件A', manufacturing_number='MN-00001', due_date=date(2026, 3, 31),
+            created_by=self.manager, assigned_to=self.manager,
+        )
+        self.schedule = Schedule.objects.create(
+            project=self.project, field=self.field, start_date=date(2026, 2, 2), end_date=date(2026, 2, 6),
+        )
+        self.client.force_login(self.manager)
+
+
+class EditConflictTests(ScheduleTestCase):
+    """編集を始めた後に他のユーザーが保存していれば、上書きせず 409 を返す"""
+
+    def schedule_data(self, version):
+        return {
+            'project': self.project.pk, 'field': self.field.pk, 'start_date': '2026-02-09',
+            'end_date': '2026-02-13', 'description': '変更後', 'version': version,
+        }
+
+    def project_data(self, version):
+        return {
+            'name': '案件A（変更後）', 'manufacturing_number': 'MN-00001', 'due_date': '2026-03-31',
+            'assigned_to': self.manager.pk, 'department': '', 'description': '', 'version': version,
+        }
+
+    def test_schedule_edit_with_current_version(self):
+        url = reverse('schedule:schedule_edit', args=[self.schedule.pk])
+        response = self.client.post(url, self.schedule_data(self.schedule.version))
+        self.assertEqual(response.status_code, 302)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.start_date, date(2026, 2, 9))
+
+    def test_schedule_edit_with_stale_version(self):
+        stale = self.schedule.version
+        # 別のユーザーが先に保存した
+        self.schedule.description = '先に保存'
+        self.schedule.save()
+        url = reverse('schedule:schedule_edit', args=[self.schedule.pk])
+        response = self.client.post(url, self.schedule_data(stale))
+        self.assertEqual(response.status_code, 409)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.description, '先に保存')
+        self.assertEqual(self.schedule.start_date, date(2026, 2, 2))
+
+    def test_project_edit_with_stale_version(self):
+        stale = self.project.version
+        self.project.description = '先に保存'
+        self.project.save()
+        url = reverse('schedule:project_edit', args=[self.project.pk])
+        response = self.client.post(url, self.project_data(stale))
+        self.assertEqual(response.status_code, 409)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.name, '案件A')
+        self.assertEqual(self.project.description, '先に保存')
+
+    def test_edit_without_version_is_rejected(self):
+        data = self.project_data('')
+        url = reverse('schedule:project_edit', args=[self.project.pk])
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('version', response.context['form'].errors)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.name, '案件A')
+
+
+class ChangesApiTests(ScheduleTestCase):
+    """変更差分API は since より後に変更されたものだけを返す"""
+
+    def fetch(self, since):
+        response = self.client.get(reverse('schedule:schedule_changes'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_initial_fetch_returns_everything(self):
+        data = self.fetch(0)
+        self.assertEqual([p['id'] for p in data['projects']['upserts']], [self.project.pk])
+        self.assertEqual([s['id'] for s in data['schedules']['upserts']], [self.schedule.pk])
+
+    def test_only_changes_after_since(self):
+        version = self.fetch(0)['version']
+        other = Schedule.objects.create(
+            project=self.project, field=self.field, start_date=date(2026, 2, 16), end_date=date(2026, 2, 20),
+        )
+        data = self.fetch(version)
+        self.assertGreater(data['version'], version)
+        self.assertEqual(data['projects']['upserts'], [])
+        self.assertEqual([s['id'] for s in data['schedules']['upserts']], [other.pk])
+        self.assertEqual(data['schedules']['deletes'], [])
+
+        # 変更が無ければ空で、version も進まない
+        unchanged = self.fetch(data['version'])
+        self.assertEqual(unchanged['version'], data['version'])
+        self.assertEqual(unchanged['schedules']['upserts'], [])
+
+    def test_deleted_rows_are_returned_as_deletes(self):
+        version = self.fetch(0)['version']
+        schedule_id = self.schedule.pk
+        self.schedule.delete()
+        data = self.fetch(version)
+        self.assertEqual(data['schedules']['upserts'], [])
+        self.assertEqual(data['schedules']['deletes'], [schedule_id])
+
+    def test_invalid_since(self):
+        response = self.client.get(reverse('schedule:schedule_changes'), {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleBulkTests(ScheduleTestCase):
+    """一括操作の後も ScheduleDay がスケジュールの稼働日と一致する"""
+
+    def post(self, action, **data):
+        data.update({'schedule_ids': [self.schedule.pk], 'action': action})
+        response = self.client.post(reverse('schedule:schedule_bulk'), data)
+        self.assertEqual(response.status_code, 302)
+        self.schedule.refresh_from_db()
+
+    def assertDaysSynced(self):
+        days = list(ScheduleDay.objects.filter(schedule=self.schedule).order_by('date').values_list('date', flat=True))
+        self.assertEqual(days, workdays_in_range(self.schedule.start_date, self.schedule.end_date))
+
+    def test_shift_by_calendar_days(self):
+        self.assertDaysSynced()
+        self.post('shift', unit='calendar', days=7)
+        self.assertEqual((self.schedule.start_date, self.schedule.end_date), (date(2026, 2, 9), date(2026, 2, 13)))
+        # 2/11（建国記念の日）は含まれない
+        self.assertDaysSynced()
+        self.assertFalse(ScheduleDay.objects.filter(schedule=self.schedule, date=date(2026, 2, 11)).exists())
+
+    def test_shift_by_workdays(self):
+        self.post('shift', unit='workday', days=-3)
+        self.assertEqual(self.schedule.start_date, add_workdays(date(2026, 2, 2), -3))
+        self.assertEqual(self.schedule.end_date, add_workdays(date(2026, 2, 6), -3))
+        self.assertDaysSynced()
+
+    def test_complete_keeps_days_and_bumps_version(self):
+        version = self.schedule.version
+        self.post('complete')
+        self.assertEqual(self.schedule.status, 'completed')
+        self.assertEqual(self.schedule.version, version + 1)
+        self.assertDaysSynced()
+
+        self.post('uncomplete')
+        self.assertNotEqual(self.schedule.status, 'completed')
+        self.assertDaysSynced()
+
+
+class DigestTests(ScheduleTestCase):
+    """通知メールは送信済みを記録し、同じ内容を二度送らない"""
+
+    TODAY = date(2026, 1, 30)  # スケジュールの開始（2/2）の3日前
+
+    def test_second_run_sends_nothing(self):
+        self.assertEqual(send_digests(self.TODAY), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.manager.email])
+        self.assertEqual(NotificationLog.objects.count(), 1)
+
+        self.assertEqual(send_digests(self.TODAY), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_is_retried(self):
+        with self.assertLogs('schedule.notifications', 'ERROR'), \
+                mock.patch.object(EmailMessage, 'send', side_effect=OSError('connection refused')):
+            self.assertEqual(send_digests(self.TODAY), (0, 0, 1))
+        self.assertFalse(NotificationLog.objects.exists())
+
+        self.assertEqual(send_digests(self.TODAY), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_dry_run_does_not_record(self):
+        self.assertEqual(send_digests(self.TODAY, dry_run=True), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(NotificationLog.objects.exists())
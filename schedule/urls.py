@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import RedirectView
 from . import views
 
 app_name = 'schedule'
 
+# ASGI で起動した場合（scheduleapp.asgi）は、問い合わせを同時に行う・結果を送り出しながら取得する非同期版を使う
+if settings.ASYNC_VIEWS:
+    calendar_view, schedule_api = views.calendar_view_async, views.schedule_api_async
+else:
+    calendar_view, schedule_api = views.calendar_view, views.schedule_api
+
 urlpatterns = [
     path('', RedirectView.as_view(url='projects/', permanent=True)),
     path('projects/', views.project_list, name='project_list'),
@@ -17,8 +24,17 @@ urlpatterns = [
     path('schedules/<int:pk>/edit/', views.schedule_edit, name='schedule_edit'),
     path('schedules/<int:pk>/delete/', views.schedule_delete, name='schedule_delete'),
     path('schedules/<int:schedule_id>/complete/', views.schedule_complete_view, name='schedule_complete'),
-    path('calendar/', views.calendar_view, name='calendar'),
-    path('api/schedules/', views.schedule_api, name='schedule_api'),
+    path('schedules/bulk/', views.schedule_bulk_view, name='schedule_bulk'),
+    path('calendar/', calendar_view, name='calendar'),
+    path('heatmap/', views.heatmap_view, name='heatmap'),
+    path('year/', views.year_view, name='year'),
+    path('export/', views.export_view, name='export'),
+    path('gantt/', views.gantt_view, name='gantt'),
+    path('history/diff/', views.plan_diff_view, name='plan_diff'),
+    path('department/', views.department_switch, name='department_switch'),
+    path('api/schedules/', schedule_api, name='schedule_api'),
+    path('api/changes/', views.schedule_changes_api, name='schedule_changes'),
+    path('api/events/', views.schedule_events, name='schedule_events'),
     # 分野管理
     path('fields/', views.field_list_view, name='field_list'),
     path('fields/create/', views.field_create_view, name='field_create'),
@@ -1,14 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import transaction
 from django.db.models import Q
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.safestring import mark_safe
 from django.views.decorators.cache import never_cache
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, time
+from asgiref.sync import sync_to_async
+import asyncio
 import calendar
+import csv
 import json
 from django.utils import timezone
 from .forms import ProjectForm, ScheduleForm, FieldForm
+from .changes import (
+    can_view_all, changes_since, current_version, record_schedule_bulk_update, save_statuses_by_date,
+    update_statuses_by_date,
+)
+from .workdays import add_workdays_batch, count_workdays_batch, workdays_in_range
+from .occupancy import schedule_ids_by_date, sync_schedule_days
+from .heatmap import GROUP_CHOICES, get_heatmap
+from .yearview import get_year
+from .gantt import field_color, render_gantt, render_gantt_as_of
+from .history import diff_states, historical_schedules, schedules_as_of
+from .audit import object_history, project_history
+from .departments import (
+    SESSION_KEY as DEPARTMENT_SESSION_KEY, acurrent_department, current_department, department_choices,
+    in_department, in_scope, scope_projects, scope_schedules,
+)
+from .events import event_stream
+from scheduleapp.backup import reporting_db, snapshot_taken_at
+from scheduleapp.db import gather_reads, run_read
+from scheduleapp.middleware import no_compression
 
 # 祝日ライブラリ（任意）
 try:
@@ -25,7 +52,7 @@ def require_manager(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
-from .models import Schedule, Project, Field
+from .models import ConcurrentUpdateError, Schedule, Project, Field
 from accounts.models import CustomUser
 
 # Create your views here.
@@ -41,22 +68,26 @@ def index(request):
         end_date__gte=today
     ).select_related('project', 'field')
 
-    # 権限に応じてフィルタリング
+    # 権限に応じてフィルタリング（全案件を閲覧できるユーザーは表示中の部署で絞り込む）
     if not (user.is_manager or user.is_superuser or user.is_viewer):
         today_schedules = today_schedules.filter(
             Q(project__created_by=user) | Q(project__assigned_to=user)
         )
+    today_schedules = scope_schedules(request, today_schedules)
 
-    # ステータス更新
+    # ステータス更新（表示のついでのため、他での更新と競合しても保存は version を確認しない）
+    changed = []
     for schedule in today_schedules:
         old_status = schedule.status
         schedule.update_status_by_date()
         if old_status != schedule.status:
-            schedule.save()
+            changed.append(schedule)
+    save_statuses_by_date(changed)
 
     # 案件一覧（最新5件）
     if user.is_manager or user.is_superuser or user.is_viewer:
-        projects = Project.objects.all().select_related('created_by', 'assigned_to').order_by('-created_at')[:5]
+        projects = scope_projects(request, Project.objects.all())\
+            .select_related('created_by', 'assigned_to').order_by('-created_at')[:5]
     else:
         projects = Project.objects.filter(
             Q(created_by=user) | Q(assigned_to=user)
@@ -71,7 +102,7 @@ def index(request):
         recent_schedules = recent_schedules.filter(
             Q(project__created_by=user) | Q(project__assigned_to=user)
         )
-    recent_schedules = recent_schedules.order_by('-start_date')[:5]
+    recent_schedules = scope_schedules(request, recent_schedules).order_by('-start_date')[:5]
 
     return render(request, 'schedule/home.html', {
         'today_schedules': today_schedules,
@@ -103,6 +134,9 @@ def project_list(request):
         ).select_related('created_by', 'assigned_to').distinct()
         assignee_filter = 'all'  # 一般ユーザーには関係ない
     
+    # 部署の絞り込み（選択中の部署・自部署のみの権限）
+    projects = scope_projects(request, projects)
+
     # 完了状態フィルタ（初期値は進行中）
     status_filter = request.GET.get('status', 'active')
     if status_filter == 'completed':
@@ -155,6 +189,8 @@ def project_create(request):
         if form.is_valid():
             project = form.save(commit=False)
             project.created_by = request.user
+            if 'department' not in form.fields:
+                project.department = request.user.department
             project.save()
             messages.success(request, f'案件「{project.name}」を作成しました。')
             return redirect('schedule:project_detail', pk=project.pk)
@@ -170,6 +206,9 @@ def project_create(request):
 def project_detail(request, pk):
     """案件詳細"""
     project = get_object_or_404(Project, pk=pk)
+    if not in_scope(request.user, project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャー、閲覧者または関係者のみ）
     if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer or
@@ -181,28 +220,45 @@ def project_detail(request, pk):
     schedules = Schedule.objects.filter(project=project).select_related('field').order_by('start_date')
     
     # 各スケジュールのステータス更新
+    changed = []
     for schedule in schedules:
         old_status = schedule.status
         schedule.update_status_by_date()
         if old_status != schedule.status:
-            schedule.save()
+            changed.append(schedule)
+    save_statuses_by_date(changed)
+    
+    # 稼働日数はまとめて計算
+    workdays = count_workdays_batch([s.start_date for s in schedules], [s.end_date for s in schedules])
+    for schedule, count in zip(schedules, workdays):
+        schedule.workdays = count
     
     # 未完了のスケジュール数をカウント
     incomplete_schedules = schedules.exclude(status='completed')
     incomplete_count = incomplete_schedules.count()
     
-    return render(request, 'schedule/project_detail.html', {
+    context = {
         'project': project,
         'schedules': schedules,
         'incomplete_count': incomplete_count,
         'has_incomplete_schedules': incomplete_count > 0,
-    })
+        'can_bulk_edit': _can_bulk_edit(request.user, project),
+    }
+    if request.GET.get('fragment') == 'schedules':
+        # 変更通知を受けた際のスケジュール表の差し替え（変更履歴は取得しない）
+        context['page_url'] = _page_url(request)
+        return render(request, 'schedule/_project_schedules_fragment.html', context)
+    context['history'] = project_history(project.pk)
+    return render(request, 'schedule/project_detail.html', context)
 
 @login_required
 @never_cache
 def project_edit(request, pk):
     """案件編集"""
     project = get_object_or_404(Project, pk=pk)
+    if not in_scope(request.user, project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは作成者のみ、閲覧者は編集不可）
     if request.user.is_viewer or not (request.user.is_manager or request.user.is_superuser or project.created_by == request.user):
@@ -212,7 +268,12 @@ def project_edit(request, pk):
     if request.method == 'POST':
         form = ProjectForm(request.POST, instance=project, user=request.user)
         if form.is_valid():
-            form.save()
+            try:
+                # 競合時にこの保存だけを取り消す（外側のトランザクション内でも競合画面の読み込みができるように）
+                with transaction.atomic():
+                    form.save()
+            except ConcurrentUpdateError:
+                return _edit_conflict(request, form, 'project', reverse('schedule:project_detail', args=[pk]))
             messages.success(request, f'案件「{project.name}」を更新しました。')
             return redirect('schedule:project_detail', pk=project.pk)
     else:
@@ -227,6 +288,9 @@ def project_edit(request, pk):
 def project_delete(request, pk):
     """案件削除"""
     project = get_object_or_404(Project, pk=pk)
+    if not in_scope(request.user, project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは作成者のみ、閲覧者は削除不可）
     if request.user.is_viewer or not (request.user.is_manager or request.user.is_superuser or project.created_by == request.user):
@@ -252,6 +316,9 @@ def project_delete(request, pk):
 def project_complete_view(request, pk):
     """案件完了/未完了切り替え"""
     project = get_object_or_404(Project, pk=pk)
+    if not in_scope(request.user, project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（作成者、担当者、マネージャー、スーパーユーザーのみ）
     if not (project.created_by == request.user or 
@@ -267,11 +334,7 @@ def project_complete_view(request, pk):
             incomplete_schedules = project.schedule_set.exclude(status='completed')
             
             # ステータスを更新してから再度チェック
-            for schedule in incomplete_schedules:
-                old_status = schedule.status
-                schedule.update_status_by_date()
-                if old_status != schedule.status:
-                    schedule.save()
+            update_statuses_by_date(incomplete_schedules)
             
             # 再度未完了のスケジュールをチェック
             incomplete_schedules = project.schedule_set.exclude(status='completed')
@@ -290,286 +353,343 @@ def project_complete_view(request, pk):
         'project': project,
     })
 
-@login_required
-@never_cache
-def calendar_view(request):
-    today = timezone.localdate()
+# 担当者の色分け（担当者IDの下1桁で選ぶ）
+ASSIGNEE_COLORS = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1', '#fd7e14', '#20c997', '#e83e8c', '#6c757d', '#17a2b8']
+# schedule_api の非同期版で一度に取得・送信する件数
+API_CHUNK_SIZE = 500
 
-    # フィルタリングパラメータ
-    assigned_to_filter = request.GET.get('assigned_to', '')  # 担当者フィルタ
-    project_filter = request.GET.get('project', '')  # 案件フィルタ
-    project_search = request.GET.get('project_search', '')  # 案件検索テキスト
+def _calendar_filters(request):
+    """担当者・案件フィルタと過去の時点の指定（?as_of=YYYY-MM-DD または YYYY-MM-DDTHH:MM）"""
+    as_of_param = request.GET.get('as_of', '')
+    as_of = _parse_as_of(as_of_param)
+    if as_of is None:
+        as_of_param = ''
+    return {
+        'assigned_to': request.GET.get('assigned_to', ''),  # 担当者フィルタ
+        'project': request.GET.get('project', ''),  # 案件フィルタ
+        'project_search': request.GET.get('project_search', ''),  # 案件検索テキスト
+        'as_of': as_of,
+        'as_of_param': as_of_param,
+    }
 
+def _calendar_period(request, today):
+    """表示範囲 (週表示か, 開始日, 終了日)。週表示は ?start= からの7日間、月表示は ?year=&month= の月"""
     # ▼ 表示モード：'month'（既定） or 'week'
-    scope = request.GET.get('scope', 'month')
-
-    if scope == 'week':
-        # 週表示：start=YYYY-MM-DD を受け取る（無ければ today）
+    if request.GET.get('scope', 'month') == 'week':
         start_str = request.GET.get('start')
         try:
             week_start = datetime.strptime(start_str, "%Y-%m-%d").date() if start_str else today
         except Exception:
             week_start = today
-        week_end = week_start + timedelta(days=6)
-
-        # この7日間に "かかる" スケジュール
-        base_qs = Schedule.objects.filter(
-            start_date__lte=week_end,
-            end_date__gte=week_start
-        ).select_related('project', 'project__created_by', 'project__assigned_to')\
-         .order_by('project__assigned_to__last_name', 'project__assigned_to__first_name', 'project__assigned_to__username', 'project__name', 'start_date')
+        return True, week_start, week_start + timedelta(days=6)
 
-        if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
-            base_qs = base_qs.filter(Q(project__created_by=request.user) | Q(project__assigned_to=request.user))
-        
-        # 担当者フィルタリング適用
-        if assigned_to_filter:
-            base_qs = base_qs.filter(project__assigned_to__id=assigned_to_filter)
-        
-        # 案件フィルタは全ユーザーが使用可能
-        if project_filter:
-            base_qs = base_qs.filter(project__id=project_filter)
-
-        # 担当者の色分け情報を追加
-        colors = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1', '#fd7e14', '#20c997', '#e83e8c', '#6c757d', '#17a2b8']
-        
-        # ステータス更新
-        for s in base_qs:
-            old = s.status
-            s.update_status_by_date()
-            if old != s.status:
-                s.save()
-            
-            # 担当者の色情報を追加
-            if s.project.assigned_to:
-                assigned_color_index = (s.project.assigned_to.id % 10)
-                s.assigned_bg_color = colors[assigned_color_index]
-                s.assigned_text_color = '#212529' if assigned_color_index == 3 else '#ffffff'  # 黄色の場合は黒文字
-
-        # 7日間を1行に（各セルへ曜日/祝日フラグを埋め込み）
-        row = []
-        for i in range(7):
-            d = week_start + timedelta(days=i)
-            flags = _flags_for_date(d)
-            # ★ 日曜 or 祝日は予定を表示しない
-            if flags["is_sun"] or flags["is_holiday"]:
-                todays = []
-            else:
-                todays = [s for s in base_qs if s.start_date <= d <= s.end_date]
-            row.append({"day": d.day, "date": d, "schedules": todays, **flags})
-        calendar_cells = [row]
-
-
-        # 月切替ボタン用：現在の"基準月"（週開始日の年月）
-        year = week_start.year
-        month = week_start.month
-        month_name = calendar.month_name[month]
-
-        # 週ナビゲーション
-        prev_start = week_start - timedelta(days=7)
-        next_start = week_start + timedelta(days=7)
-
-        # フィルタ用のデータ
-        users_for_filter = []
-        projects_for_filter = []
-        
-        # 担当者フィルタは管理者・マネージャー・閲覧者のみ
-        if (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
-            from accounts.models import CustomUser
-            # 担当者フィルタの選択肢：マネージャーと一般ユーザーのみ（スーパーユーザーと閲覧者は除外）
-            users_for_filter = CustomUser.objects.filter(
-                is_manager=True, is_superuser=False
-            ).union(
-                CustomUser.objects.filter(
-                    is_manager=False, is_superuser=False, is_viewer=False
-                )
-            ).order_by('last_name', 'first_name', 'username')
-        
-        # 案件フィルタは全ユーザーが使用可能
-        if request.user.is_manager or request.user.is_superuser or request.user.is_viewer:
-            # 管理者系は全案件
-            projects_for_filter = Project.objects.all().order_by('name')
-        else:
-            # 一般ユーザーは自分が関係する案件のみ
-            projects_for_filter = Project.objects.filter(
-                Q(created_by=request.user) | Q(assigned_to=request.user)
-            ).order_by('name')
-
-        context = {
-            "is_week": True,
-            "week_start": week_start,
-            "week_end": week_end,
-            "prev_start": prev_start,
-            "next_start": next_start,
-
-            "year": year, "month": month, "month_name": month_name,
-            "calendar_cells": calendar_cells,
-            "schedules": base_qs,
-
-            # 月ナビ（"月表示へ戻る"先のため）
-            "prev_year": year if month > 1 else year - 1,
-            "prev_month": month - 1 if month > 1 else 12,
-            "next_year": year if month < 12 else year + 1,
-            "next_month": month + 1 if month < 12 else 1,
-
-            "today": today,
-            
-            # フィルタ関連
-            "users_for_filter": users_for_filter,
-            "projects_for_filter": projects_for_filter,
-            "current_assigned_to": assigned_to_filter,
-            "current_project": project_filter,
-            "current_project_search": project_search,
-        }
-        return render(request, 'schedule/calendar.html', context)
-
-    # ===== ここから従来の月表示 =====
     year = int(request.GET.get('year', today.year))
     month = int(request.GET.get('month', today.month))
-
     first_day = date(year, month, 1)
     last_day = (date(year+1, 1, 1) - timedelta(days=1)) if month == 12 else (date(year, month+1, 1) - timedelta(days=1))
+    return False, first_day, last_day
 
-    base_qs = Schedule.objects.filter(start_date__lte=last_day, end_date__gte=first_day) \
-        .select_related('project', 'project__created_by', 'project__assigned_to')\
+def _calendar_schedules(user, department, start, end, assigned_to='', project=''):
+    """start〜end に "かかる" スケジュール（担当者・案件名・開始日の順）"""
+    schedules = Schedule.objects.filter(start_date__lte=end, end_date__gte=start)\
+        .select_related('project', 'project__created_by', 'project__assigned_to', 'field')\
         .order_by('project__assigned_to__last_name', 'project__assigned_to__first_name', 'project__assigned_to__username', 'project__name', 'start_date')
-    if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
-        base_qs = base_qs.filter(Q(project__created_by=request.user) | Q(project__assigned_to=request.user))
-    
+    if not can_view_all(user):
+        schedules = schedules.filter(Q(project__created_by=user) | Q(project__assigned_to=user))
+    schedules = in_department(schedules, department)
+
     # 担当者フィルタリング適用
-    if assigned_to_filter:
-        base_qs = base_qs.filter(project__assigned_to__id=assigned_to_filter)
-    
+    if assigned_to:
+        schedules = schedules.filter(project__assigned_to__id=assigned_to)
     # 案件フィルタは全ユーザーが使用可能
-    if project_filter:
-        base_qs = base_qs.filter(project__id=project_filter)
+    if project:
+        schedules = schedules.filter(project__id=project)
+    return schedules
 
-    # 担当者の色分け情報を追加
-    colors = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1', '#fd7e14', '#20c997', '#e83e8c', '#6c757d', '#17a2b8']
-    # 担当者の色分け情報を追加
-    colors = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1', '#fd7e14', '#20c997', '#e83e8c', '#6c757d', '#17a2b8']
-    for s in base_qs:
+def _filter_choices(user, department):
+    """担当者フィルタ・案件フィルタの選択肢 (users, projects)"""
+    if not can_view_all(user):
+        # 担当者フィルタは管理者・マネージャー・閲覧者のみ。一般ユーザーは自分が関係する案件のみ
+        projects = Project.objects.filter(
+            Q(created_by=user) | Q(assigned_to=user)
+        ).select_related('assigned_to').order_by('name')
+        return [], projects
+
+    # 担当者フィルタの選択肢：マネージャーと一般ユーザーのみ（スーパーユーザーと閲覧者は除外）
+    users = CustomUser.objects.filter(
+        is_manager=True, is_superuser=False
+    ).union(
+        CustomUser.objects.filter(
+            is_manager=False, is_superuser=False, is_viewer=False
+        )
+    ).order_by('last_name', 'first_name', 'username')
+    # 管理者系は全案件
+    projects = in_department(Project.objects.select_related('assigned_to'), department).order_by('name')
+    return users, projects
+
+def _prepare_schedules(schedules, as_of=None):
+    """日付によるステータス更新と担当者の色付け。ステータスが変わったスケジュールを返す（保存は呼び出し側で行う）"""
+    changed = []
+    for s in schedules:
         old = s.status
-        s.update_status_by_date()
+        # 過去の時点の表示ではステータスを更新しない
+        if not as_of:
+            s.update_status_by_date()
         if old != s.status:
-            s.save()
-        
-        # 担当者の色情報を追加
-        if s.project.assigned_to:
-            assigned_color_index = (s.project.assigned_to.id % 10)
-            s.assigned_bg_color = colors[assigned_color_index]
-            s.assigned_text_color = '#212529' if assigned_color_index == 3 else '#ffffff'  # 黄色の場合は黒文字
-        
+            changed.append(s)
+
         # 担当者の色情報を追加
         if s.project.assigned_to:
             assigned_color_index = (s.project.assigned_to.id % 10)
-            s.assigned_bg_color = colors[assigned_color_index]
+            s.assigned_bg_color = ASSIGNEE_COLORS[assigned_color_index]
             s.assigned_text_color = '#212529' if assigned_color_index == 3 else '#ffffff'  # 黄色の場合は黒文字
+    return changed
 
-    cal = calendar.Calendar(firstweekday=6)  # 日曜始まり
-    weeks = []
-    for week in cal.monthdatescalendar(year, month):
+def _calendar_context(is_week, start, end, by_date):
+    """カレンダーのセル（日付毎のスケジュール・曜日/祝日フラグ）と期間移動のリンク先"""
+    if is_week:
+        # 7日間を1行に（各セルへ曜日/祝日フラグを埋め込み）
         row = []
-        for d in week:
+        for i in range(7):
+            d = start + timedelta(days=i)
             flags = _flags_for_date(d)
-            if d.month != month:
-                row.append({"day": 0, "date": d, "schedules": [], **flags})
-            else:
-                # ★ 日曜 or 祝日は予定を表示しない
-                if flags["is_sun"] or flags["is_holiday"]:
-                    todays = []
+            # ★ 日曜 or 祝日は予定を表示しない
+            todays = [] if flags["is_sun"] or flags["is_holiday"] else by_date.get(d, [])
+            row.append({"day": d.day, "date": d, "schedules": todays, **flags})
+        calendar_cells = [row]
+    else:
+        cal = calendar.Calendar(firstweekday=6)  # 日曜始まり
+        calendar_cells = []
+        for week in cal.monthdatescalendar(start.year, start.month):
+            row = []
+            for d in week:
+                flags = _flags_for_date(d)
+                if d.month != start.month:
+                    row.append({"day": 0, "date": d, "schedules": [], **flags})
                 else:
-                    todays = [s for s in base_qs if s.start_date <= d <= s.end_date]
-                row.append({"day": d.day, "date": d, "schedules": todays, **flags})
-        weeks.append(row)
+                    # ★ 日曜 or 祝日は予定を表示しない
+                    todays = [] if flags["is_sun"] or flags["is_holiday"] else by_date.get(d, [])
+                    row.append({"day": d.day, "date": d, "schedules": todays, **flags})
+            calendar_cells.append(row)
 
+    # 月切替ボタン用：現在の"基準月"（週表示では週開始日の年月）
+    year, month = start.year, start.month
+    context = {
+        "is_week": is_week,
+        "year": year, "month": month, "month_name": calendar.month_name[month],
+        "calendar_cells": calendar_cells,
+        "prev_year": year if month > 1 else year - 1,
+        "prev_month": month - 1 if month > 1 else 12,
+        "next_year": year if month < 12 else year + 1,
+        "next_month": month + 1 if month < 12 else 1,
+    }
+    if is_week:
+        # 週ナビゲーション
+        context.update({
+            "week_start": start,
+            "week_end": end,
+            "prev_start": start - timedelta(days=7),
+            "next_start": start + timedelta(days=7),
+        })
+    return context
 
-    prev_month = 12 if month == 1 else month-1
-    prev_year  = year-1 if month == 1 else year
-    next_month = 1 if month == 12 else month+1
-    next_year  = year+1 if month == 12 else year
+@login_required
+@never_cache
+def calendar_view(request):
+    today = timezone.localdate()
+    # 描画に使うデータより前のバージョンを控え、以降の変更は差分APIで検知する
+    change_version = current_version()
+    # ?fragment=calendar の場合はフィルタ・期間移動で差し替わる部分だけを返す
+    fragment = request.GET.get('fragment') == 'calendar'
+    filters = _calendar_filters(request)
+    as_of = filters['as_of']
+    is_week, start, end = _calendar_period(request, today)
+    department = current_department(request)
 
-    # フィルタ用のデータ
-    users_for_filter = []
-    projects_for_filter = []
-    
-    # 担当者フィルタは管理者・マネージャー・閲覧者のみ
-    if (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
-        from accounts.models import CustomUser
-        # 担当者フィルタの選択肢：マネージャーと一般ユーザーのみ（スーパーユーザーと閲覧者は除外）
-        users_for_filter = CustomUser.objects.filter(
-            is_manager=True, is_superuser=False
-        ).union(
-            CustomUser.objects.filter(
-                is_manager=False, is_superuser=False, is_viewer=False
-            )
-        ).order_by('last_name', 'first_name', 'username')
-    
-    # 案件フィルタは全ユーザーが使用可能
-    if request.user.is_manager or request.user.is_superuser or request.user.is_viewer:
-        # 管理者系は全案件
-        projects_for_filter = Project.objects.all().order_by('name')
+    if as_of:
+        schedules = _historical_or_empty(request, as_of, start, end, filters['assigned_to'], filters['project'])
     else:
-        # 一般ユーザーは自分が関係する案件のみ
-        projects_for_filter = Project.objects.filter(
-            Q(created_by=request.user) | Q(assigned_to=request.user)
-        ).order_by('name')
+        schedules = _calendar_schedules(request.user, department, start, end, filters['assigned_to'], filters['project'])
+    save_statuses_by_date(_prepare_schedules(schedules, as_of))
+    by_date = _schedules_by_date(schedules, start, end, filters['assigned_to'], from_index=not as_of)
+    users_for_filter, projects_for_filter = _filter_choices(request.user, department)
 
-    return render(request, 'schedule/calendar.html', {
-        "is_week": False,
-        "year": year, "month": month, "month_name": calendar.month_name[month],
-        "calendar_cells": weeks,
-        "schedules": base_qs,
-        "prev_year": prev_year, "prev_month": prev_month,
-        "next_year": next_year, "next_month": next_month,
+    return _render_calendar(request, {
+        **_calendar_context(is_week, start, end, by_date),
+        "schedules": schedules,
         "today": today,
-        
+
         # フィルタ関連
         "users_for_filter": users_for_filter,
         "projects_for_filter": projects_for_filter,
-        "current_assigned_to": assigned_to_filter,
-        "current_project": project_filter,
-        "current_project_search": project_search,
-    })
+        "current_assigned_to": filters['assigned_to'],
+        "current_project": filters['project'],
+        "current_project_search": filters['project_search'],
+        "change_version": change_version,
+        "as_of": as_of,
+        "as_of_param": filters['as_of_param'],
+    }, fragment)
 
 @login_required
-def schedule_api(request):
-    """スケジュールAPI（カレンダー用）"""
-    if request.user.is_manager or request.user.is_superuser:
+@never_cache
+async def calendar_view_async(request):
+    """calendar_view の非同期版（ASGI で起動した場合に使用）
+
+    表示するスケジュール・日付毎のインデックス・フィルタの選択肢は互いに独立しているため、
+    別々の接続で同時に取得する（scheduleapp.db.gather_reads）。
+    """
+    today = timezone.localdate()
+    # バージョンはスケジュールの取得より前に読む（同時に読むと、その間の変更を取りこぼす）
+    change_version, user = await asyncio.gather(run_read(current_version), request.auser())
+    department = await acurrent_department(request)
+    fragment = request.GET.get('fragment') == 'calendar'
+    filters = _calendar_filters(request)
+    as_of = filters['as_of']
+    is_week, start, end = _calendar_period(request, today)
+    users, projects = _filter_choices(user, department)
+
+    if as_of:
+        # 履歴から組み立てる（警告のメッセージを出すため、リクエストのスレッドで実行する）
+        schedules, users_for_filter, projects_for_filter = await asyncio.gather(
+            sync_to_async(_historical_or_empty)(request, as_of, start, end, filters['assigned_to'], filters['project']),
+            run_read(list, users),
+            run_read(list, projects),
+        )
+        ids_by_date = None
+    else:
+        queryset = _calendar_schedules(user, department, start, end, filters['assigned_to'], filters['project'])
+        schedules, ids_by_date, users_for_filter, projects_for_filter = await gather_reads(
+            lambda: list(queryset),
+            lambda: schedule_ids_by_date(start, end, filters['assigned_to']),
+            lambda: list(users),
+            lambda: list(projects),
+        )
+    await sync_to_async(save_statuses_by_date)(_prepare_schedules(schedules, as_of))
+    by_date = _schedules_by_date(
+        schedules, start, end, filters['assigned_to'], from_index=not as_of, ids_by_date=ids_by_date,
+    )
+
+    context = {
+        **_calendar_context(is_week, start, end, by_date),
+        "schedules": schedules,
+        "today": today,
+        "users_for_filter": users_for_filter,
+        "projects_for_filter": projects_for_filter,
+        "current_assigned_to": filters['assigned_to'],
+        "current_project": filters['project'],
+        "current_project_search": filters['project_search'],
+        "change_version": change_version,
+        "as_of": as_of,
+        "as_of_param": filters['as_of_param'],
+    }
+    # テンプレート・コンテキストプロセッサは request.user 等を同期で読むため、リクエストのスレッドで描画する
+    return await sync_to_async(_render_calendar)(request, context, fragment)
+
+def _api_schedules(user, department):
+    """スケジュールAPIで返すスケジュール"""
+    if user.is_manager or user.is_superuser:
         # マネージャーとスーパーユーザーは全ユーザーのスケジュールを表示
-        schedules = Schedule.objects.all().select_related('project', 'project__created_by', 'project__assigned_to')
+        schedules = in_department(Schedule.objects.all(), department)
     else:
         # 一般ユーザーは自分が作成または担当するスケジュールのみ表示
-        schedules = Schedule.objects.filter(
-            Q(project__created_by=request.user) | Q(project__assigned_to=request.user)
-        ).select_related('project', 'project__created_by', 'project__assigned_to')
-    
+        schedules = Schedule.objects.filter(Q(project__created_by=user) | Q(project__assigned_to=user))
+    return schedules.select_related('project', 'project__created_by', 'project__assigned_to', 'field')
+
+def _api_event(schedule):
+    """スケジュールAPIの1件（各スケジュールのステータスは呼び出し側で更新しておく）"""
+    # ステータスに基づく色設定
+    if schedule.status == 'completed':
+        color = '#28a745'  # 緑
+    elif schedule.status == 'in_progress':
+        color = '#007bff'  # 青
+    else:  # overdue
+        color = '#dc3545'  # 赤
+
+    return {
+        'id': schedule.id,
+        'title': f'{schedule.project.name} - {schedule.field.name}',
+        'start': schedule.start_date.isoformat(),
+        'end': (schedule.end_date + timedelta(days=1)).isoformat(),  # 終了日の翌日
+        'color': color,
+        'url': f'/schedule/schedule/{schedule.id}/',
+    }
+
+@login_required
+def schedule_api(request):
+    """スケジュールAPI（カレンダー用）"""
+    # 取得前のバージョンを返し、以降の差分は schedule_changes_api で取得させる
+    version = current_version()
+    schedules = _api_schedules(request.user, current_department(request))
+
     events = []
+    changed = []
     for schedule in schedules:
         # 各スケジュールのステータスを更新
         old_status = schedule.status
         schedule.update_status_by_date()
         if old_status != schedule.status:
-            schedule.save()
-        
-        # ステータスに基づく色設定
-        if schedule.status == 'completed':
-            color = '#28a745'  # 緑
-        elif schedule.status == 'in_progress':
-            color = '#007bff'  # 青
-        else:  # overdue
-            color = '#dc3545'  # 赤
-        
-        events.append({
-            'id': schedule.id,
-            'title': f'{schedule.project.name} - {schedule.field.name}',
-            'start': schedule.start_date.isoformat(),
-            'end': (schedule.end_date + timedelta(days=1)).isoformat(),  # 終了日の翌日
-            'color': color,
-            'url': f'/schedule/schedule/{schedule.id}/',
-        })
-    
-    return JsonResponse(events, safe=False)
+            changed.append(schedule)
+        events.append(_api_event(schedule))
+    save_statuses_by_date(changed)
+
+    response = JsonResponse(events, safe=False)
+    response['X-Change-Version'] = str(version)
+    return response
+
+@login_required
+async def schedule_api_async(request):
+    """schedule_api の非同期版（ASGI で起動した場合に使用）
+
+    件数が多くても全件を組み立ててから返さず、API_CHUNK_SIZE 件ずつ取得しながら送り出す。
+    日付によるステータス更新は、送り出す前に対象の行だけ queryset の update() でまとめて保存する
+    （送り出す間は読み取りだけにする）。
+    """
+    version, user = await asyncio.gather(run_read(current_version), request.auser())
+    schedules = _api_schedules(user, await acurrent_department(request))
+    await sync_to_async(update_statuses_by_date)(schedules)
+
+    async def generate():
+        separator = '['
+        chunk = []
+        async for schedule in schedules.aiterator(chunk_size=API_CHUNK_SIZE):
+            chunk.append(separator + json.dumps(_api_event(schedule)))
+            separator = ','
+            if len(chunk) >= API_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append('[]' if separator == '[' else ']')
+        yield ''.join(chunk)
+
+    response = StreamingHttpResponse(generate(), content_type='application/json')
+    response['X-Change-Version'] = str(version)
+    return response
+
+@login_required
+def schedule_changes_api(request):
+    """変更差分API（since 以降に作成・更新・削除された案件とスケジュールのみ返す）"""
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'since には整数を指定してください。'}, status=400)
+    return JsonResponse(changes_since(request.user, since))
+
+@login_required
+@no_compression
+async def schedule_events(request):
+    """変更通知のSSEストリーム（ASGI 専用、?project= で案件を絞り込み）"""
+    if not isinstance(request, ASGIRequest):
+        # WSGI では接続中ずっとワーカーを占有するため配信しない（クライアントは定期確認に切り替える）
+        return HttpResponse(status=204)
+
+    try:
+        project_id = int(request.GET['project']) if request.GET.get('project') else None
+    except ValueError:
+        return HttpResponse(status=400)
+
+    user = await request.auser()
+    response = StreamingHttpResponse(event_stream(user, project_id), content_type='text/event-stream')
+    response['X-Accel-Buffering'] = 'no'  # リバースプロキシでのバッファリングを無効化
+    return response
 
 @login_required
 @never_cache
@@ -600,7 +720,8 @@ def schedule_create(request):
                 end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
                 
                 # 権限チェック（閲覧者はスケジュール追加不可）
-                if request.user.is_viewer or not (request.user.is_manager or request.user.is_superuser or 
+                if request.user.is_viewer or not in_scope(request.user, project) or not (
+                        request.user.is_manager or request.user.is_superuser or
                         project.created_by == request.user or project.assigned_to == request.user):
                     messages.error(request, 'この案件にスケジュールを追加する権限がありません。')
                     return redirect('schedule:project_detail', pk=project.pk)
@@ -656,6 +777,9 @@ def schedule_create(request):
 def schedule_detail(request, pk):
     """スケジュール詳細"""
     schedule = get_object_or_404(Schedule, pk=pk)
+    if not in_scope(request.user, schedule.project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは関係者のみ）
     if not (request.user.is_manager or request.user.is_superuser or 
@@ -667,7 +791,7 @@ def schedule_detail(request, pk):
     old_status = schedule.status
     schedule.update_status_by_date()
     if old_status != schedule.status:
-        schedule.save()
+        save_statuses_by_date([schedule])
     
     return render(request, 'schedule/schedule_detail.html', {
         'schedule': schedule,
@@ -678,6 +802,9 @@ def schedule_detail(request, pk):
 def schedule_edit(request, pk):
     """スケジュール編集"""
     schedule = get_object_or_404(Schedule, pk=pk)
+    if not in_scope(request.user, schedule.project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは関係者のみ、閲覧者は編集不可）
     if request.user.is_viewer or not (request.user.is_manager or request.user.is_superuser or 
@@ -688,7 +815,13 @@ def schedule_edit(request, pk):
     if request.method == 'POST':
         form = ScheduleForm(request.POST, instance=schedule, user=request.user)
         if form.is_valid():
-            updated_schedule = form.save()
+            try:
+                with transaction.atomic():
+                    updated_schedule = form.save()
+            except ConcurrentUpdateError:
+                return _edit_conflict(
+                    request, form, 'schedule', reverse('schedule:project_detail', args=[schedule.project_id])
+                )
             # ステータス更新
             updated_schedule.update_status_by_date()
             updated_schedule.save()
@@ -707,6 +840,9 @@ def schedule_edit(request, pk):
 def schedule_delete(request, pk):
     """スケジュール削除"""
     schedule = get_object_or_404(Schedule, pk=pk)
+    if not in_scope(request.user, schedule.project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは関係者のみ、閲覧者は削除不可）
     if request.user.is_viewer or not (request.user.is_manager or request.user.is_superuser or 
@@ -725,6 +861,133 @@ def schedule_delete(request, pk):
         'schedule': schedule,
     })
 
+@login_required
+def department_switch(request):
+    """表示する部署の切替（セッションに保存、'' は全部署）"""
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        next_url = reverse('schedule:project_list')
+    if request.method != 'POST':
+        return redirect(next_url)
+    if request.user.department_only or not (
+            request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
+        messages.error(request, '表示する部署を切り替える権限がありません。')
+        return redirect(next_url)
+
+    department = request.POST.get('department', '')
+    if department and department not in department_choices():
+        messages.error(request, '指定した部署は存在しません。')
+        return redirect(next_url)
+    request.session[DEPARTMENT_SESSION_KEY] = department
+    return redirect(next_url)
+
+def _edit_conflict(request, form, kind, back_url):
+    """保存時に他のユーザーの更新と競合した場合の確認画面
+
+    自分の入力と現在保存されている内容を並べて表示する。「上書きする」は現在のバージョンで
+    同じ入力を送り直すため、その間にさらに更新されていれば再びこの画面になる。
+    """
+    model = form._meta.model
+    current = model.objects.filter(pk=form.instance.pk).first()
+    if current is None:
+        messages.error(request, '編集中のデータは他のユーザーによって削除されました。')
+        return redirect(back_url)
+    rows = []
+    for name in form._meta.fields:
+        if name not in form.fields:
+            continue
+        mine = form.cleaned_data.get(name)
+        theirs = getattr(current, name)
+        rows.append({
+            'label': form[name].label,
+            'mine': mine,
+            'theirs': theirs,
+            'differs': mine != theirs,
+        })
+    data = request.POST.copy()
+    data.pop('csrfmiddlewaretoken', None)
+    data['version'] = current.version
+    history = object_history(kind, current.pk, limit=1)
+    return render(request, 'schedule/edit_conflict.html', {
+        'object': current,
+        'verbose_name': model._meta.verbose_name,
+        'rows': rows,
+        'resubmit': [(name, value) for name, values in data.lists() for value in values],
+        'last_change': history[0] if history else None,
+        'back_url': back_url,
+    }, status=409)
+
+def _can_bulk_edit(user, project):
+    """案件のスケジュールを一括操作・完了切替できるか"""
+    return not user.is_viewer and (
+        user.is_manager or user.is_superuser or
+        project.created_by == user or project.assigned_to == user)
+
+
+def _page_url(request):
+    """部分描画の指定（?fragment=）を除いた、ページ本来のURL"""
+    params = request.GET.copy()
+    params.pop('fragment', None)
+    query = params.urlencode()
+    return f'{request.path}?{query}' if query else request.path
+
+
+def _render_calendar(request, context, fragment):
+    """カレンダーを描画。部分描画では差し替え用の要素だけを返し、差分確認の起点となるバージョンをヘッダで渡す"""
+    if not fragment:
+        return render(request, 'schedule/calendar.html', context)
+    context['page_url'] = _page_url(request)
+    response = render(request, 'schedule/_calendar_fragments.html', context)
+    response['X-Change-Version'] = context['change_version']
+    return response
+
+
+def _schedules_by_date(schedules, start, end, assignee_id=None, from_index=True, ids_by_date=None):
+    """start〜end の日付毎に、その日が稼働日にあたるスケジュールを schedules の並び順で返す
+
+    日付毎の対象は ScheduleDay のインデックスから引き、schedules（絞り込み済み）に
+    含まれるものだけを残す。from_index=False（過去の時点の表示など）なら各期間から求める。
+    ids_by_date に schedule_ids_by_date の結果を渡せば、インデックスを引かずにそれを使う。
+    """
+    if not from_index:
+        result = {}
+        for s in schedules:
+            for d in workdays_in_range(max(s.start_date, start), min(s.end_date, end)):
+                result.setdefault(d, []).append(s)
+        return result
+    position = {s.id: (i, s) for i, s in enumerate(schedules)}
+    result = {}
+    if ids_by_date is None:
+        ids_by_date = schedule_ids_by_date(start, end, assignee_id)
+    for d, schedule_ids in ids_by_date.items():
+        found = sorted(position[i] for i in schedule_ids if i in position)
+        result[d] = [s for _, s in found]
+    return result
+
+def _parse_as_of(value):
+    """?as_of= の値を日時に（日付のみの場合はその日の終わり）。不正な値なら None"""
+    if not value:
+        return None
+    try:
+        as_of = datetime.strptime(value, '%Y-%m-%dT%H:%M')
+    except ValueError:
+        try:
+            as_of = datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), time.max)
+        except ValueError:
+            return None
+    return timezone.make_aware(as_of)
+
+def _historical_or_empty(request, as_of, start, end, assigned_to=None, project=None, field=None):
+    """過去の時点のスケジュール（チェックポイントが無い時点なら空にしてメッセージを出す）"""
+    schedules = historical_schedules(
+        request.user, as_of, start, end, assigned_to, project, field, current_department(request),
+    )
+    if schedules is None:
+        messages.warning(request, f'{as_of:%Y/%m/%d %H:%M} 時点の履歴はありません。')
+        return []
+    return schedules
+
 def _flags_for_date(d):
     """
     指定した日付について、曜日や祝日の情報をdict形式で返す
@@ -817,6 +1080,9 @@ def field_delete_view(request, field_id):
 def schedule_complete_view(request, schedule_id):
     """スケジュール完了/未完了切替"""
     schedule = get_object_or_404(Schedule, id=schedule_id)
+    if not in_scope(request.user, schedule.project):
+        messages.error(request, '他部署の案件にはアクセスできません。')
+        return redirect('schedule:project_list')
     
     # 権限チェック（マネージャーまたは関係者のみ）
     if not (request.user.is_manager or request.user.is_superuser or 
@@ -835,5 +1101,388 @@ def schedule_complete_view(request, schedule_id):
         action = '完了に設定'
     
     schedule.save()
+    if request.GET.get('fragment') == 'row':
+        # 画面側で行と完了ボタン・未完了件数だけを差し替える
+        project = schedule.project
+        schedule.workdays = count_workdays_batch([schedule.start_date], [schedule.end_date])[0]
+        incomplete_count = Schedule.objects.filter(project=project).exclude(status='completed').count()
+        return render(request, 'schedule/_schedule_row_fragment.html', {
+            'project': project,
+            'schedule': schedule,
+            'incomplete_count': incomplete_count,
+            'has_incomplete_schedules': incomplete_count > 0,
+            'can_bulk_edit': _can_bulk_edit(request.user, project),
+        })
     messages.success(request, f'スケジュール「{schedule.field.name}」を{action}ました。')
-    return redirect('schedule:project_detail', pk=schedule.project.pk)
\ No newline at end of file
+    return redirect('schedule:project_detail', pk=schedule.project.pk)
+
+@login_required
+@never_cache
+def schedule_bulk_view(request):
+    """スケジュール一括操作（完了・未完了・日付シフト）"""
+    if request.method != 'POST':
+        return redirect('schedule:calendar')
+
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        next_url = reverse('schedule:calendar')
+
+    # 権限チェック（閲覧者は操作不可）
+    if request.user.is_viewer:
+        messages.error(request, '閲覧者権限ではスケジュールを変更できません。')
+        return redirect(next_url)
+
+    try:
+        schedule_ids = [int(i) for i in request.POST.getlist('schedule_ids')]
+    except ValueError:
+        schedule_ids = []
+    if not schedule_ids:
+        messages.error(request, 'スケジュールを選択してください。')
+        return redirect(next_url)
+
+    action = request.POST.get('action')
+    if action not in ('complete', 'uncomplete', 'shift'):
+        messages.error(request, '操作を選択してください。')
+        return redirect(next_url)
+
+    if action == 'shift':
+        unit = request.POST.get('unit', 'calendar')
+        try:
+            days = int(request.POST.get('days', ''))
+        except ValueError:
+            days = 0
+        if unit not in ('calendar', 'workday') or days == 0 or abs(days) > 365:
+            messages.error(request, 'ずらす日数は -365〜365 の0以外の整数で指定してください。')
+            return redirect(next_url)
+
+    with transaction.atomic():
+        # 権限チェックは1クエリでまとめて行う（マネージャー以外は自分が作成・担当の案件のみ）
+        schedules = Schedule.objects.filter(id__in=schedule_ids)\
+            .select_related('project', 'field')
+        if not (request.user.is_manager or request.user.is_superuser):
+            schedules = schedules.filter(
+                Q(project__created_by=request.user) | Q(project__assigned_to=request.user)
+            )
+        elif request.user.department_only:
+            schedules = schedules.filter(
+                Q(department=request.user.department) |
+                Q(project__created_by=request.user) | Q(project__assigned_to=request.user)
+            )
+        schedules = list(schedules)
+        skipped = len(set(schedule_ids)) - len(schedules)
+
+        if action == 'shift' and unit == 'workday':
+            # 稼働日単位のシフトは全件まとめて計算
+            starts = add_workdays_batch([s.start_date for s in schedules], days)
+            ends = add_workdays_batch([s.end_date for s in schedules], days)
+            shifted = {s.pk: dates for s, dates in zip(schedules, zip(starts, ends))}
+
+        changed = []
+        for schedule in schedules:
+            if action == 'complete':
+                if schedule.status == 'completed':
+                    continue
+                schedule.toggle_completion()
+            elif action == 'uncomplete':
+                if schedule.status != 'completed':
+                    continue
+                schedule.toggle_completion()
+            else:
+                if unit == 'workday':
+                    schedule.start_date, schedule.end_date = shifted[schedule.pk]
+                else:
+                    schedule.start_date += timedelta(days=days)
+                    schedule.end_date += timedelta(days=days)
+                schedule.update_status_by_date()
+            schedule.updated_at = timezone.now()
+            # 編集画面を開いている他のユーザーの保存を競合として検出させる
+            schedule.version += 1
+            changed.append(schedule)
+
+        Schedule.objects.bulk_update(
+            changed, ['status', 'completed_at', 'start_date', 'end_date', 'updated_at', 'version']
+        )
+        record_schedule_bulk_update(changed)
+        if action == 'shift':
+            sync_schedule_days(changed)
+
+    labels = {'complete': '完了に設定', 'uncomplete': '未完了に戻し', 'shift': '日付をずらし'}
+    messages.success(request, f'{len(changed)}件のスケジュールを{labels[action]}ました。')
+    if skipped:
+        messages.warning(request, f'権限のない、または存在しないスケジュール{skipped}件はスキップしました。')
+    return redirect(next_url)
+
+HEATMAP_MAX_DAYS = 366
+
+def _heatmap_level(count, workday):
+    """ヒートマップのセルの濃さ（CSS クラス名）"""
+    if not workday:
+        return 'hm-off'
+    return f'hm-{min(count, 4)}'
+
+@login_required
+@never_cache
+def heatmap_view(request):
+    """担当者・分野毎の負荷ヒートマップ（?format=json でグリッドを返す）"""
+    if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
+        messages.error(request, 'この機能を使用する権限がありません。')
+        return redirect('schedule:project_list')
+
+    group_by = request.GET.get('group', 'assignee')
+    if group_by not in GROUP_CHOICES:
+        group_by = 'assignee'
+    today = timezone.localdate()
+    try:
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        # 既定は今四半期の初日から
+        start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+    try:
+        days = min(max(int(request.GET.get('days', 91)), 1), HEATMAP_MAX_DAYS)
+    except ValueError:
+        days = 91
+    end = start + timedelta(days=days - 1)
+
+    grid = get_heatmap(group_by, start, end, current_department(request))
+    if request.GET.get('format') == 'json':
+        return JsonResponse(grid)
+
+    # 数万セルになるためテンプレートのループは使わず、行毎にセルの HTML を組み立てる
+    workdays = grid['workdays']
+    rows = [
+        {
+            'label': row['label'],
+            'peak': row['peak'],
+            'cells': mark_safe(''.join(
+                f'<td class="{_heatmap_level(count, workday)}">{count if workday and count else ""}</td>'
+                for count, workday in zip(row['counts'], workdays)
+            )),
+        }
+        for row in grid['rows']
+    ]
+    dates = [date.fromisoformat(d) for d in grid['dates']]
+    return render(request, 'schedule/heatmap.html', {
+        'rows': rows,
+        'dates': zip(dates, workdays),
+        'group': group_by,
+        'start': start,
+        'days': days,
+        'prev_start': start - timedelta(days=days),
+        'next_start': end + timedelta(days=1),
+    })
+
+def _year_level(occupancy):
+    """年間表示の月セルの濃さ（CSS クラス名）"""
+    return f'yv-{min(int(occupancy * 4 + 0.999), 4)}'
+
+@login_required
+@never_cache
+def year_view(request):
+    """担当者・分野毎の年間の稼働状況（?format=json でデータを返す）"""
+    if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
+        messages.error(request, 'この機能を使用する権限がありません。')
+        return redirect('schedule:project_list')
+
+    group_by = request.GET.get('group', 'assignee')
+    if group_by not in GROUP_CHOICES:
+        group_by = 'assignee'
+    today = timezone.localdate()
+    try:
+        year = int(request.GET.get('year', today.year))
+    except ValueError:
+        year = today.year
+    if not date.min.year < year < date.max.year:
+        year = today.year
+
+    data = get_year(year, current_department(request))
+    if request.GET.get('format') == 'json':
+        return JsonResponse(data)
+
+    rows = [
+        {
+            'label': row['label'],
+            'busy': row['busy'],
+            'overlap': row['overlap'],
+            'free': row['free'],
+            'occupancy': row['occupancy'],
+            'months': [dict(month, level=_year_level(month['occupancy'])) for month in row['months']],
+        }
+        for row in data['groups'][group_by]
+    ]
+    return render(request, 'schedule/year.html', {
+        'rows': rows,
+        'group': group_by,
+        'year': year,
+        'workdays': data['workdays'],
+        'months': list(zip(range(1, 13), data['month_workdays'])),
+    })
+
+class _Echo:
+    """csv.writer の書き込み先（書いた行をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+EXPORT_COLUMNS = {
+    'schedules': (
+        ['ID', '案件名', '製造番号', '分野', '開始日', '終了日', 'ステータス', '担当者', '部署', '詳細'],
+        ['pk', 'project__name', 'project__manufacturing_number', 'field__name', 'start_date', 'end_date',
+         'status', 'project__assigned_to__username', 'department', 'description'],
+    ),
+    'projects': (
+        ['ID', '案件名', '製造番号', '納期', '完了', '完了日時', '担当者', '部署', '詳細'],
+        ['pk', 'name', 'manufacturing_number', 'due_date', 'is_completed', 'completed_at',
+         'assigned_to__username', 'department', 'description'],
+    ),
+}
+
+@login_required
+@never_cache
+def export_view(request):
+    """案件・スケジュールの CSV 出力（?kind=schedules|projects）
+
+    稼働中の DB ではなくレポート用のスナップショット（manage.py snapshot）から読み、
+    件数が多くても編集の書き込みを待たせないよう行毎に送り出す。
+    """
+    if not (request.user.is_manager or request.user.is_superuser or request.user.is_viewer):
+        messages.error(request, 'この機能を使用する権限がありません。')
+        return redirect('schedule:project_list')
+
+    kind = request.GET.get('kind', 'schedules')
+    if kind not in EXPORT_COLUMNS:
+        kind = 'schedules'
+    header, fields = EXPORT_COLUMNS[kind]
+    using = reporting_db()
+    if kind == 'schedules':
+        rows = scope_schedules(request, Schedule.objects.using(using)).order_by('start_date', 'pk')
+        statuses = dict(Schedule.STATUS_CHOICES)
+    else:
+        rows = scope_projects(request, Project.objects.using(using)).order_by('pk')
+        statuses = None
+    rows = rows.values_list(*fields)
+
+    def generate():
+        writer = csv.writer(_Echo())
+        yield '\ufeff' + writer.writerow(header)  # Excel で文字化けしないよう BOM を付ける
+        for row in rows.iterator(chunk_size=2000):
+            row = list(row)
+            if statuses is not None:
+                row[6] = statuses.get(row[6], row[6])
+            else:
+                row[4] = '完了' if row[4] else ''
+                row[5] = timezone.localtime(row[5]).strftime('%Y-%m-%d %H:%M') if row[5] else ''
+            yield writer.writerow(row)
+
+    taken_at = snapshot_taken_at() if using != 'default' else None
+    stamp = (taken_at or timezone.localtime()).strftime('%Y%m%d%H%M')
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{stamp}.csv"'
+    return response
+
+GANTT_MAX_DAYS = 366
+
+@login_required
+@never_cache
+def gantt_view(request):
+    """案件横断のガントチャート（?format=svg で SVG のみ返す）"""
+    today = timezone.localdate()
+    try:
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        start = today - timedelta(days=today.weekday())
+    try:
+        days = min(max(int(request.GET.get('days', 60)), 7), GANTT_MAX_DAYS)
+    except ValueError:
+        days = 60
+    end = start + timedelta(days=days - 1)
+    assigned_to = request.GET.get('assigned_to', '')
+    field = request.GET.get('field', '')
+    if not assigned_to.isdigit():
+        assigned_to = ''
+    if not field.isdigit():
+        field = ''
+
+    as_of_param = request.GET.get('as_of', '')
+    as_of = _parse_as_of(as_of_param)
+    if as_of:
+        schedules = _historical_or_empty(request, as_of, start, end, assigned_to, field=field)
+        svg = render_gantt_as_of(schedules, start, end)
+    else:
+        as_of_param = ''
+        svg = render_gantt(request.user, start, end, assigned_to, field, current_department(request))
+    if request.GET.get('format') == 'svg':
+        return HttpResponse(svg, content_type='image/svg+xml; charset=utf-8')
+
+    users_for_filter = []
+    if request.user.is_manager or request.user.is_superuser or request.user.is_viewer:
+        users_for_filter = CustomUser.objects.filter(is_superuser=False, is_viewer=False)\
+            .order_by('last_name', 'first_name', 'username')
+    fields = Field.objects.order_by('name')
+    return render(request, 'schedule/gantt.html', {
+        'svg': mark_safe(svg),
+        'start': start,
+        'days': days,
+        'prev_start': start - timedelta(days=days),
+        'next_start': end + timedelta(days=1),
+        'users_for_filter': users_for_filter,
+        'fields': [(f, field_color(f.id)) for f in fields],
+        'current_assigned_to': assigned_to,
+        'current_field': field,
+        'as_of': as_of,
+        'as_of_param': as_of_param,
+    })
+
+@login_required
+@never_cache
+def plan_diff_view(request):
+    """2時点の計画の差分（?from= と ?to= に日付または日時を指定）"""
+    now = timezone.localtime()
+    to_param = request.GET.get('to', '')
+    from_param = request.GET.get('from', '')
+    to_time = _parse_as_of(to_param) or now
+    from_time = _parse_as_of(from_param) or to_time - timedelta(days=7)
+
+    context = {
+        'from_time': from_time,
+        'to_time': to_time,
+        'rows': [],
+        'available': True,
+    }
+    before, _ = schedules_as_of(from_time)
+    after, _ = schedules_as_of(to_time)
+    if before is None or after is None:
+        context['available'] = False
+        return render(request, 'schedule/plan_diff.html', context)
+
+    added, removed, changed = diff_states(before, after)
+    project_ids = {before[i][0] for i in removed + changed} | {after[i][0] for i in added + changed}
+    projects = Project.objects.select_related('assigned_to').in_bulk(project_ids)
+    fields = Field.objects.in_bulk()
+    status_labels = dict(Schedule.STATUS_CHOICES)
+    can_view_all = request.user.is_manager or request.user.is_superuser or request.user.is_viewer
+    department = current_department(request)
+
+    rows = []
+    for kind, ids in (('added', added), ('removed', removed), ('changed', changed)):
+        for schedule_id in ids:
+            old = before.get(schedule_id)
+            new = after.get(schedule_id)
+            project = projects.get((new or old)[0])
+            if project is None:
+                continue
+            if not can_view_all and request.user.pk not in (project.created_by_id, project.assigned_to_id):
+                continue
+            if department and project.department != department:
+                continue
+            rows.append({
+                'kind': kind,
+                'schedule_id': schedule_id,
+                'project': project,
+                'field': fields.get((new or old)[1]),
+                'old': old and {'start': old[2], 'end': old[3], 'status': status_labels.get(old[4], old[4])},
+                'new': new and {'start': new[2], 'end': new[3], 'status': status_labels.get(new[4], new[4])},
+            })
+    rows.sort(key=lambda row: (row['project'].name, (row['new'] or row['old'])['start']))
+    context['rows'] = rows
+    return render(request, 'schedule/plan_diff.html', context)
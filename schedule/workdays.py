@@ -0,0 +1,170 @@
+"""稼働日の計算
+
+カレンダーと同じく、日曜日と祝日（jpholiday が使える場合）を非稼働日とする。
+
+年単位で稼働日フラグを前計算し、序数（date.toordinal()）で引ける累積配列を持つ。
+- cumulative[i]: 範囲先頭から i 日分（先頭日を含み i 日目を含まない）の稼働日数
+- 稼働日の序数: 範囲内の稼働日の序数（昇順）
+これにより稼働日数・n稼働日後の計算はどちらも配列参照1回で済み、
+NumPy のインデックス演算でまとめて（数千件単位で）計算できる。
+"""
+import threading
+from datetime import date
+
+import numpy as np
+
+# 祝日ライブラリ（任意）
+try:
+    import jpholiday
+except Exception:
+    jpholiday = None
+
+# 初回に前計算する範囲（今年の前後の年数）。範囲外の日付が来たら年単位で拡張する
+INITIAL_YEARS_BEFORE = 1
+INITIAL_YEARS_AFTER = 2
+
+
+def is_workday(d):
+    """稼働日（日曜・祝日以外）かどうか（1日ずつ判定する参照実装）"""
+    if d.weekday() == 6:
+        return False
+    if jpholiday:
+        try:
+            return not jpholiday.is_holiday(d)
+        except Exception:
+            return True
+    return True
+
+
+def _year_flags(year):
+    """指定年の各日が稼働日かどうかの真偽値配列"""
+    first = date(year, 1, 1)
+    days = (date(year + 1, 1, 1) - first).days
+    weekdays = (first.weekday() + np.arange(days)) % 7
+    flags = weekdays != 6
+    if jpholiday:
+        try:
+            for holiday, _name in jpholiday.year_holidays(year):
+                flags[(holiday - first).days] = False
+        except Exception:
+            pass
+    return flags
+
+
+class WorkdayCalendar:
+    """序数配列による稼働日計算エンジン"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._year_cache = {}
+        self.first_year = None
+        self.last_year = None
+        # (範囲先頭の序数, 累積稼働日数, 稼働日の序数) を1つの属性で差し替える
+        self.state = (0, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def _build(self, first_year, last_year):
+        flags = []
+        for year in range(first_year, last_year + 1):
+            if year not in self._year_cache:
+                self._year_cache[year] = _year_flags(year)
+            flags.append(self._year_cache[year])
+        flags = np.concatenate(flags)
+        base = date(first_year, 1, 1).toordinal()
+        cumulative = np.zeros(len(flags) + 1, dtype=np.int64)
+        np.cumsum(flags, out=cumulative[1:])
+        # 参照を丸ごと差し替えるだけにして、読み取り側はロック不要にする
+        self.state = (base, cumulative, base + np.flatnonzero(flags))
+        self.first_year, self.last_year = first_year, last_year
+
+    def ensure(self, min_ordinal, max_ordinal, margin_years=0):
+        """指定した序数の範囲（前後 margin_years 年を含む）を前計算済みにする"""
+        first_year = date.fromordinal(int(min_ordinal)).year - margin_years
+        last_year = date.fromordinal(int(max_ordinal)).year + margin_years
+        if self.first_year is not None and self.first_year <= first_year and last_year <= self.last_year:
+            return
+        with self._lock:
+            if self.first_year is None:
+                today = date.today().year
+                first_year = min(first_year, today - INITIAL_YEARS_BEFORE)
+                last_year = max(last_year, today + INITIAL_YEARS_AFTER)
+            else:
+                first_year = min(first_year, self.first_year)
+                last_year = max(last_year, self.last_year)
+            if self.first_year != first_year or self.last_year != last_year:
+                self._build(first_year, last_year)
+
+    def count_ordinals(self, starts, ends):
+        """稼働日数（開始・終了日を含む）。終了日が開始日より前なら0"""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        if starts.size == 0:
+            return np.zeros(starts.shape, dtype=np.int64)
+        self.ensure(min(starts.min(), ends.min()), max(starts.max(), ends.max()))
+        base, cumulative, _ = self.state
+        counts = cumulative[ends - base + 1] - cumulative[starts - base]
+        return np.maximum(counts, 0)
+
+    def add_ordinals(self, ordinals, n):
+        """各日付から n 稼働日後（負数なら前）の序数
+
+        起点日自身は数えず、移動方向に最初に現れる稼働日を1日目とする。
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        n = np.broadcast_to(np.asarray(n, dtype=np.int64), ordinals.shape)
+        if ordinals.size == 0:
+            return ordinals.copy()
+        # 移動先が範囲に収まるよう、稼働日が1年に少なくとも250日あるとして余裕を取る
+        margin = int(np.abs(n).max()) // 250 + 1
+        self.ensure(ordinals.min(), ordinals.max(), margin_years=margin)
+        base, cumulative, workdays = self.state
+        # 起点日以前（起点日を含む）の稼働日数 / 起点日より前の稼働日数
+        through = cumulative[ordinals - base + 1]
+        before = cumulative[ordinals - base]
+        index = np.where(n > 0, through + n - 1, before + n)
+        result = workdays[np.clip(index, 0, len(workdays) - 1)]
+        return np.where(n == 0, ordinals, result)
+
+
+calendar = WorkdayCalendar()
+
+
+def count_workdays(start, end):
+    """start〜end（両端を含む）の稼働日数"""
+    return int(calendar.count_ordinals([start.toordinal()], [end.toordinal()])[0])
+
+
+def add_workdays(d, n):
+    """d から n 稼働日後（負数なら前）の日付を返す
+
+    d が非稼働日の場合は、移動方向に最初に現れる稼働日を1日目として数える。
+    """
+    return date.fromordinal(int(calendar.add_ordinals([d.toordinal()], n)[0]))
+
+
+def count_workdays_batch(starts, ends):
+    """開始日・終了日のリストから稼働日数のリストを返す"""
+    starts = np.fromiter((d.toordinal() for d in starts), dtype=np.int64)
+    ends = np.fromiter((d.toordinal() for d in ends), dtype=np.int64)
+    return calendar.count_ordinals(starts, ends).tolist()
+
+
+def add_workdays_batch(dates, n):
+    """日付のリストそれぞれから n 稼働日後の日付のリストを返す（n は整数または同じ長さのリスト）"""
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64)
+    return [date.fromordinal(o) for o in calendar.add_ordinals(ordinals, n).tolist()]
+
+
+def workdays_in_range(start, end):
+    """start〜end（両端を含む）の稼働日のリスト"""
+    calendar.ensure(start.toordinal(), end.toordinal())
+    _, _, workdays = calendar.state
+    lo, hi = np.searchsorted(workdays, [start.toordinal(), end.toordinal() + 1])
+    return [date.fromordinal(o) for o in workdays[lo:hi].tolist()]
+
+
+def workday_mask(start, end):
+    """start〜end（両端を含む）の各日が稼働日かどうかの真偽値配列"""
+    calendar.ensure(start.toordinal(), end.toordinal())
+    base, cumulative, _ = calendar.state
+    lo, hi = start.toordinal() - base, end.toordinal() - base + 1
+    return np.diff(cumulative[lo:hi + 1]) > 0
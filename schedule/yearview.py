@@ -0,0 +1,121 @@
+"""年間表示（担当者・分野毎の日付ビット列）
+
+1年分の期間に重なるスケジュールを一度だけ走査し、行（担当者・分野）毎に
+「予定のある日」を1日1ビットの整数（元日が最下位ビット、うるう年は366ビット）に立てる。
+既に立っているビットに重なった日は重複のビット列にも立てる。
+稼働率・重複日・空き日は稼働日のビット列とのビット演算と int.bit_count() で求める。
+結果は年・部署・データのバージョン毎にキャッシュする。
+"""
+from datetime import date
+
+import numpy as np
+
+from .caching import Namespace
+from .changes import current_version
+from .heatmap import GROUP_CHOICES, row_labels
+from .models import Schedule
+from .workdays import workday_mask
+
+CACHE_TIMEOUT = 60 * 10
+year_cache = Namespace('yearview', timeout=CACHE_TIMEOUT)
+
+
+def span_bits(first, last):
+    """first〜last 日目（0始まり・両端を含む）のビットを立てた整数"""
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def mask_bits(mask):
+    """真偽値配列を、先頭要素を最下位ビットとする整数にする"""
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+
+def month_spans(year):
+    """各月の (1日の日目, 月末の日目)"""
+    origin = date(year, 1, 1).toordinal()
+    spans = []
+    for month in range(1, 13):
+        first = date(year, month, 1).toordinal() - origin
+        last = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)).toordinal() - origin - 1
+        spans.append((first, last))
+    return spans
+
+
+def load_bitsets(year, department=''):
+    """担当者・分野毎の (予定のある日, 重複日) のビット列。非稼働日のビットは落とす"""
+    first_day, last_day = date(year, 1, 1), date(year, 12, 31)
+    days = (last_day - first_day).days + 1
+    workdays = mask_bits(workday_mask(first_day, last_day))
+    schedules = Schedule.objects.filter(start_date__lte=last_day, end_date__gte=first_day)
+    if department:
+        schedules = schedules.filter(department=department)
+    rows = schedules.values_list(GROUP_CHOICES['assignee'], GROUP_CHOICES['field'], 'start_date', 'end_date')
+
+    origin = first_day.toordinal()
+    result = {group_by: {} for group_by in GROUP_CHOICES}
+    for assignee_id, field_id, start, end in rows.iterator(chunk_size=2000):
+        bits = span_bits(max(start.toordinal() - origin, 0), min(end.toordinal() - origin, days - 1))
+        for group_by, key in (('assignee', assignee_id), ('field', field_id)):
+            busy, overlap = result[group_by].get(key, (0, 0))
+            result[group_by][key] = (busy | bits, overlap | (busy & bits))
+    for group_by, bitsets in result.items():
+        result[group_by] = {key: (busy & workdays, overlap & workdays) for key, (busy, overlap) in bitsets.items()}
+    return workdays, result
+
+
+def _summary(busy, overlap, workdays, spans):
+    """ビット列から年・月毎の予定日数・重複日数・空き日数と稼働率を求める"""
+    free = workdays & ~busy
+    total = workdays.bit_count()
+    months = []
+    for first, last in spans:
+        span = span_bits(first, last)
+        month_workdays = (workdays & span).bit_count()
+        month_busy = (busy & span).bit_count()
+        months.append({
+            'busy': month_busy,
+            'overlap': (overlap & span).bit_count(),
+            'free': (free & span).bit_count(),
+            'occupancy': month_busy / month_workdays if month_workdays else 0,
+        })
+    return {
+        'busy': busy.bit_count(),
+        'overlap': overlap.bit_count(),
+        'free': free.bit_count(),
+        'occupancy': busy.bit_count() / total if total else 0,
+        'months': months,
+    }
+
+
+def build_year(year, department=''):
+    """年間表示のデータ（ビット列は16進文字列にして JSON 化できる dict）"""
+    workdays, bitsets = load_bitsets(year, department)
+    spans = month_spans(year)
+    groups = {}
+    for group_by, rows in bitsets.items():
+        labels = row_labels(group_by, list(rows))
+        groups[group_by] = sorted((
+            dict(
+                _summary(busy, overlap, workdays, spans),
+                id=row_id, label=labels.get(row_id, str(row_id)),
+                busy_bits=f'{busy:x}', overlap_bits=f'{overlap:x}',
+            )
+            for row_id, (busy, overlap) in rows.items()
+        ), key=lambda row: row['label'])
+    return {
+        'year': year,
+        'department': department,
+        'days': (date(year + 1, 1, 1) - date(year, 1, 1)).days,
+        'workdays': workdays.bit_count(),
+        'month_workdays': [(workdays & span_bits(first, last)).bit_count() for first, last in spans],
+        'workday_bits': f'{workdays:x}',
+        'groups': groups,
+    }
+
+
+def get_year(year, department=''):
+    """年・部署・データのバージョン毎にキャッシュした年間表示"""
+    return year_cache.get_or_set(
+        year, department, current_version(),
+        compute=lambda: build_year(year, department),
+    )
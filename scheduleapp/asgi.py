@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+変更通知（SSE）を配信するには ASGI サーバーで起動する:
+    uvicorn scheduleapp.asgi:application
+
+ASGI ではカレンダー・スケジュールAPIを非同期版のビューで配信する（ASYNC_VIEWS=0 で同期版に戻す）。
 """
 
 import os
@@ -12,5 +17,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scheduleapp.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
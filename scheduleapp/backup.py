@@ -0,0 +1,165 @@
+"""SQLite のオンラインバックアップとレポート用のスナップショット
+
+SQLite のバックアップ API で SNAPSHOT_PAGES ページずつ複写し、合間に SNAPSHOT_SLEEP 秒休んで
+他の接続の書き込みを止め続けないようにする。複写中に元のファイルが書き換えられた場合は
+SQLite が複写をやり直すため、出来上がるのはある時点の一貫したコピーになる。
+コピーは同じディレクトリの一時ファイルに作ってから置き換えるため、読んでいる接続が途中のファイルを見ることはない。
+
+DATABASE_ROUTES で補助テーブルを別ファイルに置いている場合、既定の接続のバックアップはそれらの接続の
+バックアップ（companion_path）と組で作り、組で復元する。監査ログ（auxiliary）だけが進んでいると
+チェックポイントの位置（ScheduleCheckpoint.last_audit_id）と食い違うため。
+
+REPORTING_SNAPSHOT は db.sqlite3 のスナップショットで、読み取り専用の接続 REPORTING_ALIAS
+（immutable で開く）から CSV 出力や重い集計に使う。定期ジョブで作り直す。
+"""
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+REPORTING_ALIAS = 'reporting'
+# 書き込み中のロックを待つ秒数
+BUSY_TIMEOUT = 5
+
+
+class BackupError(Exception):
+    """バックアップ・復元に失敗した（検査で壊れていた等）"""
+
+
+def database_path(alias=DEFAULT_DB_ALIAS):
+    return Path(connections[alias].settings_dict['NAME'])
+
+
+def companion_aliases(alias=DEFAULT_DB_ALIAS):
+    """alias と組でバックアップ・復元する接続（DATABASE_ROUTES で補助テーブルを置いた接続）"""
+    if alias != DEFAULT_DB_ALIAS:
+        return []
+    return sorted(set(getattr(settings, 'DATABASE_ROUTES', {}).values()))
+
+
+def companion_path(path, alias):
+    """バックアップ path と組になる接続 alias のバックアップのパス（backup.sqlite3 → backup.auxiliary.sqlite3）"""
+    path = Path(path)
+    return path.with_name(f'{path.stem}.{alias}{path.suffix}')
+
+
+def check_integrity(connection):
+    """PRAGMA quick_check の結果が ok でなければ BackupError"""
+    result = [row[0] for row in connection.execute('PRAGMA quick_check')]
+    if result != ['ok']:
+        raise BackupError('整合性の検査に失敗しました: ' + '; '.join(result[:5]))
+
+
+def verify_backup(source):
+    """バックアップのファイル source を検査する（無い・壊れていれば BackupError）"""
+    source = Path(source)
+    if not source.exists():
+        raise BackupError(f'{source} がありません')
+    backup = sqlite3.connect(f'{source.resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        check_integrity(backup)
+    finally:
+        backup.close()
+
+
+def _copy(source, target, pages, sleep):
+    """source から target へ pages ページずつ複写し、(総ページ数, やり直しを含む複写回数) を返す"""
+    steps = 0
+    total = 0
+
+    def progress(status, remaining, page_count):
+        nonlocal steps, total
+        steps += 1
+        total = page_count
+
+    source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    return total, steps
+
+
+def backup_database(target, alias=DEFAULT_DB_ALIAS, pages=None, sleep=None):
+    """接続 alias のファイルを target に一貫したコピーとして書き出す
+
+    コピーはロールバックジャーナル（WAL でない）にして、単独のファイルとして読めるようにする。
+    戻り値は {'path', 'pages', 'steps', 'bytes', 'seconds'}。
+    """
+    pages = getattr(settings, 'SNAPSHOT_PAGES', 256) if pages is None else pages
+    sleep = getattr(settings, 'SNAPSHOT_SLEEP', 0.005) if sleep is None else sleep
+    target = Path(target)
+    temp = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    began = time.perf_counter()
+    source = sqlite3.connect(database_path(alias), timeout=BUSY_TIMEOUT)
+    try:
+        copy = sqlite3.connect(temp)
+        try:
+            total, steps = _copy(source, copy, pages, sleep)
+            copy.execute('PRAGMA journal_mode=DELETE')
+            check_integrity(copy)
+        finally:
+            copy.close()
+        os.replace(temp, target)
+    finally:
+        source.close()
+        if temp.exists():
+            temp.unlink()
+    return {
+        'path': target,
+        'pages': total,
+        'steps': steps,
+        'bytes': target.stat().st_size,
+        'seconds': time.perf_counter() - began,
+    }
+
+
+def restore_database(source, alias=DEFAULT_DB_ALIAS, pages=None, sleep=None):
+    """バックアップのファイル source の内容で接続 alias のファイルを置き換える
+
+    検査してから、バックアップ API で稼働中のファイルへページ単位で書き戻す（書き戻しの間は
+    他の接続の書き込みを待たせる）。このプロセスの Django の接続は閉じる。
+    復元で sqlite_sequence も巻き戻り、変更の番号（current_version）が再び使われるため、
+    バージョンをキーにしたキャッシュが古い結果を返さないよう、登録済みの全ての名前空間を無効化する。
+    """
+    from schedule.caching import invalidate_all
+
+    pages = getattr(settings, 'SNAPSHOT_PAGES', 256) if pages is None else pages
+    sleep = getattr(settings, 'SNAPSHOT_SLEEP', 0.005) if sleep is None else sleep
+    source = Path(source)
+    verify_backup(source)
+    began = time.perf_counter()
+    connections.close_all()
+    backup = sqlite3.connect(f'{source.resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        target = sqlite3.connect(database_path(alias), timeout=BUSY_TIMEOUT)
+        try:
+            total, steps = _copy(backup, target, pages, sleep)
+        finally:
+            target.close()
+    finally:
+        backup.close()
+    invalidate_all()
+    return {'path': database_path(alias), 'pages': total, 'steps': steps, 'seconds': time.perf_counter() - began}
+
+
+def take_reporting_snapshot():
+    """レポート用のスナップショットを作り直す"""
+    return backup_database(settings.REPORTING_SNAPSHOT)
+
+
+def snapshot_taken_at():
+    """レポート用のスナップショットの作成日時（無ければ None）"""
+    try:
+        mtime = Path(settings.REPORTING_SNAPSHOT).stat().st_mtime
+    except OSError:
+        return None
+    return datetime.fromtimestamp(mtime, tz=timezone.get_current_timezone())
+
+
+def reporting_db():
+    """CSV 出力・集計で読む接続（スナップショットがまだ無ければ既定の接続）"""
+    if REPORTING_ALIAS in connections and Path(settings.REPORTING_SNAPSHOT).exists():
+        return REPORTING_ALIAS
+    return DEFAULT_DB_ALIAS
@@ -0,0 +1,243 @@
+"""SQLite の運用設定（補助テーブルの別ファイル化・読み取り専用接続への振り分け・ロック時の再試行）
+
+セッション・監査ログ等の書き込みの多い補助テーブルは DATABASE_ROUTES に従って別ファイルの接続に置き
+（AuxiliaryRouter）、業務テーブルの書き込みロックと競合させない。これらのテーブルは業務テーブルへの
+外部キーを持たず、業務データと同じトランザクションで書く必要も無いものに限る。
+
+GET / HEAD / OPTIONS のリクエスト中の読み取りは、同じファイルを PRAGMA query_only で開いた
+READ_ALIAS の接続に振り分ける（ReadRoutingMiddleware と PrimaryReplicaRouter）。WAL モードでは
+読み取りが書き込みを待たないため、表示の多いページが編集の保存に引きずられない。
+次の場合はコミット前の変更が見えるよう、読み取りも既定の接続で行う。
+- GET 中でも一度書き込んだ後（日付によるステータス更新等）
+- 既定の接続でトランザクション中
+
+非同期のビューの互いに独立した読み取りは run_read・gather_reads で別々のスレッド・接続に分けて同時に実行する。
+Django の非同期 ORM（aget・async for 等）は1つのリクエストの問い合わせを同じスレッド・接続で順に実行するため、
+asyncio.gather で並べても同時には走らない。WAL では読み取り同士も待ち合わない。
+
+「database is locked」で失敗した文は、SQLITE_LOCK_RETRIES 回まで間隔を倍にしながら再試行する。
+SQLite はロック待ちで失敗した文をトランザクションを保ったままやり直せるため、
+トランザクション開始（BEGIN IMMEDIATE）も途中の文も同じく再試行する。
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse
+
+logger = logging.getLogger(__name__)
+
+READ_ALIAS = 'replica'
+# テーブルを作らない読み取り専用の接続（REPORTING はスナップショット、scheduleapp.backup）
+READ_ONLY_ALIASES = (READ_ALIAS, 'reporting')
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# リクエスト中の振り分けの状態（読み取りのリクエストの間だけ設定する）
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+class _RoutingState:
+    __slots__ = ('wrote',)
+
+    def __init__(self):
+        self.wrote = False
+
+
+def route_for(app_label, model_name=None):
+    """DATABASE_ROUTES で別ファイルに置くモデル・アプリの接続名（無ければ None）"""
+    routes = getattr(settings, 'DATABASE_ROUTES', {})
+    return routes.get(f'{app_label}.{model_name}') or routes.get(app_label)
+
+
+class AuxiliaryRouter:
+    """DATABASE_ROUTES のモデル・アプリを別ファイルの接続に振り分けるルーター
+
+    キーは "アプリ名" または "アプリ名.モデル名"（小文字）。別ファイルの接続には振り分けたもの以外を作らない。
+    """
+
+    def db_for_read(self, model, **hints):
+        return route_for(model._meta.app_label, model._meta.model_name)
+
+    def db_for_write(self, model, **hints):
+        return route_for(model._meta.app_label, model._meta.model_name)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in READ_ONLY_ALIASES:
+            return False
+        alias = route_for(app_label, model_name)
+        if db in set(getattr(settings, 'DATABASE_ROUTES', {}).values()):
+            return alias == db
+        if alias is not None:
+            return False
+        return None
+
+
+class PrimaryReplicaRouter:
+    """読み取りのリクエスト中の読み取りを READ_ALIAS に振り分けるルーター"""
+
+    def __init__(self):
+        # ルーターより先に接続していたもの（起動時の確認等）にも再試行を仕込む
+        for connection in connections.all(initialized_only=True):
+            _install_lock_retry(connection)
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.wrote or connections['default'].in_atomic_block:
+            return 'default'
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # 以降の読み取りは書き込んだ接続で行い、自分の変更が見えるようにする
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 同じファイルを開いた接続同士なので、どちらから読んだオブジェクトでも関連付けてよい
+        if {obj1._state.db, obj2._state.db} <= {'default', READ_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == READ_ALIAS:
+            return False
+        return None
+
+
+def read_routing(request):
+    """リクエストの間の振り分けを設定し、戻すためのトークンを返す（読み取りのリクエスト以外は None）"""
+    if request.method not in READ_METHODS:
+        return None
+    return _routing.set(_RoutingState())
+
+
+def _iter_with_routing(content, state):
+    iterator = iter(content)
+    while True:
+        token = _routing.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _routing.reset(token)
+        yield chunk
+
+
+async def _aiter_with_routing(content, state):
+    iterator = aiter(content)
+    while True:
+        token = _routing.set(state)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _routing.reset(token)
+        yield chunk
+
+
+def keep_routing(response, token):
+    """ストリーミングの応答は、返した後に送り出しながら読み取るため、その間も同じ振り分けを有効にする
+
+    振り分けの値はミドルウェアを抜けると戻すため、1つずつ取り出す間だけ設定し直す。
+    """
+    # ファイルの応答（静的ファイル等）は DB を読まず、sendfile 等を使えるようそのまま返す
+    if token is not None and response.streaming and not isinstance(response, FileResponse):
+        state = _routing.get()
+        content = response.streaming_content
+        if response.is_async:
+            response.streaming_content = _aiter_with_routing(content, state)
+        else:
+            response.streaming_content = _iter_with_routing(content, state)
+    return response
+
+
+class ReadRoutingMiddleware:
+    """GET / HEAD / OPTIONS のリクエストの読み取りを読み取り専用の接続に振り分けるミドルウェア"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            from asgiref.sync import markcoroutinefunction
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = read_routing(request)
+        try:
+            return keep_routing(self.get_response(request), token)
+        finally:
+            if token is not None:
+                _routing.reset(token)
+
+    async def __acall__(self, request):
+        token = read_routing(request)
+        try:
+            return keep_routing(await self.get_response(request), token)
+        finally:
+            if token is not None:
+                _routing.reset(token)
+
+
+def _read_and_close(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # 実行用のスレッドは使い回されるため、このスレッドで開いた接続を残さない
+        connections.close_all()
+
+
+async def run_read(func, *args):
+    """読み取りの関数 func(*args) を、リクエストとは別のスレッド・接続で実行する
+
+    別の接続になるため、リクエストのトランザクション中の変更は見えない。書き込みには使わない。
+    """
+    return await sync_to_async(_read_and_close, thread_sensitive=False)(func, *args)
+
+
+async def gather_reads(*funcs):
+    """互いに独立した読み取り（引数なしの関数）を同時に実行し、結果を順に返す"""
+    return await asyncio.gather(*(run_read(func) for func in funcs))
+
+
+def is_lock_error(exc):
+    message = str(exc)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_lock(execute, sql, params, many, context):
+    """ロック待ちで失敗した文を、間隔を倍にしながら SQLITE_LOCK_RETRIES 回まで再試行する"""
+    retries = getattr(settings, 'SQLITE_LOCK_RETRIES', 5)
+    delay = getattr(settings, 'SQLITE_LOCK_BACKOFF', 0.05)
+    max_delay = getattr(settings, 'SQLITE_LOCK_MAX_DELAY', 1.0)
+    for attempt in range(retries + 1):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if attempt == retries or not is_lock_error(exc):
+                raise
+            logger.warning('SQLite のロック待ちで失敗したため再試行します（%d回目）: %s', attempt + 1, sql[:80])
+            # 同時に失敗した他の接続と再試行の時機をずらす
+            time.sleep(min(delay * 2 ** attempt, max_delay) * random.uniform(0.5, 1.0))
+
+
+def _install_lock_retry(connection, **kwargs):
+    if connection.vendor == 'sqlite' and retry_on_lock not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_on_lock)
+
+
+connection_created.connect(_install_lock_retry)
@@ -0,0 +1,152 @@
+"""SQLite のファイルの保守（統計の更新・空きページの解放・整合性の検査・サイズの報告）
+
+manage.py db_maintain と定期ジョブ schedule.db_maintain から使う。稼働中に実行してよいよう、
+どの処理も短いトランザクションに分けて行い、ロック待ちは接続の busy_timeout と再試行（scheduleapp.db）に任せる。
+
+- 統計: analysis_limit で走査する行数を抑えた ANALYZE。SQLite 3.46 より前の PRAGMA optimize は
+  その接続で使ったテーブルしか見ないため、保守用に開いたばかりの接続では何もしないことがある
+- 空きページ: auto_vacuum=INCREMENTAL のファイルだけ、SQLITE_VACUUM_STEP ページずつ PRAGMA incremental_vacuum で
+  ファイルの末尾から解放する。既存のファイルを INCREMENTAL にするには一度だけ VACUUM が要り、
+  その間は全体をロックするため enable_incremental_vacuum は停止中に実行する
+- 整合性: 既定は PRAGMA quick_check（索引と表の内容の突き合わせを省く）、full なら integrity_check
+"""
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+from .db import READ_ONLY_ALIASES
+
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+# 整合性の検査で報告する問題の件数の上限
+MAX_PROBLEMS = 20
+
+
+def maintained_aliases():
+    """保守の対象の接続（SQLite のファイルの接続。読み取り専用の接続は元のファイルと同じか作り直すため除く）"""
+    return [
+        alias for alias, database in settings.DATABASES.items()
+        if database['ENGINE'] == 'django.db.backends.sqlite3' and alias not in READ_ONLY_ALIASES
+    ]
+
+
+def _pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+def database_stats(alias):
+    """ファイル全体のページ数・空きページ数・断片化の割合等"""
+    with connections[alias].cursor() as cursor:
+        page_size = _pragma(cursor, 'page_size')
+        page_count = _pragma(cursor, 'page_count')
+        freelist_count = _pragma(cursor, 'freelist_count')
+        return {
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'bytes': page_size * page_count,
+            'free_bytes': page_size * freelist_count,
+            # ファイルのうち使われていないページの割合（VACUUM で縮む分）
+            'fragmentation': freelist_count / page_count if page_count else 0.0,
+            'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma(cursor, 'auto_vacuum'), '?'),
+            'journal_mode': _pragma(cursor, 'journal_mode'),
+        }
+
+
+def object_sizes(alias):
+    """テーブル・索引毎のサイズ（大きい順）。dbstat が使えない SQLite では None
+
+    unused はページ内の使われていないバイト数で、削除の多いテーブル・索引ほど大きくなる。
+    """
+    sql = (
+        "SELECT s.name, COALESCE(m.type, 'table'), COALESCE(m.tbl_name, s.name), "
+        "COUNT(*), SUM(s.pgsize), SUM(s.unused) "
+        "FROM dbstat AS s LEFT JOIN sqlite_schema AS m ON m.name = s.name "
+        "GROUP BY s.name ORDER BY SUM(s.pgsize) DESC"
+    )
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+    except OperationalError:
+        return None
+    return [
+        {'name': name, 'type': kind, 'table': table, 'pages': pages, 'bytes': size, 'unused': unused,
+         'fill': 1 - unused / size if size else 1.0}
+        for name, kind, table, pages, size, unused in rows
+    ]
+
+
+def analyze(alias, limit=None):
+    """クエリプランナーの統計（sqlite_stat1）を更新する（limit=0 なら全行を走査）"""
+    limit = getattr(settings, 'SQLITE_ANALYSIS_LIMIT', 1000) if limit is None else limit
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'PRAGMA analysis_limit={int(limit)}')
+        cursor.execute('ANALYZE')
+        # 更新した統計をこの接続の以降のクエリにも使わせる
+        cursor.execute('PRAGMA optimize')
+
+
+def incremental_vacuum(alias, max_pages=None, step=None):
+    """空きページを step ページずつ解放し、解放したページ数を返す（INCREMENTAL でなければ 0）"""
+    step = getattr(settings, 'SQLITE_VACUUM_STEP', 256) if step is None else step
+    with connections[alias].cursor() as cursor:
+        if _pragma(cursor, 'auto_vacuum') != 2:
+            return 0
+        released = 0
+        while max_pages is None or released < max_pages:
+            before = _pragma(cursor, 'freelist_count')
+            if not before:
+                break
+            pages = step if max_pages is None else min(step, max_pages - released)
+            # 1行読む毎に1ページ解放されるため、最後まで読み切る
+            cursor.execute(f'PRAGMA incremental_vacuum({pages})')
+            cursor.fetchall()
+            freed = before - _pragma(cursor, 'freelist_count')
+            if freed <= 0:
+                break
+            released += freed
+        if released and _pragma(cursor, 'journal_mode') == 'wal':
+            # WAL の内容をファイルへ書き戻して縮める（読み取り中の接続は待たない）
+            cursor.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            cursor.fetchall()
+        return released
+
+
+def enable_incremental_vacuum(alias):
+    """auto_vacuum を INCREMENTAL に切り替えて VACUUM する（全体をロックするため停止中に実行する）"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def check_integrity(alias, full=False):
+    """整合性の検査で見つかった問題の一覧（問題が無ければ空）"""
+    pragma = 'integrity_check' if full else 'quick_check'
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'PRAGMA {pragma}({MAX_PROBLEMS})')
+        result = [row[0] for row in cursor.fetchall()]
+    return [] if result == ['ok'] else result
+
+
+def maintain(alias, full=False, vacuum=True, max_pages=None, sizes=True):
+    """1つの接続の保守をまとめて行い、結果を返す
+
+    full なら統計を全行の走査で作り、整合性も integrity_check で検査する。
+    sizes=False ならテーブル・索引毎のサイズ（全ページの走査）を省く。
+    """
+    began = time.perf_counter()
+    before = database_stats(alias)
+    problems = check_integrity(alias, full=full)
+    analyze(alias, limit=0 if full else None)
+    released = incremental_vacuum(alias, max_pages=max_pages) if vacuum else 0
+    return {
+        'alias': alias,
+        'before': before,
+        'after': database_stats(alias),
+        'released': released,
+        'problems': problems,
+        'sizes': object_sizes(alias) if sizes else None,
+        'seconds': time.perf_counter() - began,
+    }
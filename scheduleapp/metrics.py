@@ -0,0 +1,252 @@
+"""Prometheus 形式のメトリクス（/metrics）
+
+MetricsMiddleware がリクエスト毎に次を記録する。ビューのラベルは schedule / accounts の URL 名
+（"schedule:calendar"、"login" 等）とし、それ以外の URL（管理画面・静的ファイル・未解決）は "other" にまとめる。
+- 処理時間・レスポンスサイズのヒストグラム
+- 1リクエストあたりの DB クエリ数・クエリ時間のヒストグラム
+- 処理中のリクエスト数・配信中のストリーミングレスポンス（SSE）数
+
+案件・スケジュールの状態毎の件数は schedule.status_counts が増減して持つ値を、
+有効期限内のセッション数はセッションテーブルを、/metrics の取得時に読む。
+
+prometheus_client が無い環境では何も計測せず、/metrics は 404 を返す
+（pip install scheduleapp[metrics]）。
+
+複数のワーカープロセス（gunicorn 等）で動かす場合は、起動前に環境変数 PROMETHEUS_MULTIPROC_DIR に
+空のディレクトリを指定する。各プロセスはそのディレクトリのファイルに値を書き、/metrics は
+どのワーカーが受けても全プロセス分を合算して返す。ディレクトリは起動毎に空にし、
+終了したワーカーは mark_process_dead(pid) で外す（gunicorn なら child_exit フックから呼ぶ）。
+"""
+import contextvars
+import os
+import time
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from django.views.decorators.cache import never_cache
+
+# Prometheus クライアント（任意）
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Gauge, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except Exception:
+    prometheus_client = None
+
+# ビュー名をラベルにする URL の名前空間（accounts/ 配下の django.contrib.auth の URL も含める）
+NAMESPACES = ('schedule', 'accounts')
+AUTH_ROUTE_PREFIX = 'accounts/'
+OTHER_VIEW = 'other'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+QUERY_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# 処理中のリクエストの DB クエリの集計（スレッド・sync_to_async の先にも引き継がれる）
+_queries = contextvars.ContextVar('metrics_queries', default=None)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'scheduleapp_request_duration_seconds', 'リクエストの処理時間（秒）',
+        ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+    )
+    RESPONSE_SIZE = Histogram(
+        'scheduleapp_response_size_bytes', 'レスポンスのサイズ（バイト、ストリーミングを除く）',
+        ['view'], buckets=SIZE_BUCKETS,
+    )
+    QUERY_COUNT = Histogram(
+        'scheduleapp_db_queries_per_request', '1リクエストあたりの DB クエリ数',
+        ['view'], buckets=QUERY_COUNT_BUCKETS,
+    )
+    QUERY_TIME = Histogram(
+        'scheduleapp_db_query_seconds_per_request', '1リクエストあたりの DB クエリ時間の合計（秒）',
+        ['view'], buckets=QUERY_TIME_BUCKETS,
+    )
+    IN_PROGRESS = Gauge(
+        'scheduleapp_requests_in_progress', '処理中のリクエスト数', multiprocess_mode='livesum',
+    )
+    OPEN_STREAMS = Gauge(
+        'scheduleapp_open_streams', '配信中のストリーミングレスポンス数（SSE 等）',
+        ['view'], multiprocess_mode='livesum',
+    )
+
+
+class _QueryStats:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - began
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return OTHER_VIEW
+    if match.namespace in NAMESPACES or (not match.namespace and match.route.startswith(AUTH_ROUTE_PREFIX)):
+        return match.view_name
+    return OTHER_VIEW
+
+
+class MetricsMiddleware:
+    """リクエストの処理時間・レスポンスサイズ・DB クエリ数等を記録するミドルウェア
+
+    圧縮後のサイズと他のミドルウェアの時間も含めるため、MIDDLEWARE の先頭に置く。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            from asgiref.sync import markcoroutinefunction
+            markcoroutinefunction(self)
+        if prometheus_client is not None:
+            # 以降に接続するものはシグナルで、接続済みのものはここで計数を仕込む
+            connection_created.connect(_install_query_counter)
+            for connection in connections.all(initialized_only=True):
+                _install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if prometheus_client is None:
+            return self.get_response(request)
+        stats, token, began = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._finish(token)
+        return self._observe(request, response, stats, began)
+
+    async def __acall__(self, request):
+        if prometheus_client is None:
+            return await self.get_response(request)
+        stats, token, began = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._finish(token)
+        return self._observe(request, response, stats, began)
+
+    def _start(self):
+        IN_PROGRESS.inc()
+        stats = _QueryStats()
+        return stats, _queries.set(stats), time.perf_counter()
+
+    def _finish(self, token):
+        _queries.reset(token)
+        IN_PROGRESS.dec()
+
+    def _observe(self, request, response, stats, began):
+        view = view_label(request)
+        REQUEST_LATENCY.labels(view, request.method, str(response.status_code)).observe(
+            time.perf_counter() - began
+        )
+        QUERY_COUNT.labels(view).observe(stats.count)
+        QUERY_TIME.labels(view).observe(stats.seconds)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _atrack_stream(response.streaming_content, view)
+            else:
+                response.streaming_content = _track_stream(response.streaming_content, view)
+        else:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        return response
+
+
+def _track_stream(iterator, view):
+    OPEN_STREAMS.labels(view).inc()
+    try:
+        yield from iterator
+    finally:
+        OPEN_STREAMS.labels(view).dec()
+
+
+async def _atrack_stream(iterator, view):
+    OPEN_STREAMS.labels(view).inc()
+    try:
+        async for data in iterator:
+            yield data
+    finally:
+        OPEN_STREAMS.labels(view).dec()
+
+
+class DatabaseCollector:
+    """/metrics の取得時に DB から読む値（状態毎の件数・有効期限内のセッション数）"""
+
+    def collect(self):
+        from schedule.status_counts import status_counts
+
+        families = {
+            'project': GaugeMetricFamily('scheduleapp_projects', '状態毎の案件数', labels=['status']),
+            'schedule': GaugeMetricFamily('scheduleapp_schedules', '状態毎のスケジュール数', labels=['status']),
+        }
+        for (kind, status), count in sorted(status_counts().items()):
+            if kind in families:
+                families[kind].add_metric([status], count)
+        yield from families.values()
+
+        # 署名付き Cookie のセッションはサーバー側に無いため数えられない
+        if settings.SESSION_ENGINE.endswith(('.db', '.cached_db')):
+            from django.contrib.sessions.models import Session
+
+            yield GaugeMetricFamily(
+                'scheduleapp_active_sessions', '有効期限内のセッション数',
+                value=Session.objects.filter(expire_date__gt=timezone.now()).count(),
+            )
+
+
+def build_registry():
+    """/metrics で出力するレジストリ（マルチプロセスなら全プロセス分を合算する）"""
+    registry = CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(prometheus_client.REGISTRY)
+    registry.register(DatabaseCollector())
+    return registry
+
+
+def mark_process_dead(pid):
+    """終了したワーカーの処理中の値（livesum のゲージ）を外す"""
+    if prometheus_client is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+@never_cache
+def metrics_view(request):
+    """Prometheus のテキスト形式でメトリクスを返す（METRICS_ALLOWED_IPS からのみ）"""
+    if prometheus_client is None:
+        raise Http404('prometheus_client がインストールされていません')
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        prometheus_client.generate_latest(build_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
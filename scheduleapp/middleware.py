@@ -0,0 +1,207 @@
+import secrets
+import struct
+import zlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+# Brotli ライブラリ（任意）
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+# 圧縮対象の Content-Type（前方一致）
+COMPRESSIBLE_CONTENT_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+# HTML は CSRF トークン等の秘密を含むため brotli にしない（下記 choose_encoding）
+SECRET_CONTENT_TYPES = ('text/html',)
+# BREACH 対策で gzip ヘッダーのファイル名に入れる詰め物の最大長（Django の GZipMiddleware と同じ）
+MAX_RANDOM_BYTES = 100
+
+
+def no_compression(view_func):
+    """レスポンス圧縮を行わないビュー用のデコレーター"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            response.no_compression = True
+            return response
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            response.no_compression = True
+            return response
+    return _wrapped_view
+
+
+def accepted_encodings(header):
+    """Accept-Encoding ヘッダーから受け入れ可能な（q>0 の）エンコーディングを返す"""
+    encodings = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            encodings.add(coding)
+    return encodings
+
+
+def choose_encoding(header, content_type=''):
+    """クライアントが受け入れる中で最適な圧縮方式を返す（無ければ None）
+
+    brotli の出力にはランダム長の詰め物を入れられないため、秘密を含む Content-Type は
+    BREACH 対策として詰め物を入れる gzip だけにする。
+    """
+    encodings = accepted_encodings(header)
+    if (brotli is not None and getattr(settings, 'COMPRESSION_BROTLI', True) and 'br' in encodings
+            and not content_type.startswith(SECRET_CONTENT_TYPES)):
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding):
+    """バイト列を一括圧縮"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    # gzip ヘッダーにランダム長のファイル名を入れて BREACH 対策とする（Django の GZipMiddleware と同じ）
+    return compress_string(data, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def _gzip_header():
+    """ランダム長のファイル名（FNAME）を入れた gzip ヘッダー（compress_bytes と同じ BREACH 対策）"""
+    filename = b'a' * secrets.randbelow(MAX_RANDOM_BYTES)
+    return b'\x1f\x8b\x08\x08' + struct.pack('<I', 0) + b'\x00\xff' + filename + b'\x00'
+
+
+class _StreamCompressor:
+    """ストリーミング用の逐次圧縮器（チャンク毎にフラッシュして即時送出する）"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=5)
+            self._process = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # ヘッダー・末尾（CRC32 と長さ）は自前で付け、本体は生の deflate で圧縮する
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._header = _gzip_header()
+            self._crc = 0
+            self._size = 0
+            self._process = self._gzip_process
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._gzip_finish
+
+    def _gzip_process(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        header, self._header = self._header, b''
+        return header + self._compressor.compress(data)
+
+    def _gzip_finish(self):
+        header, self._header = self._header, b''
+        trailer = struct.pack('<II', self._crc & 0xffffffff, self._size & 0xffffffff)
+        return header + self._compressor.flush(zlib.Z_FINISH) + trailer
+
+    def chunk(self, data):
+        return self._process(data) + self._flush()
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_iterator(iterator, encoding):
+    compressor = _StreamCompressor(encoding)
+    for data in iterator:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+async def acompress_iterator(iterator, encoding):
+    compressor = _StreamCompressor(encoding)
+    async for data in iterator:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Accept-Encoding に応じて gzip / brotli でレスポンスを圧縮するミドルウェア
+
+    COMPRESSION_MIN_SIZE 未満のレスポンス、圧縮対象外の Content-Type、
+    no_compression デコレーターを付けたビューのレスポンスは圧縮しない。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            from asgiref.sync import markcoroutinefunction
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if getattr(response, 'no_compression', False) or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), content_type)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_iterator(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_iterator(response.streaming_content, encoding)
+            # 圧縮後のサイズは送り終えるまで分からない
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # 強い ETag は圧縮後の表現と一致しないため弱い ETag にする
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
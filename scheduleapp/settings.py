@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,14 +40,19 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'accounts',
     'schedule',
+    'worker',
 ]
 
 MIDDLEWARE = [
+    'scheduleapp.metrics.MetricsMiddleware',
+    'scheduleapp.db.ReadRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'scheduleapp.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'schedule.audit.AuditUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.NoCacheMiddleware',
@@ -64,23 +70,100 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'schedule.context_processors.department',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'scheduleapp.wsgi.application'
+# カレンダー・スケジュールAPIを非同期版のビューで配信する（scheduleapp.asgi が ASYNC_VIEWS=1 にする）
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLITE_PROFILE=production（既定）では、接続毎に SQLITE_PRAGMAS を設定し、
+# GET 等の読み取りを同じファイルを読み取り専用で開いた replica の接続に振り分け（scheduleapp.db）、
+# ロック待ちで失敗した文を再試行する。SQLITE_PROFILE=default なら Django の既定のまま
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+# journal_mode=WAL はファイルのヘッダーを書き換えるため、リポジトリの db.sqlite3 を使う開発時（DEBUG）は
+# 既定で切り替えない（SQLITE_WAL=1 で有効）。SQLITE_WAL は SQLITE_PROFILE=production の場合だけ使う
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '0' if DEBUG else '1') == '1'
+SQLITE_PRAGMAS = {
+    # 新しく作るファイルは空きページを少しずつ解放できるようにする（既存のファイルは db_maintain --enable-incremental）
+    'auto_vacuum': 'INCREMENTAL',
+    # WAL ではコミット毎の fsync を省いても壊れない（電源断で直近のコミットは失われうる）
+    **({'journal_mode': 'WAL', 'synchronous': 'NORMAL'} if SQLITE_WAL else {}),
+    'busy_timeout': 5000,  # ミリ秒
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,  # 負数は KiB 単位（約32MB）
+    'temp_store': 'MEMORY',
+} if SQLITE_PROFILE == 'production' else {}
+SQLITE_INIT_COMMAND = ''.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items())
+SQLITE_LOCK_RETRIES = 5 if SQLITE_PROFILE == 'production' else 0
+SQLITE_LOCK_BACKOFF = 0.05  # 秒（再試行毎に倍）
+SQLITE_LOCK_MAX_DELAY = 1.0
+# 保守（manage.py db_maintain）で ANALYZE が索引毎に走査する行数の上限と、一度に解放する空きページ数
+SQLITE_ANALYSIS_LIMIT = 1000
+SQLITE_VACUUM_STEP = 256
+
+SQLITE_OPTIONS = {
+    'init_command': SQLITE_INIT_COMMAND,
+    # 書き込みロックをトランザクションの開始時に取り、途中での昇格の失敗（即時の database is locked）を避ける
+    'transaction_mode': 'IMMEDIATE',
+} if SQLITE_PROFILE == 'production' else {}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'init_command': SQLITE_INIT_COMMAND + 'PRAGMA query_only=ON;'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# セッション（メッセージもセッションに保存される）・監査ログ・通知の送信記録・タスクキュー・キャッシュ表は
+# 別ファイルに置き、業務テーブルと書き込みロックを分ける（SQLITE_SPLIT=0 なら全て db.sqlite3）。
+# キーは "アプリ名" または "アプリ名.モデル名"。新しい接続には migrate --database <接続名> でテーブルを作り、
+# 既存のデータは manage.py move_auxiliary_data で移す
+SQLITE_SPLIT = os.environ.get('SQLITE_SPLIT', '1') == '1'
+DATABASE_ROUTES = {
+    'sessions': 'sessions',
+    'schedule.auditentry': 'auxiliary',
+    'schedule.notificationlog': 'auxiliary',
+    'worker': 'auxiliary',
+    'django_cache': 'auxiliary',
+} if SQLITE_SPLIT else {}
+for _alias in sorted(set(DATABASE_ROUTES.values())):
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{_alias}.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
     }
+
+# レポート用のスナップショット（manage.py snapshot・定期ジョブで作成）。CSV 出力等の重い読み取りはこちらで行う
+REPORTING_SNAPSHOT = BASE_DIR / 'reporting.sqlite3'
+REPORTING_REFRESH_MINUTES = int(os.environ.get('REPORTING_REFRESH_MINUTES', 60))
+DATABASES['reporting'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    # 置き換えられるまで内容が変わらないため immutable で開く（ロック・変更の確認をしない）
+    'NAME': f'{REPORTING_SNAPSHOT.as_uri()}?mode=ro&immutable=1',
+    'TEST': {'MIRROR': 'default'},
 }
+# オンラインバックアップで一度に複写するページ数と、その合間に休む秒数
+SNAPSHOT_PAGES = 256
+SNAPSHOT_SLEEP = 0.005
+
+DATABASE_ROUTERS = ['scheduleapp.db.AuxiliaryRouter']
+if SQLITE_PROFILE == 'production':
+    DATABASE_ROUTERS.append('scheduleapp.db.PrimaryReplicaRouter')
 
 
 # Password validation
@@ -121,6 +204,76 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic でハッシュ付きファイル名と .gz / .br の事前圧縮版を生成する
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'scheduleapp.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# レスポンス圧縮（gzip / brotli）
+# COMPRESSION_MIN_SIZE バイト未満のレスポンスは圧縮しない
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI = True
+
+# Prometheus のメトリクス（/metrics。prometheus_client が必要）
+# 取得を許可するアドレス（カンマ区切り。'*' なら制限しない）
+# 複数プロセスで動かす場合は環境変数 PROMETHEUS_MULTIPROC_DIR に集計用のディレクトリを指定する
+_metrics_ips = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+METRICS_ALLOWED_IPS = None if _metrics_ips == '*' else [ip.strip() for ip in _metrics_ips.split(',') if ip.strip()]
+
+# 監査ログ（バックグラウンドのスレッドでまとめて書き込む。False ならコミット時に同期で書き込む）
+AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', '1') == '1'
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0
+
+# バックグラウンドのタスク（manage.py run_worker で実行）
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', 4))
+WORKER_POLL_INTERVAL = 1.0
+WORKER_MAX_ATTEMPTS = 5
+WORKER_RETRY_BACKOFF = 10  # 秒（失敗毎に倍）
+WORKER_RETRY_MAX_DELAY = 60 * 60
+WORKER_STALE_AFTER = 60 * 30  # running のまま残ったタスクを待機中に戻すまでの秒数
+WORKER_KEEP_FINISHED_DAYS = 7
+
+# メール（既定はコンソールに出力。EMAIL_BACKEND=file なら EMAIL_FILE_PATH に保存）
+EMAIL_BACKENDS = {
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+}
+EMAIL_BACKEND = EMAIL_BACKENDS[os.environ.get('EMAIL_BACKEND', 'console')]
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'schedule@localhost')
+
+# 納期・開始日の通知メール（毎朝 DIGEST_SEND_HOUR 時に送信）
+DIGEST_DUE_DAYS = 7  # 納期の何日前から通知するか
+DIGEST_START_DAYS = 3  # 開始日の何日前から通知するか
+DIGEST_SEND_HOUR = 7
+
+# キャッシュ（既定はプロセス毎のメモリ。CACHE_BACKEND=file / db なら複数プロセスで共有する）
+# db の場合は事前に python manage.py createcachetable --database auxiliary を実行する
+# （キャッシュのテーブルは DATABASE_ROUTES で auxiliary に置く。SQLITE_SPLIT=0 なら --database は不要）
+CACHE_BACKENDS = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'schedule'},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'},
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'schedule_cache'},
+}
+CACHES = {
+    'default': dict(
+        CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')],
+        TIMEOUT=60 * 10,
+        OPTIONS={'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+    ),
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -135,12 +288,23 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# 認証済みユーザーをプロセス内で短時間キャッシュする（0で無効）
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 30))
+
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # Session Settings
+# SESSION_BACKEND 環境変数で切替: db / cached_db（既定） / signed_cookies
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'cached_db')]
 SESSION_COOKIE_SECURE = False  # 本番環境ではTrueにする
 SESSION_COOKIE_HTTPONLY = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
@@ -0,0 +1,95 @@
+"""静的ファイルの配信設定
+
+collectstatic 時にハッシュ付きファイル名（マニフェスト）と事前圧縮版（.gz / .br）を生成し、
+serve_static() はそれを Accept-Encoding に応じて長期キャッシュ付きで配信する。
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from .middleware import accepted_encodings
+
+# Brotli ライブラリ（任意）
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# これより小さいファイルは圧縮してもほとんど縮まないため対象外
+COMPRESS_MIN_SIZE = 256
+
+# ManifestStaticFilesStorage が付与するハッシュ（12桁の16進数）
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+FAR_FUTURE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ハッシュ付きファイルに加えて gzip / brotli 圧縮版を書き出すストレージ"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = []
+        for name, hashed_name, done in super().post_process(paths, dry_run, **options):
+            if done and not isinstance(done, Exception):
+                processed.append(hashed_name)
+            yield name, hashed_name, done
+        if dry_run:
+            return
+        for name in processed:
+            self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        path = self.path(name)
+        # mtime=0 でビルド毎に同じバイト列になるようにする
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+
+
+@require_safe
+def serve_static(request, path):
+    """STATIC_ROOT に収集済みのファイルを配信（事前圧縮版があれば優先）"""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    # q=0 で拒否されたエンコーディングを除くため、圧縮のミドルウェアと同じく q 値まで解釈する
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = None
+    serve_path = full_path
+    for suffix, candidate in (('.br', 'br'), ('.gz', 'gzip')):
+        if candidate in accepted and os.path.isfile(full_path + suffix):
+            serve_path, encoding = full_path + suffix, candidate
+            break
+
+    response = FileResponse(
+        open(serve_path, 'rb'), content_type=content_type,
+        filename=os.path.basename(full_path),
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    if HASHED_NAME_RE.search(path):
+        response.headers['Cache-Control'] = FAR_FUTURE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
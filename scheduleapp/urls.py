@@ -14,14 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.views.generic import RedirectView
+from .metrics import metrics_view
+from .staticfiles import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
     path('accounts/', include('accounts.urls')),
     path('schedule/', include('schedule.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', RedirectView.as_view(url='/schedule/projects/', permanent=True)),
+    # collectstatic 済みのファイルを事前圧縮版・長期キャッシュ付きで配信
+    re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static),
 ]
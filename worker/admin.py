@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import PeriodicJobState, Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'run_at', 'attempts', 'max_attempts', 'locked_by', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'last_error']
+    readonly_fields = ['locked_by', 'locked_at', 'created_at', 'finished_at', 'last_error']
+    actions = ['retry']
+
+    @admin.action(description='選択したタスクを再実行する')
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='queued', run_at=timezone.now(), attempts=0, locked_by='', locked_at=None, finished_at=None,
+        )
+        self.message_user(request, f'{updated}件のタスクを再実行します。')
+
+
+@admin.register(PeriodicJobState)
+class PeriodicJobStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'next_run_at', 'last_run_at']
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class WorkerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'worker'
+    verbose_name = 'バックグラウンド処理'
+
+    def ready(self):
+        # 各アプリの jobs.py を読み込み、タスクと定期ジョブを登録する
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('jobs')
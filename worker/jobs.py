@@ -0,0 +1,15 @@
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task
+from .tasks import periodic
+
+
+@periodic('worker.purge_finished_tasks', at=time(3, 30))
+def purge_finished_tasks():
+    """WORKER_KEEP_FINISHED_DAYS 日より前に終了したタスクを削除"""
+    limit = timezone.now() - timedelta(days=settings.WORKER_KEEP_FINISHED_DAYS)
+    deleted, _ = Task.objects.filter(status__in=['done', 'failed'], finished_at__lt=limit).delete()
+    return deleted
@@ -0,0 +1,37 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from worker.runner import Worker
+
+
+class Command(BaseCommand):
+    help = 'バックグラウンドのタスクと定期ジョブを実行するワーカーを起動します（Ctrl+C / SIGTERM で終了）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='並行して実行するタスク数（既定は WORKER_CONCURRENCY）')
+        parser.add_argument('--poll-interval', type=float, help='キューが空のときの確認間隔（秒）')
+        parser.add_argument('--once', action='store_true', help='実行可能なタスクを処理したら終了する（cron 用）')
+
+    def handle(self, *args, **options):
+        if options['verbosity'] > 1:
+            logging.basicConfig(level=logging.INFO)
+        worker = Worker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        if options['once']:
+            total = 0
+            while count := worker.run_once():
+                total += count
+            self.stdout.write(self.style.SUCCESS(f'タスクを{total}件実行しました（失敗 {worker.failed}件）。'))
+            return
+
+        def stop(signum, frame):
+            # 実行中のタスクは最後まで処理してから終了する
+            worker.stop()
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        self.stdout.write(f'ワーカー {worker.name} を起動しました（並行数 {worker.concurrency}）。')
+        worker.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'ワーカーを終了しました（実行 {worker.processed}件, 失敗 {worker.failed}件）。'
+        ))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicJobState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='ジョブ名')),
+                ('next_run_at', models.DateTimeField(verbose_name='次回実行日時')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='前回登録日時')),
+            ],
+            options={
+                'verbose_name': '定期ジョブ',
+                'verbose_name_plural': '定期ジョブ',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='タスク名')),
+                ('args', models.TextField(default='[]', verbose_name='引数')),
+                ('kwargs', models.TextField(default='{}', verbose_name='キーワード引数')),
+                ('status', models.CharField(choices=[('queued', '待機中'), ('running', '実行中'), ('done', '完了'), ('failed', '失敗')], default='queued', max_length=10, verbose_name='ステータス')),
+                ('run_at', models.DateTimeField(verbose_name='実行予定日時')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='実行回数')),
+                ('max_attempts', models.PositiveIntegerField(verbose_name='最大実行回数')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='実行ワーカー')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='実行開始日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='エラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+            ],
+            options={
+                'verbose_name': 'タスク',
+                'verbose_name_plural': 'タスク',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx')],
+            },
+        ),
+    ]
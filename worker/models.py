@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class Task(models.Model):
+    """キューに積まれたタスク
+
+    run_worker コマンドのワーカーが run_at を過ぎた queued のタスクを取り出して実行する。
+    失敗時は attempts が max_attempts に達するまで間隔を空けて再実行する。
+    """
+    STATUS_CHOICES = [
+        ('queued', '待機中'),
+        ('running', '実行中'),
+        ('done', '完了'),
+        ('failed', '失敗'),
+    ]
+
+    name = models.CharField('タスク名', max_length=100)
+    args = models.TextField('引数', default='[]')
+    kwargs = models.TextField('キーワード引数', default='{}')
+    status = models.CharField('ステータス', max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField('実行予定日時')
+    attempts = models.PositiveIntegerField('実行回数', default=0)
+    max_attempts = models.PositiveIntegerField('最大実行回数')
+    locked_by = models.CharField('実行ワーカー', max_length=100, blank=True)
+    locked_at = models.DateTimeField('実行開始日時', null=True, blank=True)
+    last_error = models.TextField('エラー', blank=True)
+    created_at = models.DateTimeField('登録日時', auto_now_add=True)
+    finished_at = models.DateTimeField('終了日時', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'タスク'
+        verbose_name_plural = 'タスク'
+        ordering = ['-id']
+        indexes = [
+            # ワーカーの取り出し（status='queued' かつ run_at を過ぎたもの）
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+
+class PeriodicJobState(models.Model):
+    """定期ジョブの次回実行日時（複数のワーカーで同じ回を二重に登録しないため）"""
+    name = models.CharField('ジョブ名', max_length=100, unique=True)
+    next_run_at = models.DateTimeField('次回実行日時')
+    last_run_at = models.DateTimeField('前回登録日時', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '定期ジョブ'
+        verbose_name_plural = '定期ジョブ'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,121 @@
+"""タスクを実行するワーカー（manage.py run_worker）
+
+DB のキューをポーリングし、実行日時を過ぎたタスクをスレッドプールで並行に実行する。
+- 取り出しは status='queued' を条件にした UPDATE で行い、複数のワーカーでも1件を1度だけ実行する
+- 失敗したタスクは WORKER_RETRY_BACKOFF * 2^(実行回数-1) 秒後（上限 WORKER_RETRY_MAX_DELAY）に再実行する
+- WORKER_STALE_AFTER 秒以上 running のままのタスク（ワーカーの異常終了）は待機中に戻す
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .tasks import enqueue_due_periodic, registry
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """attempts 回目の失敗後に再実行するまでの秒数"""
+    return min(settings.WORKER_RETRY_BACKOFF * 2 ** (attempts - 1), settings.WORKER_RETRY_MAX_DELAY)
+
+
+def run_task(task):
+    """取り出し済みのタスクを1件実行し、結果を記録する"""
+    func = registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'未登録のタスクです: {task.name}')
+        func(*json.loads(task.args), **json.loads(task.kwargs))
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts < task.max_attempts and func is not None:
+            logger.warning('タスク %s の実行に失敗しました（%d回目）。再実行します', task, task.attempts)
+            Task.objects.filter(pk=task.pk).update(
+                status='queued', locked_by='', locked_at=None, last_error=error,
+                run_at=now + timedelta(seconds=retry_delay(task.attempts)),
+            )
+        else:
+            logger.error('タスク %s の実行に失敗しました:\n%s', task, error)
+            Task.objects.filter(pk=task.pk).update(status='failed', last_error=error, finished_at=now)
+        return False
+    finally:
+        # スレッド毎の DB 接続を使い終えたら閉じる
+        close_old_connections()
+    Task.objects.filter(pk=task.pk).update(status='done', finished_at=timezone.now())
+    close_old_connections()
+    return True
+
+
+class Worker:
+    def __init__(self, concurrency=None, poll_interval=None):
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.poll_interval = poll_interval if poll_interval is not None else settings.WORKER_POLL_INTERVAL
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self):
+        self.stopping.set()
+
+    def requeue_stale(self):
+        """一定時間以上 running のままのタスクを待機中に戻す"""
+        limit = timezone.now() - timedelta(seconds=settings.WORKER_STALE_AFTER)
+        return Task.objects.filter(status='running', locked_at__lt=limit).update(
+            status='queued', locked_by='', locked_at=None,
+        )
+
+    def claim(self, limit):
+        """実行日時を過ぎたタスクを最大 limit 件取り出す"""
+        now = timezone.now()
+        candidates = Task.objects.filter(status='queued', run_at__lte=now)\
+            .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+        claimed = []
+        for task_id in candidates:
+            # 他のワーカーが先に取り出していれば 0 件になる
+            if Task.objects.filter(pk=task_id, status='queued').update(
+                status='running', locked_by=self.name, locked_at=now, attempts=F('attempts') + 1,
+            ):
+                claimed.append(task_id)
+        return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+    def run_once(self, executor=None):
+        """定期ジョブの登録と、実行可能なタスクの実行を1回行い、実行した件数を返す"""
+        self.requeue_stale()
+        enqueue_due_periodic()
+        tasks = self.claim(self.concurrency * 2)
+        if executor is None:
+            results = [run_task(t) for t in tasks]
+        else:
+            results = list(executor.map(run_task, tasks))
+        self.processed += len(results)
+        self.failed += results.count(False)
+        return len(results)
+
+    def run(self):
+        """stop() が呼ばれるまでキューを処理し続ける"""
+        logger.info('ワーカー %s を開始しました（並行数 %d）', self.name, self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='worker') as executor:
+            while not self.stopping.is_set():
+                try:
+                    count = self.run_once(executor)
+                except Exception:
+                    logger.exception('キューの処理中にエラーが発生しました')
+                    count = 0
+                finally:
+                    close_old_connections()
+                if not count:
+                    self.stopping.wait(self.poll_interval)
+        logger.info('ワーカー %s を終了しました（実行 %d件, 失敗 %d件）', self.name, self.processed, self.failed)
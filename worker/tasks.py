@@ -0,0 +1,111 @@
+"""タスクの登録とキューへの投入
+
+各アプリの jobs.py で関数をタスクとして登録し、enqueue でキュー（Task テーブル）に積む。
+
+    @task('schedule.roll_over_statuses')
+    def roll_over_statuses(): ...
+
+    @periodic('schedule.roll_over_statuses', at=time(0, 5))
+    ...
+    enqueue('schedule.roll_over_statuses')
+
+キューは DB だが、Task は別ファイルの接続（DATABASE_ROUTES の auxiliary）に置くため、
+呼び出し元の業務データのトランザクションとは別にコミットされる。ロールバックされたら積みたくない場合は
+transaction.on_commit(lambda: enqueue(...)) でコミット後に積む。
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import PeriodicJobState, Task
+
+# タスク名 → 関数
+registry = {}
+
+
+@dataclass(frozen=True)
+class PeriodicJob:
+    name: str
+    every: timedelta = None
+    at: time = None
+
+    def next_run(self, now):
+        """now より後の次回実行日時（at はローカル時刻で毎日）"""
+        if self.every is not None:
+            return now + self.every
+        local = timezone.localtime(now)
+        candidate = timezone.make_aware(datetime.combine(local.date(), self.at))
+        if candidate <= now:
+            candidate = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), self.at))
+        return candidate
+
+
+# ジョブ名 → PeriodicJob
+periodic_jobs = {}
+
+
+def task(name):
+    """関数をタスク name として登録するデコレータ"""
+    def decorator(func):
+        if name in registry and registry[name] is not func:
+            raise ValueError(f'タスク {name} は既に登録されています')
+        registry[name] = func
+        return func
+    return decorator
+
+
+def periodic(name, every=None, at=None):
+    """登録済みのタスク name を定期実行する（every: 間隔, at: 毎日の時刻 のどちらか）"""
+    if (every is None) == (at is None):
+        raise ValueError('every と at のどちらか一方を指定してください')
+
+    def decorator(func):
+        task(name)(func)
+        periodic_jobs[name] = PeriodicJob(name, every=every, at=at)
+        return func
+    return decorator
+
+
+def enqueue(name, *args, run_at=None, delay=None, max_attempts=None, **kwargs):
+    """タスクをキューに積む（引数は JSON にできる値のみ）"""
+    if name not in registry:
+        raise KeyError(f'未登録のタスクです: {name}')
+    now = timezone.now()
+    if run_at is None:
+        run_at = now + delay if delay else now
+    return Task.objects.create(
+        name=name,
+        args=json.dumps(args, cls=DjangoJSONEncoder),
+        kwargs=json.dumps(kwargs, cls=DjangoJSONEncoder),
+        run_at=run_at,
+        max_attempts=max_attempts or settings.WORKER_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_due_periodic(now=None):
+    """実行日時を過ぎた定期ジョブをキューに積み、積んだジョブ名を返す
+
+    次回日時の更新は「読んだ値のままなら更新」の条件付き UPDATE で行い、
+    複数のワーカーが同時に確認しても1回分だけ積まれるようにする。
+    """
+    now = now or timezone.now()
+    states = {s.name: s for s in PeriodicJobState.objects.filter(name__in=periodic_jobs)}
+    enqueued = []
+    for name, job in periodic_jobs.items():
+        state = states.get(name)
+        if state is None:
+            # 初めて見つけたジョブはすぐに1回実行する（停止中に過ぎた回の代わり）
+            state, _ = PeriodicJobState.objects.get_or_create(name=name, defaults={'next_run_at': now})
+        if state.next_run_at > now:
+            continue
+        claimed = PeriodicJobState.objects.filter(name=name, next_run_at=state.next_run_at).update(
+            next_run_at=job.next_run(now), last_run_at=now,
+        )
+        if claimed:
+            enqueue(name)
+            enqueued.append(name)
+    return enqueued